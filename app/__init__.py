@@ -9,8 +9,13 @@ db = SQLAlchemy()
 migrate = Migrate()
 
 
-def create_app(config_name='default'):
-    """Application factory pattern"""
+def create_app(config_name='default', start_scheduler=True):
+    """Application factory pattern
+    
+    Args:
+        config_name: Key of the config class to use
+        start_scheduler: Load scheduled tasks and start the scheduler (worker processes pass False)
+    """
     # Get the base directory (parent of app directory)
     base_dir = Path(__file__).parent.parent.resolve()
     template_dir = base_dir / 'templates'
@@ -37,8 +42,10 @@ def create_app(config_name='default'):
     # Check and create tables if needed
     with app.app_context():
         try:
-            from app.utils.db_check import ensure_tables_exist
+            from app.utils.db_check import ensure_tables_exist, verify_query_plans
             ensure_tables_exist()
+            if app.config.get('VERIFY_QUERY_PLANS'):
+                verify_query_plans()
         except Exception as e:
             # Log error but don't fail app initialization
             import traceback
@@ -120,11 +127,13 @@ def create_app(config_name='default'):
     app.register_blueprint(api_docs_bp)
     
     # Initialize scheduler
+    if not start_scheduler:
+        return app
     with app.app_context():
         try:
             from app.services.scheduler_service import SchedulerService
-            SchedulerService.load_all_tasks()
-            print("[SCHEDULER] Scheduler initialized and tasks loaded")
+            SchedulerService.start()
+            print(f"[SCHEDULER] Scheduler initialized ({'leader' if SchedulerService.is_leader() else 'standby'})")
         except Exception as e:
             import traceback
             print(f"[SCHEDULER] Warning: Error initializing scheduler: {str(e)}")
@@ -132,3 +141,15 @@ def create_app(config_name='default'):
     
     return app
 
+
+def create_job_app(config_name='default'):
+    """Lightweight application for background jobs started outside of a request
+    
+    Only loads the config and the database extension (no table checks, blueprints or
+    scheduler), which is all scheduled jobs need to run.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    config[config_name].init_app(app)
+    db.init_app(app)
+    return app
@@ -1,14 +1,16 @@
 from app.models.user import User
 from app.models.project import Project
 from app.models.comparison import Comparison, ComparisonResult, ComparisonProfile
-from app.models.change_log import ChangeLog
+from app.models.comparison_job import ComparisonJob
+from app.models.change_log import ChangeLog, ChangeLogDailyRollup
 from app.models.database_connection import DatabaseConnection
 from app.models.table_model_mapping import TableModelMapping
 from app.models.group import Group, user_groups
 from app.models.scheduled_task import ScheduledTask
+from app.models.scheduler_lease import SchedulerLease
 from app.models.webhook_config import WebhookConfig, WebhookPayload, WebhookParams
 from app.models.data_consistency import DataConsistencyConfig, DataConsistencyCheck, DataConsistencyResult
 
-__all__ = ['User', 'Project', 'Comparison', 'ComparisonResult', 'ComparisonProfile', 'ChangeLog', 'DatabaseConnection', 'TableModelMapping', 'Group', 'user_groups', 'ScheduledTask', 'WebhookConfig', 'WebhookPayload', 'WebhookParams', 'DataConsistencyConfig', 'DataConsistencyCheck', 'DataConsistencyResult']
+__all__ = ['User', 'Project', 'Comparison', 'ComparisonResult', 'ComparisonProfile', 'ComparisonJob', 'ChangeLog', 'ChangeLogDailyRollup', 'DatabaseConnection', 'TableModelMapping', 'Group', 'user_groups', 'ScheduledTask', 'SchedulerLease', 'WebhookConfig', 'WebhookPayload', 'WebhookParams', 'DataConsistencyConfig', 'DataConsistencyCheck', 'DataConsistencyResult']
 
 
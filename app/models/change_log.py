@@ -5,6 +5,14 @@ from app import db
 class ChangeLog(db.Model):
     """Change log for incremental tracking"""
     __tablename__ = 'change_logs'
+    __table_args__ = (
+        # Dashboard aggregates: project + detected_at range, grouped by field/type
+        db.Index('ix_change_logs_project_detected', 'project_id', 'detected_at', 'change_type', 'field_name'),
+        # Pending changes to send to the external API
+        db.Index('ix_change_logs_project_sent', 'project_id', 'sent_to_api'),
+        # Deleting change logs together with their comparison
+        db.Index('ix_change_logs_comparison', 'comparison_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -43,3 +51,33 @@ class ChangeLog(db.Model):
         return f'<ChangeLog {self.id} - {self.field_name}>'
 
 
+
+
+class ChangeLogDailyRollup(db.Model):
+    """Daily change counts per project, change type and field (dashboard rollup)"""
+    __tablename__ = 'change_log_daily_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'day', 'change_type', 'field_name', name='uq_change_log_daily_rollup'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC day of ChangeLog.detected_at
+    change_type = db.Column(db.String(50), nullable=False)
+    field_name = db.Column(db.String(200), nullable=False)
+    change_count = db.Column(db.Integer, default=0, nullable=False)
+    unsent_count = db.Column(db.Integer, default=0, nullable=False)  # Changes not yet sent to the external API
+    
+    def to_dict(self):
+        """Convert rollup row to dictionary"""
+        return {
+            'project_id': self.project_id,
+            'day': self.day.isoformat() if self.day else None,
+            'change_type': self.change_type,
+            'field_name': self.field_name,
+            'change_count': self.change_count,
+            'unsent_count': self.unsent_count
+        }
+    
+    def __repr__(self):
+        return f'<ChangeLogDailyRollup {self.project_id} {self.day} {self.change_type}/{self.field_name}>'
@@ -5,6 +5,12 @@ from app import db
 class Comparison(db.Model):
     """Comparison execution model"""
     __tablename__ = 'comparisons'
+    __table_args__ = (
+        # Comparison listings per project ordered by execution date
+        db.Index('ix_comparisons_project_executed', 'project_id', 'executed_at'),
+        # Comparisons listing across projects, keyset-paged by (executed_at, id)
+        db.Index('ix_comparisons_executed', 'executed_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -27,6 +33,42 @@ class Comparison(db.Model):
             'metadata': self.comparison_metadata  # Keep 'metadata' key for API compatibility
         }
     
+    def get_summary(self):
+        """Get result counts by change type and field
+        
+        Uses the summary stored in comparison_metadata when the comparison was saved;
+        comparisons saved before summaries existed fall back to grouped COUNT queries.
+        
+        Returns:
+            Dictionary with by_change_type, by_field, records_touched and total
+        """
+        metadata = self.comparison_metadata if isinstance(self.comparison_metadata, dict) else {}
+        if isinstance(metadata.get('summary'), dict):
+            return metadata['summary']
+        
+        rows = db.session.query(
+            ComparisonResult.change_type,
+            ComparisonResult.field_name,
+            db.func.count(ComparisonResult.id)
+        ).filter_by(comparison_id=self.id).group_by(
+            ComparisonResult.change_type, ComparisonResult.field_name
+        ).all()
+        records_touched = db.session.query(
+            db.func.count(db.distinct(ComparisonResult.record_id))
+        ).filter_by(comparison_id=self.id).scalar() or 0
+        
+        by_change_type = {}
+        by_field = {}
+        for change_type, field_name, count in rows:
+            by_change_type[change_type] = by_change_type.get(change_type, 0) + count
+            by_field[field_name] = by_field.get(field_name, 0) + count
+        return {
+            'by_change_type': by_change_type,
+            'by_field': by_field,
+            'records_touched': records_touched,
+            'total': sum(by_change_type.values())
+        }
+    
     def __repr__(self):
         return f'<Comparison {self.id} - Project {self.project_id}>'
 
@@ -34,6 +76,12 @@ class Comparison(db.Model):
 class ComparisonResult(db.Model):
     """Individual comparison result model"""
     __tablename__ = 'comparison_results'
+    __table_args__ = (
+        # Results page and API: all results of a comparison, paged by id
+        db.Index('ix_comparison_results_comparison', 'comparison_id', 'id'),
+        # Per-comparison counts and filters by change type / field
+        db.Index('ix_comparison_results_comparison_type', 'comparison_id', 'change_type', 'field_name'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     comparison_id = db.Column(db.Integer, db.ForeignKey('comparisons.id'), nullable=False)
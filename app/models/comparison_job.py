@@ -0,0 +1,88 @@
+from datetime import datetime
+from app import db
+
+
+class ComparisonJob(db.Model):
+    """Comparison execution running outside the web request"""
+    __tablename__ = 'comparison_jobs'
+    __table_args__ = (
+        # Job listings per project ordered by creation date
+        db.Index('ix_comparison_jobs_project_created', 'project_id', 'created_at'),
+        # Workers claiming the oldest queued job
+        db.Index('ix_comparison_jobs_status', 'status', 'id'),
+        # Partition jobs of a partitioned comparison
+        db.Index('ix_comparison_jobs_parent', 'parent_job_id', 'partition_index'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    status = db.Column(db.String(50), default='queued')  # queued, running, waiting, completed, failed, cancelled
+    
+    # Current step: queued, reading_source, reading_target, comparing, enriching, saving, done
+    # (partitioned comparisons: planning, partitioned, merging, done)
+    phase = db.Column(db.String(50), default='queued')
+    
+    # Comparison parameters (primary_keys, key_mappings, ignored_columns, source_table, target_table)
+    params = db.Column(db.JSON)
+    
+    # Counters: source_rows, target_rows, rows_read, records_total, records_compared, differences_found
+    progress = db.Column(db.JSON)
+    
+    # Set by the cancel endpoint, checked by the running job between chunks
+    cancel_requested = db.Column(db.Boolean, default=False)
+    
+    comparison_id = db.Column(db.Integer, db.ForeignKey('comparisons.id'))
+    error = db.Column(db.Text)
+    
+    # Partitioned comparisons: the coordinator job plans key partitions and queues one
+    # partition job each (parent_job_id, partition_index and the key condition in
+    # partition_spec); the partitions write into the coordinator's comparison
+    parent_job_id = db.Column(db.Integer, db.ForeignKey('comparison_jobs.id'))
+    partition_index = db.Column(db.Integer)
+    partition_spec = db.Column(db.JSON)
+    
+    # Scheduled task that queued the job (its run status is updated when the job finishes)
+    scheduled_task_id = db.Column(db.Integer, db.ForeignKey('scheduled_tasks.id'))
+    
+    # Claim bookkeeping: process that runs the job, number of claims and last sign of life
+    worker_id = db.Column(db.String(200))
+    attempts = db.Column(db.Integer, default=0)
+    heartbeat_at = db.Column(db.DateTime)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+    
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+    
+    def to_dict(self):
+        """Convert job to dictionary"""
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'phase': self.phase,
+            'params': self.params or {},
+            'progress': self.progress or {},
+            'cancel_requested': bool(self.cancel_requested),
+            'comparison_id': self.comparison_id,
+            'error': self.error,
+            'parent_job_id': self.parent_job_id,
+            'partition_index': self.partition_index,
+            'scheduled_task_id': self.scheduled_task_id,
+            'worker_id': self.worker_id,
+            'attempts': self.attempts or 0,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ComparisonJob {self.id} - Project {self.project_id} ({self.status})>'
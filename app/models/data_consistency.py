@@ -26,6 +26,24 @@ class DataConsistencyConfig(db.Model):
     # These are the fields that will be compared for consistency
     comparison_fields = db.Column(db.JSON, nullable=False)
     
+    # How results are stored:
+    # "per_field" - one result row per inconsistent field
+    # "compact" - one result row per join key, with the inconsistent fields in field_mismatches
+    result_mode = db.Column(db.String(20), default='per_field')
+    
+    # Optional schedule, same options as ScheduledTask ('interval', 'cron', 'preset')
+    schedule_type = db.Column(db.String(50))
+    schedule_value = db.Column(db.String(200))
+    
+    # Optional incremental mode: only rows whose watermark column (e.g. updated_at) grew
+    # since the last completed check are re-validated
+    watermark_column = db.Column(db.String(200))
+    target_watermark_column = db.Column(db.String(200))
+    
+    # Optional partitioned mode: full checks read and compare this many join-key partitions
+    # one at a time instead of both whole tables (None or 1 disables it)
+    partition_count = db.Column(db.Integer)
+    
     # User who created this config
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
@@ -52,6 +70,12 @@ class DataConsistencyConfig(db.Model):
             'target_table': self.target_table,
             'join_mappings': self.join_mappings or {},
             'comparison_fields': self.comparison_fields or [],
+            'result_mode': self.result_mode or 'per_field',
+            'schedule_type': self.schedule_type,
+            'schedule_value': self.schedule_value,
+            'watermark_column': self.watermark_column,
+            'target_watermark_column': self.target_watermark_column,
+            'partition_count': self.partition_count,
             'user_id': self.user_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
@@ -65,6 +89,10 @@ class DataConsistencyConfig(db.Model):
 class DataConsistencyCheck(db.Model):
     """Model to store data consistency check executions"""
     __tablename__ = 'data_consistency_checks'
+    __table_args__ = (
+        # Check history per config ordered by execution date
+        db.Index('ix_data_consistency_checks_config_executed', 'config_id', 'executed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     config_id = db.Column(db.Integer, db.ForeignKey('data_consistency_configs.id'), nullable=False)
@@ -94,6 +122,10 @@ class DataConsistencyCheck(db.Model):
 class DataConsistencyResult(db.Model):
     """Model to store individual data consistency check results"""
     __tablename__ = 'data_consistency_results'
+    __table_args__ = (
+        # Results of a consistency check
+        db.Index('ix_data_consistency_results_check', 'check_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     check_id = db.Column(db.Integer, db.ForeignKey('data_consistency_checks.id'), nullable=False)
@@ -115,6 +147,10 @@ class DataConsistencyResult(db.Model):
     # "missing_in_source" - record exists in target but not in source
     inconsistency_type = db.Column(db.String(50), nullable=False)
     
+    # Compact results only (field_name is "*"):
+    # {"nome": {"source_value": "Ana", "target_value": "Anna"}, ...}
+    field_mismatches = db.Column(db.JSON)
+    
     detected_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -127,6 +163,7 @@ class DataConsistencyResult(db.Model):
             'source_value': self.source_value,
             'target_value': self.target_value,
             'inconsistency_type': self.inconsistency_type,
+            'field_mismatches': self.field_mismatches,
             'detected_at': self.detected_at.isoformat() if self.detected_at else None
         }
     
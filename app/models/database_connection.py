@@ -41,26 +41,20 @@ class DatabaseConnection(db.Model):
         }
     
     def get_decrypted_config(self):
-        """Get decrypted database configuration"""
+        """Get decrypted database configuration (cached briefly per connection)"""
+        from app.utils.encryption import DecryptedConfigCache
+        return DecryptedConfigCache.get_or_decrypt('connection', self.id, self.db_config, self._decrypt_config)
+    
+    def _decrypt_config(self):
         from app.utils.encryption import decrypt_db_config
         decrypted = decrypt_db_config(self.db_config)
         
-        # Debug: Log password status
+        # Warn when a stored password could not be decrypted (usually a different ENCRYPTION_KEY)
         if self.db_type.lower() in ['mariadb', 'mysql']:
             original_pwd = self.db_config.get('password', '') if isinstance(self.db_config, dict) else ''
             decrypted_pwd = decrypted.get('password', '') if isinstance(decrypted, dict) else ''
-            
-            if original_pwd:
-                is_encrypted = isinstance(original_pwd, str) and original_pwd.startswith('gAAAAAB')
-                pwd_length = len(str(decrypted_pwd)) if decrypted_pwd else 0
-                print(f"DEBUG Connection {self.id} ({self.name}):")
-                print(f"  - Original encrypted: {is_encrypted}")
-                print(f"  - Original length: {len(str(original_pwd))}")
-                print(f"  - Decrypted length: {pwd_length}")
-                print(f"  - Decrypted empty: {not decrypted_pwd}")
-                if not decrypted_pwd and original_pwd:
-                    print(f"  - WARNING: Password was lost during decryption!")
-                    print(f"  - Original (first 20 chars): {str(original_pwd)[:20]}...")
+            if original_pwd and not decrypted_pwd:
+                print(f"WARNING: Password of connection {self.id} ({self.name}) was lost during decryption!")
         
         return decrypted
     
@@ -28,6 +28,9 @@ class ScheduledTask(db.Model):
     next_run_at = db.Column(db.DateTime)
     last_run_status = db.Column(db.String(50))  # 'success', 'failed', 'running'
     last_run_message = db.Column(db.Text)
+    # Timings of the last run: overhead_ms (app context, run lock and task load before the
+    # comparison starts), duration_ms and comparison_id
+    last_run_metadata = db.Column(db.JSON)
     
     # Execution count
     total_runs = db.Column(db.Integer, default=0)
@@ -59,6 +62,7 @@ class ScheduledTask(db.Model):
             'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
             'last_run_status': self.last_run_status,
             'last_run_message': self.last_run_message,
+            'last_run_metadata': self.last_run_metadata or {},
             'total_runs': self.total_runs,
             'successful_runs': self.successful_runs,
             'failed_runs': self.failed_runs,
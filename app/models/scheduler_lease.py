@@ -0,0 +1,41 @@
+from datetime import datetime
+from app import db
+
+
+class SchedulerLease(db.Model):
+    """Named lease held by one process until it expires
+    
+    The 'scheduler' lease elects the process that runs the scheduled jobs; the other
+    leases ('scheduled_task_<id>', 'consistency_config_<id>', ...) keep two processes
+    from running the same job at the same time.
+    """
+    __tablename__ = 'scheduler_leases'
+    
+    name = db.Column(db.String(200), primary_key=True)
+    holder = db.Column(db.String(200))  # host:pid:nonce of the owning process
+    acquired_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
+    
+    # Bumped when a process that is not the leader changes scheduled tasks; the leader
+    # reloads its jobs when it sees a new version
+    version = db.Column(db.Integer, default=0)
+    
+    @property
+    def is_expired(self):
+        return self.expires_at is None or self.expires_at <= datetime.utcnow()
+    
+    def to_dict(self):
+        """Convert lease to dictionary"""
+        return {
+            'name': self.name,
+            'holder': self.holder,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'expired': self.is_expired,
+            'version': self.version or 0
+        }
+    
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} ({self.holder})>'
@@ -74,12 +74,19 @@ class WebhookConfig(db.Model):
         }
     
     def get_decrypted_auth_config(self):
-        """Get decrypted authentication configuration"""
-        from app.utils.encryption import PasswordEncryption
+        """Get decrypted authentication configuration (cached briefly per webhook)"""
+        from app.utils.encryption import DecryptedConfigCache
         
         if not self.auth_config:
             return {}
         
+        return DecryptedConfigCache.get_or_decrypt(
+            'webhook', self.id, [self.auth_type, self.auth_config], self._decrypt_auth_config
+        )
+    
+    def _decrypt_auth_config(self):
+        from app.utils.encryption import PasswordEncryption
+        
         auth_config = self.auth_config.copy()
         
         # Decrypt passwords based on auth type
@@ -1,11 +1,19 @@
-from flask import Blueprint, request, jsonify
-from app.models.comparison import Comparison, ComparisonResult, ComparisonProfile
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+import json
+from app.models.comparison import Comparison, ComparisonProfile
+from app.models.comparison_job import ComparisonJob
 from app.models.project import Project
 from app.models.change_log import ChangeLog
 from app import db
 from app.utils.security import token_required
 from app.services.comparison_service import ComparisonService
-from app.services.database import DatabaseService
+from app.services.comparison_job_service import ComparisonJobService
+from app.services.rollup_service import RollupService
+from app.services.results_service import ResultsService
+from app.services.export_service import ExportService
+from app.utils.dashboard_cache import DashboardCache
+from sqlalchemy import select
+from datetime import datetime
 
 comparisons_bp = Blueprint('comparisons', __name__)
 
@@ -13,7 +21,15 @@ comparisons_bp = Blueprint('comparisons', __name__)
 @comparisons_bp.route('/project/<int:project_id>', methods=['POST'])
 @token_required
 def run_comparison(user, project_id):
-    """Run comparison for a project - admins can run any project"""
+    """Run comparison for a project - admins can run any project
+    
+    The comparison runs as a background job: the response (HTTP 202) carries the job, whose
+    phase and progress are polled at GET /api/comparisons/jobs/<job_id>. Send wait: true to
+    run it inside the request and get the saved comparison back (HTTP 200).
+    
+    partitions: N (> 1) splits the comparison into N primary key partitions, each run as its
+    own job by any worker, and merged into one comparison when all finish.
+    """
     if user.is_admin:
         project = Project.query.filter_by(id=project_id, is_active=True).first()
     else:
@@ -24,74 +40,126 @@ def run_comparison(user, project_id):
     
     try:
         # Get primary keys and table names from request or use project defaults
-        data = request.get_json() or {}
-        primary_keys = data.get('primary_keys', [])
-        key_mappings = data.get('key_mappings', {})  # Mapping from source to target column names
-        ignored_columns = data.get('ignored_columns', [])  # Columns to ignore during comparison
-        source_table = data.get('source_table', project.source_table)
-        target_table = data.get('target_table', project.target_table)
-        
-        print(f"[MANUAL_COMPARISON] ========== MANUAL COMPARISON START ==========", flush=True)
-        print(f"[MANUAL_COMPARISON] Starting manual comparison for project {project_id}", flush=True)
-        print(f"[MANUAL_COMPARISON] Source table: {source_table}, Target table: {target_table}", flush=True)
-        print(f"[MANUAL_COMPARISON] Key mappings from request: {key_mappings}", flush=True)
-        print(f"[MANUAL_COMPARISON] Key mappings type: {type(key_mappings)}, empty: {not key_mappings}, length: {len(key_mappings) if isinstance(key_mappings, dict) else 0}", flush=True)
-        if key_mappings:
-            print(f"[MANUAL_COMPARISON] Key mappings content: {list(key_mappings.items())}", flush=True)
-        else:
-            print(f"[MANUAL_COMPARISON] WARNING: Key mappings are EMPTY!", flush=True)
-        
-        # Get connection configs
-        source_config = project.source_connection.get_decrypted_config()
-        source_config['type'] = project.source_connection.db_type
-        
-        target_config = project.target_connection.get_decrypted_config()
-        target_config['type'] = project.target_connection.db_type
-        
-        # If not provided, try to get from source table (already decrypted)
-        if not primary_keys:
-            source_engine = DatabaseService.get_engine(source_config, already_decrypted=True)
-            primary_keys = DatabaseService.get_primary_keys(source_engine, source_table)
+        data = request.get_json(silent=True) or {}
+        params = {
+            'primary_keys': data.get('primary_keys', []),
+            'key_mappings': data.get('key_mappings', {}),  # Mapping from source to target column names
+            'ignored_columns': data.get('ignored_columns', []),  # Columns to ignore during comparison
+            'source_table': data.get('source_table', project.source_table),
+            'target_table': data.get('target_table', project.target_table)
+        }
         
-        print(f"[MANUAL_COMPARISON] Primary keys: {primary_keys}", flush=True)
-        print(f"[MANUAL_COMPARISON] Starting comparison with key_mappings={key_mappings}...", flush=True)
+        partitions = data.get('partitions')
+        if partitions is not None:
+            max_partitions = int(current_app.config.get('COMPARISON_MAX_PARTITIONS', 256))
+            if isinstance(partitions, bool) or not isinstance(partitions, int) or not 1 <= partitions <= max_partitions:
+                return jsonify({'message': f'partitions must be an integer between 1 and {max_partitions}'}), 400
+            if partitions > 1 and data.get('wait'):
+                return jsonify({'message': 'Partitioned comparisons always run as background jobs (remove wait)'}), 400
+            params['partitions'] = partitions
         
-        # Run comparison with key mappings and ignored columns
-        differences_df, differences = ComparisonService.compare_tables(
-            source_config,
-            target_config,
-            source_table,
-            target_table,
-            primary_keys,
-            key_mappings,
-            ignored_columns
-        )
+        print(f"[MANUAL_COMPARISON] Comparison requested for project {project_id}: {params['source_table']} -> {params['target_table']}", flush=True)
+        print(f"[MANUAL_COMPARISON] Key mappings from request: {params['key_mappings']}", flush=True)
         
-        print(f"[MANUAL_COMPARISON] Comparison completed. Differences found: {len(differences)}", flush=True)
-        print(f"[MANUAL_COMPARISON] DataFrame shape: {differences_df.shape if not differences_df.empty else 'empty'}", flush=True)
+        if not data.get('wait'):
+            job = ComparisonJobService.queue_job(project, user.id, params)
+            return jsonify({
+                'message': 'Comparison started',
+                'job': job.to_dict()
+            }), 202
         
-        # Save results
-        comparison = ComparisonService.save_comparison_results(
-            project_id,
-            differences,
-            metadata={
-                'primary_keys': primary_keys,
-                'key_mappings': key_mappings,
-                'ignored_columns': ignored_columns,
-                'total_source_rows': len(differences_df) if not differences_df.empty else 0
-            }
-        )
+        comparison, total_differences = ComparisonJobService.run_project_comparison(project, params)
         
         return jsonify({
             'message': 'Comparison completed',
             'comparison': comparison.to_dict(),
-            'total_differences': len(differences)
+            'total_differences': total_differences
         }), 200
     
     except Exception as e:
         return jsonify({'message': f'Error running comparison: {str(e)}'}), 500
 
 
+def _get_job_for_user(user, job_id):
+    """Return (job, error response) - admins see every job, users the jobs of their projects"""
+    job = db.session.get(ComparisonJob, job_id)
+    if not job:
+        return None, (jsonify({'message': 'Comparison job not found'}), 404)
+    
+    if not user.is_admin and job.user_id != user.id:
+        project = db.session.get(Project, job.project_id)
+        if not project or project.user_id != user.id:
+            return None, (jsonify({'message': 'Unauthorized'}), 403)
+    return job, None
+
+
+@comparisons_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_comparison_job(user, job_id):
+    """Get a comparison job (status, phase and progress counters, plus its partition jobs)"""
+    job, error = _get_job_for_user(user, job_id)
+    if error:
+        return error
+    
+    payload = job.to_dict()
+    partitions = ComparisonJob.query.filter_by(parent_job_id=job.id).order_by(ComparisonJob.partition_index).all()
+    if partitions:
+        payload['partitions'] = [
+            {
+                'id': partition.id,
+                'partition_index': partition.partition_index,
+                'status': partition.status,
+                'phase': partition.phase,
+                'attempts': partition.attempts or 0,
+                'worker_id': partition.worker_id,
+                'differences_found': (partition.progress or {}).get('differences_found'),
+                'error': partition.error
+            }
+            for partition in partitions
+        ]
+    return jsonify({'job': payload}), 200
+
+
+@comparisons_bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@token_required
+def retry_comparison_job(user, job_id):
+    """Queue the failed and cancelled partitions of a finished partitioned comparison again"""
+    job, error = _get_job_for_user(user, job_id)
+    if error:
+        return error
+    
+    if job.status not in ('failed', 'cancelled') or not job.comparison_id or job.parent_job_id:
+        return jsonify({'message': 'Only failed or cancelled partitioned comparison jobs can be retried'}), 409
+    
+    try:
+        retried = ComparisonJobService.retry_partitions(job)
+        if not retried:
+            return jsonify({'message': 'No failed partitions to retry', 'job': job.to_dict()}), 409
+        return jsonify({'message': f'{retried} partitions queued again', 'job': job.to_dict()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error retrying comparison job: {str(e)}'}), 500
+
+
+@comparisons_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@token_required
+def cancel_comparison_job(user, job_id):
+    """Cancel a comparison job - a running job stops at its next progress checkpoint"""
+    job, error = _get_job_for_user(user, job_id)
+    if error:
+        return error
+    
+    if job.is_finished:
+        return jsonify({'message': f'Comparison job already {job.status}', 'job': job.to_dict()}), 409
+    
+    try:
+        job = ComparisonJobService.request_cancel(job)
+        return jsonify({'message': 'Cancellation requested', 'job': job.to_dict()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error cancelling comparison job: {str(e)}'}), 500
+
+
 @comparisons_bp.route('/project/<int:project_id>', methods=['GET'])
 @token_required
 def get_comparisons(user, project_id):
@@ -130,6 +198,9 @@ def delete_all_comparisons(user, project_id):
         
         print(f"[DELETE_ALL_COMPARISONS] Deleting {len(comparison_ids)} comparisons for project {project_id} only", flush=True)
         
+        # Remove their change logs from the dashboard rollups before deleting them
+        RollupService.remove_comparisons(comparison_ids)
+        
         # Delete related change logs first (only for this project's comparisons)
         deleted_change_logs = 0
         for comparison_id in comparison_ids:
@@ -143,6 +214,7 @@ def delete_all_comparisons(user, project_id):
             db.session.delete(comparison)
         
         db.session.commit()
+        DashboardCache.invalidate(project_id)
         
         print(f"[DELETE_ALL_COMPARISONS] Successfully deleted {len(comparison_ids)} comparisons and {deleted_change_logs} change logs for project {project_id}", flush=True)
         
@@ -163,39 +235,75 @@ def delete_all_comparisons(user, project_id):
 @comparisons_bp.route('', methods=['GET'])
 @token_required
 def get_all_comparisons(user):
-    """Get all comparisons for all user projects"""
-    # Get all user projects
-    user_projects = Project.query.filter_by(user_id=user.id, is_active=True).all()
-    project_ids = [p.id for p in user_projects]
-    
-    if not project_ids:
-        return jsonify({'comparisons': []}), 200
-    
-    # Get all comparisons for user projects
-    comparisons = Comparison.query.filter(
-        Comparison.project_id.in_(project_ids)
-    ).order_by(Comparison.executed_at.desc()).all()
-    
-    # Include project info in response
-    comparisons_data = []
-    for comp in comparisons:
-        comp_dict = comp.to_dict()
-        project = next((p for p in user_projects if p.id == comp.project_id), None)
-        if project:
-            comp_dict['project_name'] = project.name
-            comp_dict['project_source_table'] = project.source_table
-            comp_dict['project_target_table'] = project.target_table
-        comparisons_data.append(comp_dict)
+    """Get comparisons for all user projects, newest first, in keyset pages
     
-    return jsonify({
-        'comparisons': comparisons_data
-    }), 200
+    Query parameters: project_id, status, start_date, end_date (ISO dates),
+    limit and cursor (next_cursor of the previous page).
+    """
+    filters = {'status': request.args.get('status')}
+    try:
+        project_id = request.args.get('project_id')
+        if project_id:
+            filters['project_id'] = int(project_id)
+        for name in ('start_date', 'end_date'):
+            value = request.args.get(name)
+            if value:
+                filters[name] = datetime.fromisoformat(value)
+    except ValueError:
+        return jsonify({'message': 'Invalid project_id or date parameter'}), 400
+    
+    limit = request.args.get('limit', current_app.config.get('COMPARISONS_PAGE_SIZE', 50), type=int)
+    limit = max(1, min(limit, current_app.config.get('COMPARISONS_MAX_PAGE_SIZE', 500)))
+    
+    try:
+        page = ComparisonService.list_comparisons(
+            user.id, filters, limit=limit, cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    page['limit'] = limit
+    return jsonify(page), 200
+
+
+def _results_request_params():
+    """Read result filters, column selection and cursor from the query string
+    
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    filters = {
+        'field_name': request.args.get('field_name'),
+        'change_type': request.args.get('change_type'),
+        'record_id_prefix': request.args.get('record_id_prefix')
+    }
+    columns = ResultsService.parse_columns(request.args.get('fields'), request.args.get('exclude'))
+    after_id = request.args.get('after_id')
+    if after_id is not None:
+        try:
+            after_id = int(after_id)
+        except ValueError:
+            raise ValueError('after_id must be an integer')
+    sort = request.args.get('sort', 'id')
+    if sort not in ResultsService.SORT_COLUMNS:
+        raise ValueError(f"sort must be one of: {', '.join(ResultsService.SORT_COLUMNS)}")
+    descending = request.args.get('order', 'asc').lower() == 'desc'
+    return filters, columns, after_id, sort, descending
 
 
 @comparisons_bp.route('/<int:comparison_id>/results', methods=['GET'])
 @token_required
 def get_comparison_results(user, comparison_id):
-    """Get results for a specific comparison"""
+    """Get one page of results for a specific comparison
+    
+    Query parameters:
+        limit: Page size (default RESULTS_PAGE_SIZE, capped at RESULTS_MAX_PAGE_SIZE)
+        after_id: Cursor returned as next_cursor by the previous page (default id ascending sort)
+        cursor: Cursor returned as next_cursor by the previous page (any other sort)
+        sort / order: Sort column (id, record_id, field_name, change_type, detected_at) and asc/desc
+        field_name, change_type, record_id_prefix: Filters
+        fields / exclude: Comma-separated columns to include / leave out (e.g. exclude=target_record_json)
+    """
     comparison = Comparison.query.get(comparison_id)
     
     if not comparison:
@@ -206,14 +314,144 @@ def get_comparison_results(user, comparison_id):
     if project.user_id != user.id:
         return jsonify({'message': 'Unauthorized'}), 403
     
-    results = ComparisonResult.query.filter_by(comparison_id=comparison_id).all()
+    limit = request.args.get('limit', current_app.config.get('RESULTS_PAGE_SIZE', 500), type=int)
+    limit = max(1, min(limit, current_app.config.get('RESULTS_MAX_PAGE_SIZE', 5000)))
+    
+    try:
+        filters, columns, after_id, sort, descending = _results_request_params()
+        page = ResultsService.get_page(
+            comparison_id, columns, filters, after_id, limit,
+            sort=sort, descending=descending, cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
     return jsonify({
         'comparison': comparison.to_dict(),
-        'results': [result.to_dict() for result in results]
+        'summary': comparison.get_summary(),
+        'results': page['results'],
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more'],
+        'limit': limit
     }), 200
 
 
+@comparisons_bp.route('/<int:comparison_id>/results/stream', methods=['GET'])
+@token_required
+def stream_comparison_results(user, comparison_id):
+    """Stream results for a specific comparison as NDJSON (one JSON object per line)
+    
+    Accepts the same filters, column selection, sort and after_id cursor as the paged endpoint.
+    """
+    comparison = Comparison.query.get(comparison_id)
+    
+    if not comparison:
+        return jsonify({'message': 'Comparison not found'}), 404
+    
+    # Verify project ownership
+    project = Project.query.get(comparison.project_id)
+    if project.user_id != user.id:
+        return jsonify({'message': 'Unauthorized'}), 403
+    
+    try:
+        filters, columns, after_id, sort, descending = _results_request_params()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    def generate():
+        for result in ResultsService.iter_results(comparison_id, columns, filters, after_id, sort, descending):
+            yield json.dumps(result, default=str) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@comparisons_bp.route('/<int:comparison_id>/results/export', methods=['GET'])
+@token_required
+def export_comparison_results(user, comparison_id):
+    """Export results for a specific comparison as a streamed file
+    
+    Query parameters:
+        format: csv (default), xlsx or parquet
+        gzip: true to compress the download
+        Also accepts the filters, column selection and sort of the paged endpoint.
+    """
+    comparison = Comparison.query.get(comparison_id)
+    
+    if not comparison:
+        return jsonify({'message': 'Comparison not found'}), 404
+    
+    # Verify project ownership
+    project = Project.query.get(comparison.project_id)
+    if project.user_id != user.id:
+        return jsonify({'message': 'Unauthorized'}), 403
+    
+    try:
+        filters, columns, after_id, sort, descending = _results_request_params()
+        stmt = ResultsService.build_query(comparison_id, columns, filters, after_id, sort, descending)
+        chunks, headers, mimetype = ExportService.export(
+            stmt,
+            [(name, ResultsService.COLUMN_KINDS[name]) for name in columns],
+            request.args.get('format', 'csv').lower(),
+            f"comparison_{comparison_id}_results",
+            use_gzip=request.args.get('gzip', 'false').lower() in ('true', '1')
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+@comparisons_bp.route('/project/<int:project_id>/change-logs/export', methods=['GET'])
+@token_required
+def export_change_logs(user, project_id):
+    """Export change logs of a project as a streamed file
+    
+    Query parameters:
+        format: csv (default), xlsx or parquet
+        gzip: true to compress the download
+        start_date / end_date: Optional detected_at range (ISO format)
+        sent: true/false to export only sent or unsent changes
+    """
+    project = Project.query.filter_by(id=project_id, user_id=user.id).first()
+    
+    if not project:
+        return jsonify({'message': 'Project not found'}), 404
+    
+    columns = [
+        ('id', 'int'), ('project_id', 'int'), ('comparison_id', 'int'), ('record_id', 'str'),
+        ('field_name', 'str'), ('old_value', 'str'), ('new_value', 'str'), ('change_type', 'str'),
+        ('detected_at', 'datetime'), ('sent_to_api', 'bool'), ('sent_at', 'datetime'), ('api_response', 'json')
+    ]
+    stmt = select(*[getattr(ChangeLog, name) for name, _ in columns]).where(ChangeLog.project_id == project_id)
+    
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        try:
+            if start_date:
+                stmt = stmt.where(ChangeLog.detected_at >= datetime.fromisoformat(start_date.rstrip('Z')))
+            if end_date:
+                stmt = stmt.where(ChangeLog.detected_at <= datetime.fromisoformat(end_date.rstrip('Z')))
+        except ValueError:
+            raise ValueError('start_date and end_date must be ISO date/times')
+        
+        sent = request.args.get('sent')
+        if sent is not None:
+            stmt = stmt.where(ChangeLog.sent_to_api == (sent.lower() in ('true', '1')))
+        
+        chunks, headers, mimetype = ExportService.export(
+            stmt.order_by(ChangeLog.id),
+            columns,
+            request.args.get('format', 'csv').lower(),
+            f"project_{project_id}_change_logs",
+            use_gzip=request.args.get('gzip', 'false').lower() in ('true', '1')
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
 @comparisons_bp.route('/project/<int:project_id>/send-changes', methods=['POST'])
 @token_required
 def send_changes_to_api(user, project_id):
@@ -256,7 +494,8 @@ def delete_comparison(user, comparison_id):
         return jsonify({'message': 'Unauthorized'}), 403
     
     try:
-        # Delete related change logs first (if any)
+        # Remove change logs from the dashboard rollups, then delete them (if any)
+        RollupService.remove_comparisons([comparison_id])
         change_logs = ChangeLog.query.filter_by(comparison_id=comparison_id).all()
         for change_log in change_logs:
             db.session.delete(change_log)
@@ -264,6 +503,7 @@ def delete_comparison(user, comparison_id):
         # Delete comparison (cascade will delete results)
         db.session.delete(comparison)
         db.session.commit()
+        DashboardCache.invalidate(project.id)
         
         return jsonify({
             'message': 'Comparison deleted successfully'
@@ -3,8 +3,10 @@ from app.models.database_connection import DatabaseConnection
 from app.models.user import User
 from app import db
 from app.utils.security import token_required
-from app.utils.encryption import encrypt_db_config
+from app.utils.encryption import encrypt_db_config, DecryptedConfigCache
 from app.services.database import DatabaseService
+from app.utils.engine_registry import EngineRegistry
+from app.utils.schema_cache import SchemaCache
 
 connections_bp = Blueprint('connections', __name__)
 
@@ -25,6 +27,26 @@ def get_connections(user):
     }), 200
 
 
+@connections_bp.route('/pool/stats', methods=['GET'])
+@token_required
+def get_pool_stats(user):
+    """Get engine registry counters and pool status - admins see all engines, regular users only their connections'"""
+    if user.is_admin:
+        return jsonify(EngineRegistry.get_stats()), 200
+    
+    connection_ids = {
+        conn_id for (conn_id,) in db.session.query(DatabaseConnection.id).filter_by(user_id=user.id).all()
+    }
+    return jsonify(EngineRegistry.get_stats(connection_ids)), 200
+
+
+@connections_bp.route('/schema-cache/stats', methods=['GET'])
+@token_required
+def get_schema_cache_stats(user):
+    """Get hit/miss counters of the table, column and primary key metadata cache"""
+    return jsonify(SchemaCache.get_stats()), 200
+
+
 @connections_bp.route('/<int:connection_id>', methods=['GET'])
 @token_required
 def get_connection(user, connection_id):
@@ -120,6 +142,8 @@ def update_connection(user, connection_id):
     
     try:
         db.session.commit()
+        EngineRegistry.invalidate(connection.id)
+        DecryptedConfigCache.invalidate('connection', connection.id)
         return jsonify({
             'message': 'Connection updated successfully',
             'connection': connection.to_dict()
@@ -148,6 +172,8 @@ def delete_connection(user, connection_id):
     
     try:
         db.session.commit()
+        EngineRegistry.invalidate(connection.id)
+        DecryptedConfigCache.invalidate('connection', connection.id)
         return jsonify({'message': 'Connection deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -184,7 +210,7 @@ def test_connection(user, connection_id):
                 }), 200
         
         # Test connection (already decrypted, so pass already_decrypted=True)
-        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
         with engine.connect() as conn:
             from sqlalchemy import text
             conn.execute(text("SELECT 1"))
@@ -229,7 +255,7 @@ def get_connection_tables(user, connection_id):
             return jsonify({
                 'message': 'Configuração de conexão não encontrada'
             }), 400
-            
+        
         decrypted_config['type'] = connection.db_type
         
         # Verify password exists
@@ -242,7 +268,7 @@ def get_connection_tables(user, connection_id):
         
         # Get tables (already decrypted, so pass already_decrypted=True)
         try:
-            engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+            engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
         except Exception as engine_error:
             return jsonify({
                 'message': f'Erro ao criar conexão com o banco: {str(engine_error)}'
@@ -276,10 +302,50 @@ def get_connection_tables(user, connection_id):
         }), 500
 
 
+@connections_bp.route('/<int:connection_id>/schema', methods=['GET'])
+@token_required
+def get_connection_schema(user, connection_id):
+    """Get all tables with columns, primary keys, indexes and estimated row counts in one call
+    
+    Query parameters: refresh=true to reload the cached schema.
+    """
+    if user.is_admin:
+        connection = DatabaseConnection.query.filter_by(id=connection_id).first()
+    else:
+        connection = DatabaseConnection.query.filter_by(
+            id=connection_id, 
+            user_id=user.id
+        ).first()
+    
+    if not connection:
+        return jsonify({'message': 'Connection not found'}), 404
+    
+    try:
+        decrypted_config = connection.get_decrypted_config()
+        decrypted_config['type'] = connection.db_type
+        
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
+        snapshot = DatabaseService.get_schema_snapshot(
+            engine, refresh=request.args.get('refresh', 'false').lower() == 'true'
+        )
+        
+        return jsonify({
+            'connection_id': connection.id,
+            'dialect': snapshot['dialect'],
+            'table_count': len(snapshot['tables']),
+            'tables': snapshot['tables']
+        }), 200
+    except Exception as e:
+        return jsonify({'message': f'Erro ao carregar esquema: {str(e)}'}), 500
+
+
 @connections_bp.route('/<int:connection_id>/tables/<table_name>/info', methods=['GET'])
 @token_required
 def get_table_info(user, connection_id, table_name):
-    """Get table information - admins can access any, regular users only their own"""
+    """Get table information - admins can access any, regular users only their own
+    
+    The row count is the catalog estimate unless exact_count=true is passed.
+    """
     if user.is_admin:
         connection = DatabaseConnection.query.filter_by(id=connection_id).first()
     else:
@@ -297,15 +363,18 @@ def get_table_info(user, connection_id, table_name):
         decrypted_config['type'] = connection.db_type
         
         # Get table info (already decrypted, so pass already_decrypted=True)
-        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
         columns = DatabaseService.get_table_columns(engine, table_name)
         primary_keys = DatabaseService.get_primary_keys(engine, table_name)
-        row_count = DatabaseService.get_table_row_count(engine, table_name)
+        row_count = DatabaseService.get_row_count(
+            engine, table_name, exact=request.args.get('exact_count', 'false').lower() == 'true'
+        )
         
         return jsonify({
             'columns': columns,
             'primary_keys': primary_keys,
-            'row_count': row_count
+            'row_count': row_count['row_count'],
+            'row_count_source': row_count['row_count_source']
         }), 200
     except Exception as e:
         return jsonify({'message': f'Error getting table info: {str(e)}'}), 500
@@ -1,14 +1,68 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.models.data_consistency import DataConsistencyConfig, DataConsistencyCheck, DataConsistencyResult
 from app.models.database_connection import DatabaseConnection
 from app import db
 from app.utils.security import token_required
 from app.services.database import DatabaseService
 from app.services.consistency_service import ConsistencyService
+from app.services.export_service import ExportService
+from app.services.scheduler_service import SchedulerService
+from sqlalchemy import select
 from datetime import datetime
 
 consistency_bp = Blueprint('consistency', __name__)
 
+# How check results are stored (see DataConsistencyConfig.result_mode)
+RESULT_MODES = ('per_field', 'compact')
+
+
+def _schedule_and_watermark(data, config=None):
+    """Validate the schedule, watermark and partition fields of a request body
+    
+    Returns:
+        Dictionary of the config attributes to set
+    
+    Raises:
+        ValueError: If the schedule is invalid
+    """
+    updates = {}
+    if 'schedule_type' in data or 'schedule_value' in data:
+        schedule_type = data.get('schedule_type', config.schedule_type if config else None) or None
+        schedule_value = data.get('schedule_value', config.schedule_value if config else None)
+        if schedule_type:
+            if schedule_value in (None, ''):
+                raise ValueError('schedule_value is required when schedule_type is set')
+            SchedulerService.get_trigger(schedule_type, str(schedule_value))
+            updates['schedule_type'] = schedule_type
+            updates['schedule_value'] = str(schedule_value)
+        else:
+            updates['schedule_type'] = None
+            updates['schedule_value'] = None
+    for field in ('watermark_column', 'target_watermark_column'):
+        if field in data:
+            updates[field] = data[field] or None
+    if 'partition_count' in data:
+        partition_count = data['partition_count']
+        if partition_count in (None, ''):
+            updates['partition_count'] = None
+        else:
+            try:
+                partition_count = int(partition_count)
+            except (TypeError, ValueError):
+                raise ValueError('partition_count must be an integer')
+            if partition_count < 0 or partition_count > 10000:
+                raise ValueError('partition_count must be between 0 and 10000')
+            updates['partition_count'] = partition_count or None
+    return updates
+
+
+def _sync_schedule(config_id):
+    """Update the scheduler job of a consistency config"""
+    try:
+        SchedulerService.add_consistency_config(config_id)
+    except Exception as e:
+        print(f"[SCHEDULER] Error scheduling consistency config {config_id}: {str(e)}")
+
 
 @consistency_bp.route('/configs', methods=['GET'])
 @token_required
@@ -85,6 +139,14 @@ def create_consistency_config(user):
     if len(data['comparison_fields']) == 0:
         return jsonify({'message': 'At least one comparison field is required'}), 400
     
+    if data.get('result_mode', 'per_field') not in RESULT_MODES:
+        return jsonify({'message': f"result_mode must be one of: {', '.join(RESULT_MODES)}"}), 400
+    
+    try:
+        extra_fields = _schedule_and_watermark(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
     try:
         config = DataConsistencyConfig(
             name=data['name'],
@@ -95,12 +157,17 @@ def create_consistency_config(user):
             target_table=data['target_table'],
             join_mappings=data['join_mappings'],
             comparison_fields=data['comparison_fields'],
-            user_id=user.id
+            result_mode=data.get('result_mode', 'per_field'),
+            user_id=user.id,
+            **extra_fields
         )
         
         db.session.add(config)
         db.session.commit()
         
+        if config.schedule_type:
+            _sync_schedule(config.id)
+        
         return jsonify({
             'message': 'Consistency config created successfully',
             'config': config.to_dict()
@@ -162,12 +229,24 @@ def update_consistency_config(user, config_id):
             if not isinstance(data['comparison_fields'], list) or len(data['comparison_fields']) == 0:
                 return jsonify({'message': 'comparison_fields must be a non-empty list'}), 400
             config.comparison_fields = data['comparison_fields']
+        if 'result_mode' in data:
+            if data['result_mode'] not in RESULT_MODES:
+                return jsonify({'message': f"result_mode must be one of: {', '.join(RESULT_MODES)}"}), 400
+            config.result_mode = data['result_mode']
         if 'is_active' in data:
             config.is_active = data['is_active']
+        try:
+            for field, value in _schedule_and_watermark(data, config).items():
+                setattr(config, field, value)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'message': str(e)}), 400
         
         config.updated_at = datetime.utcnow()
         db.session.commit()
         
+        _sync_schedule(config.id)
+        
         return jsonify({
             'message': 'Consistency config updated successfully',
             'config': config.to_dict()
@@ -193,6 +272,11 @@ def delete_consistency_config(user, config_id):
         db.session.delete(config)
         db.session.commit()
         
+        try:
+            SchedulerService.remove_consistency_config(config_id)
+        except Exception as e:
+            print(f"[SCHEDULER] Error removing consistency config {config_id}: {str(e)}")
+        
         return jsonify({'message': 'Consistency config deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -202,7 +286,13 @@ def delete_consistency_config(user, config_id):
 @consistency_bp.route('/configs/<int:config_id>/run', methods=['POST'])
 @token_required
 def run_consistency_check(user, config_id):
-    """Run a consistency check - admins can run any, regular users only their own"""
+    """Run a consistency check - admins can run any, regular users only their own
+    
+    Request body (optional):
+        background: true to return the pending check right away (HTTP 202) and run it on a
+            background worker; poll GET /api/consistency/checks/<check_id> for progress
+        full: true to check every row even when the config has an incremental watermark
+    """
     if user.is_admin:
         config = DataConsistencyConfig.query.filter_by(id=config_id).first()
     else:
@@ -214,13 +304,23 @@ def run_consistency_check(user, config_id):
     if not config.is_active:
         return jsonify({'message': 'Consistency config is not active'}), 400
     
+    data = request.get_json(silent=True) or {}
+    full = bool(data.get('full', False))
+    
+    if data.get('background'):
+        check = ConsistencyService.queue_check(config, full=full)
+        return jsonify({
+            'message': 'Consistency check started',
+            'check': check.to_dict()
+        }), 202
+    
     try:
-        check, inconsistencies = ConsistencyService.check_consistency(config)
+        check, total_inconsistencies = ConsistencyService.check_consistency(config, full=full)
         
         return jsonify({
             'message': 'Consistency check completed successfully',
             'check': check.to_dict(),
-            'total_inconsistencies': len(inconsistencies)
+            'total_inconsistencies': total_inconsistencies
         }), 200
     except Exception as e:
         import traceback
@@ -229,6 +329,47 @@ def run_consistency_check(user, config_id):
         return jsonify({'message': f'Error running consistency check: {str(e)}'}), 500
 
 
+@consistency_bp.route('/configs/run-batch', methods=['POST'])
+@token_required
+def run_consistency_batch(user):
+    """Queue several consistency configs to run with shared source/target table reads
+    
+    Request body (optional): config_ids - configs to run (default: all active configs
+    the user can run; admins can run any)
+    
+    Returns HTTP 202 with the pending checks right away; the batch runs on a background
+    worker, poll GET /api/consistency/checks/<check_id> for each check.
+    """
+    data = request.get_json(silent=True) or {}
+    
+    query = DataConsistencyConfig.query.filter_by(is_active=True)
+    if not user.is_admin:
+        query = query.filter_by(user_id=user.id)
+    
+    config_ids = data.get('config_ids')
+    if config_ids is not None:
+        if not isinstance(config_ids, list) or not all(isinstance(config_id, int) for config_id in config_ids):
+            return jsonify({'message': 'config_ids must be a list of integers'}), 400
+        query = query.filter(DataConsistencyConfig.id.in_(config_ids))
+    
+    configs = query.order_by(DataConsistencyConfig.id).all()
+    if not configs:
+        return jsonify({'message': 'No active consistency configs found'}), 404
+    
+    try:
+        checks = ConsistencyService.queue_batch(configs)
+        return jsonify({
+            'message': 'Consistency batch started',
+            'total_configs': len(configs),
+            'checks': [check.to_dict() for check in checks]
+        }), 202
+    except Exception as e:
+        import traceback
+        print(f"[CONSISTENCY] Error queueing batch: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({'message': f'Error running consistency batch: {str(e)}'}), 500
+
+
 @consistency_bp.route('/configs/<int:config_id>/checks', methods=['GET'])
 @token_required
 def list_config_checks(user, config_id):
@@ -248,6 +389,22 @@ def list_config_checks(user, config_id):
         return jsonify({'message': f'Error listing checks: {str(e)}'}), 500
 
 
+@consistency_bp.route('/checks/<int:check_id>', methods=['GET'])
+@token_required
+def get_consistency_check(user, check_id):
+    """Get a consistency check (status and progress of a running check)"""
+    check = DataConsistencyCheck.query.get(check_id)
+    
+    if not check:
+        return jsonify({'message': 'Consistency check not found'}), 404
+    
+    # Verify user owns the config
+    if check.config.user_id != user.id and not user.is_admin:
+        return jsonify({'message': 'Unauthorized'}), 403
+    
+    return jsonify({'check': check.to_dict()}), 200
+
+
 @consistency_bp.route('/checks/<int:check_id>', methods=['DELETE'])
 @token_required
 def delete_consistency_check(user, check_id):
@@ -295,6 +452,52 @@ def get_consistency_results(user, check_id):
         return jsonify({'message': f'Error getting consistency results: {str(e)}'}), 500
 
 
+@consistency_bp.route('/checks/<int:check_id>/results/export', methods=['GET'])
+@token_required
+def export_consistency_results(user, check_id):
+    """Export results from a consistency check as a streamed file
+    
+    Query parameters:
+        format: csv (default), xlsx or parquet
+        gzip: true to compress the download
+        field_name / inconsistency_type: Optional filters
+    """
+    check = DataConsistencyCheck.query.get(check_id)
+    
+    if not check:
+        return jsonify({'message': 'Consistency check not found'}), 404
+    
+    # Verify user owns the config
+    if check.config.user_id != user.id:
+        return jsonify({'message': 'Unauthorized'}), 403
+    
+    columns = [
+        ('id', 'int'), ('check_id', 'int'), ('join_key_values', 'json'), ('field_name', 'str'),
+        ('source_value', 'str'), ('target_value', 'str'), ('inconsistency_type', 'str'),
+        ('field_mismatches', 'json'), ('detected_at', 'datetime')
+    ]
+    stmt = select(*[getattr(DataConsistencyResult, name) for name, _ in columns]).where(
+        DataConsistencyResult.check_id == check_id
+    )
+    if request.args.get('field_name'):
+        stmt = stmt.where(DataConsistencyResult.field_name == request.args.get('field_name'))
+    if request.args.get('inconsistency_type'):
+        stmt = stmt.where(DataConsistencyResult.inconsistency_type == request.args.get('inconsistency_type'))
+    
+    try:
+        chunks, headers, mimetype = ExportService.export(
+            stmt.order_by(DataConsistencyResult.id),
+            columns,
+            request.args.get('format', 'csv').lower(),
+            f"consistency_check_{check_id}_results",
+            use_gzip=request.args.get('gzip', 'false').lower() in ('true', '1')
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
 @consistency_bp.route('/connections/<int:connection_id>/tables/<table_name>/columns', methods=['GET'])
 @token_required
 def get_table_columns_for_consistency(user, connection_id, table_name):
@@ -311,7 +514,7 @@ def get_table_columns_for_consistency(user, connection_id, table_name):
         decrypted_config = connection.get_decrypted_config()
         decrypted_config['type'] = connection.db_type
         
-        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
         columns = DatabaseService.get_table_columns(engine, table_name)
         primary_keys = DatabaseService.get_primary_keys(engine, table_name)
         
@@ -70,6 +70,9 @@ def consistency_reports_page(current_user):
 @login_required_template
 def consistency_results_page(current_user, check_id):
     """Render consistency check results page"""
+    from flask import session
+    from app.utils.security import generate_token
+    
     try:
         # Get check
         check = DataConsistencyCheck.query.get(check_id)
@@ -88,11 +91,15 @@ def consistency_results_page(current_user, check_id):
         results = DataConsistencyResult.query.filter_by(check_id=check_id).order_by(DataConsistencyResult.detected_at.desc()).all()
         results_dict = [result.to_dict() for result in results]
         
+        # Generate token for API calls (server-side exports)
+        token = session.get('token') or generate_token(current_user)
+        
         return render_template('consistency_results.html', 
                              check=check,
                              config=config,
                              results=results_dict,
-                             current_user=current_user)
+                             current_user=current_user,
+                             auth_token=token)
     except Exception as e:
         import traceback
         print(f"[CONSISTENCY] Error loading results: {str(e)}")
@@ -1,15 +1,86 @@
 from flask import Blueprint, request, jsonify
 from app.models.comparison import Comparison, ComparisonResult
-from app.models.change_log import ChangeLog
 from app.models.project import Project
 from app import db
 from app.utils.security import token_required
-from sqlalchemy import func, and_
+from app.services.rollup_service import RollupService
+from app.utils.dashboard_cache import DashboardCache
+from sqlalchemy import func, case
 from datetime import datetime, timedelta
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 
+def _parse_date_param(name):
+    """Parse a start_date/end_date query parameter (UTC), returning None if missing or invalid
+    
+    Accepts dates and datetimes with minute, second or fractional precision. A date alone
+    covers the whole day (00:00 for start_date, the end of the day for end_date).
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    # Handle both 'T' and space separators, and a trailing 'Z'
+    value_clean = value.replace('T', ' ').rstrip('Z')
+    for date_format in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            parsed = datetime.strptime(value_clean, date_format)
+        except ValueError:
+            continue
+        if date_format == '%Y-%m-%d' and name == 'end_date':
+            parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+        return parsed
+    print(f"Error parsing {name}: unsupported date '{value}'")
+    return None
+
+
+def _get_date_range(default_to_today=False):
+    """Get (start_date, end_date) from the request, optionally defaulting to today when neither is given"""
+    start_date = _parse_date_param('start_date')
+    end_date = _parse_date_param('end_date')
+    
+    if default_to_today and start_date is None and end_date is None:
+        start_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=999999)
+    
+    return start_date, end_date
+
+
+def _cached_response(project_id, endpoint, start_date, end_date, build):
+    """Return the cached JSON payload for a dashboard endpoint, building it on a miss"""
+    key = DashboardCache.make_key(endpoint, start_date, end_date)
+    return jsonify(DashboardCache.get_or_compute(project_id, key, build)), 200
+
+
+# Comparison.status values counted by the dashboard
+COMPARISON_STATUSES = ('pending', 'running', 'completed', 'failed')
+
+
+def _comparison_totals(project_id):
+    """Aggregate comparison counts for a project in a single conditional-aggregate query
+    
+    Returns:
+        Dictionary with total_comparisons, completed_comparisons, total_differences and by_status
+    """
+    row = db.session.query(
+        func.count(Comparison.id),
+        func.sum(Comparison.total_differences),
+        *[func.sum(case((Comparison.status == status, 1), else_=0)) for status in COMPARISON_STATUSES]
+    ).filter_by(project_id=project_id).one()
+    
+    by_status = {
+        status: int(count)
+        for status, count in zip(COMPARISON_STATUSES, row[2:])
+        if count
+    }
+    return {
+        'total_comparisons': row[0],
+        'completed_comparisons': by_status.get('completed', 0),
+        'total_differences': int(row[1] or 0),
+        'by_status': by_status
+    }
+
+
 @dashboard_bp.route('/project/<int:project_id>/stats', methods=['GET'])
 @token_required
 def get_project_stats(user, project_id):
@@ -19,99 +90,42 @@ def get_project_stats(user, project_id):
     if not project:
         return jsonify({'message': 'Project not found'}), 404
     
-    # Get date filters
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
-    
-    # Build date filter - default to today if no dates provided
-    date_filter = None
-    if start_date_str:
-        try:
-            # Handle both 'T' and space separators, and with/without timezone
-            start_date_str_clean = start_date_str.replace('T', ' ').split('.')[0]
-            start_date = datetime.strptime(start_date_str_clean, '%Y-%m-%d %H:%M:%S')
-            date_filter = ChangeLog.detected_at >= start_date
-        except Exception as e:
-            print(f"Error parsing start_date: {e}")
-            pass
-    
-    if end_date_str:
-        try:
-            # Handle both 'T' and space separators, and with/without timezone
-            end_date_str_clean = end_date_str.replace('T', ' ').split('.')[0]
-            end_date = datetime.strptime(end_date_str_clean, '%Y-%m-%d %H:%M:%S')
-            if date_filter is not None:
-                date_filter = and_(date_filter, ChangeLog.detected_at <= end_date)
-            else:
-                date_filter = ChangeLog.detected_at <= end_date
-        except Exception as e:
-            print(f"Error parsing end_date: {e}")
-            pass
+    # Get date range - default to today if no dates provided
+    start_date, end_date = _get_date_range(default_to_today=True)
     
-    # If no dates provided, default to today
-    if date_filter is None:
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=999999)
-        date_filter = and_(
-            ChangeLog.detected_at >= today_start,
-            ChangeLog.detected_at <= today_end
-        )
-    
-    # Get comparison statistics
-    total_comparisons = Comparison.query.filter_by(project_id=project_id).count()
-    completed_comparisons = Comparison.query.filter_by(
-        project_id=project_id,
-        status='completed'
-    ).count()
-    
-    # Get total differences
-    total_differences = db.session.query(func.sum(Comparison.total_differences)).filter_by(
-        project_id=project_id
-    ).scalar() or 0
-    
-    # Get change log statistics with date filter
-    query = ChangeLog.query.filter_by(project_id=project_id)
-    if date_filter is not None:
-        query = query.filter(date_filter)
-    
-    total_changes = query.count()
-    unsent_changes = query.filter_by(sent_to_api=False).count()
-    
-    # Get unique modified fields count
-    modified_fields_query = db.session.query(func.count(func.distinct(ChangeLog.field_name))).filter_by(
-        project_id=project_id
-    )
-    if date_filter is not None:
-        modified_fields_query = modified_fields_query.filter(date_filter)
-    modified_fields_count = modified_fields_query.scalar() or 0
-    
-    # Get changes by type
-    changes_by_type_query = db.session.query(
-        ChangeLog.change_type,
-        func.count(ChangeLog.id)
-    ).filter_by(project_id=project_id)
-    if date_filter is not None:
-        changes_by_type_query = changes_by_type_query.filter(date_filter)
-    changes_by_type = changes_by_type_query.group_by(ChangeLog.change_type).all()
-    
-    changes_by_type_dict = {change_type: count for change_type, count in changes_by_type}
-    
-    # Get recent comparisons
-    recent_comparisons = Comparison.query.filter_by(
-        project_id=project_id
-    ).order_by(Comparison.executed_at.desc()).limit(5).all()
-    
-    return jsonify({
-        'project_id': project_id,
-        'total_comparisons': total_comparisons,
-        'completed_comparisons': completed_comparisons,
-        'total_differences': total_differences,
-        'total_changes': total_changes,
-        'unsent_changes': unsent_changes,
-        'modified_fields_count': modified_fields_count,
-        'changes_by_type': changes_by_type_dict,
-        'recent_comparisons': [comp.to_dict() for comp in recent_comparisons]
-    }), 200
+    def build():
+        # Get comparison statistics
+        comparison_totals = _comparison_totals(project_id)
+        
+        # Get change log statistics from the daily rollup
+        counts = RollupService.grouped_counts(project_id, start_date, end_date, ['change_type', 'field_name'])
+        total_changes = sum(count for count, _ in counts.values())
+        unsent_changes = sum(unsent for _, unsent in counts.values())
+        changes_by_type_dict = {}
+        for (change_type, _), (count, _) in counts.items():
+            changes_by_type_dict[change_type] = changes_by_type_dict.get(change_type, 0) + count
+        
+        # Get unique modified fields count
+        modified_fields_count = len({field_name for _, field_name in counts})
+        
+        # Get recent comparisons
+        recent_comparisons = Comparison.query.filter_by(
+            project_id=project_id
+        ).order_by(Comparison.executed_at.desc()).limit(5).all()
+        
+        return {
+            'project_id': project_id,
+            'total_comparisons': comparison_totals['total_comparisons'],
+            'completed_comparisons': comparison_totals['completed_comparisons'],
+            'total_differences': comparison_totals['total_differences'],
+            'total_changes': total_changes,
+            'unsent_changes': unsent_changes,
+            'modified_fields_count': modified_fields_count,
+            'changes_by_type': changes_by_type_dict,
+            'recent_comparisons': [comp.to_dict() for comp in recent_comparisons]
+        }
+    
+    return _cached_response(project_id, 'stats', start_date, end_date, build)
 
 
 @dashboard_bp.route('/project/<int:project_id>/changes-over-time', methods=['GET'])
@@ -123,72 +137,29 @@ def get_changes_over_time(user, project_id):
     if not project:
         return jsonify({'message': 'Project not found'}), 404
     
-    # Get date range from query params
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
-    
-    # Build date filter - default to today if no dates provided
-    if start_date_str:
-        try:
-            # Handle both 'T' and space separators, and with/without timezone
-            start_date_str_clean = start_date_str.replace('T', ' ').split('.')[0]
-            start_date = datetime.strptime(start_date_str_clean, '%Y-%m-%d %H:%M:%S')
-        except Exception as e:
-            print(f"Error parsing start_date: {e}")
-            # Default to today start
-            start_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    else:
-        # Default to today start
+    # Get date range - default to today for any missing bound
+    start_date, end_date = _get_date_range()
+    if start_date is None:
         start_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    if end_date_str:
-        try:
-            # Handle both 'T' and space separators, and with/without timezone
-            end_date_str_clean = end_date_str.replace('T', ' ').split('.')[0]
-            end_date = datetime.strptime(end_date_str_clean, '%Y-%m-%d %H:%M:%S')
-        except Exception as e:
-            print(f"Error parsing end_date: {e}")
-            # Default to today end
-            end_date = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=999999)
-    else:
-        # Default to today end
+    if end_date is None:
         end_date = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=999999)
     
-    query_filter = and_(
-        ChangeLog.project_id == project_id,
-        ChangeLog.detected_at >= start_date,
-        ChangeLog.detected_at <= end_date
-    )
-    
-    # Query changes grouped by date
-    changes_by_date = db.session.query(
-        func.date(ChangeLog.detected_at).label('date'),
-        func.count(ChangeLog.id).label('count'),
-        ChangeLog.change_type
-    ).filter(query_filter).group_by(
-        func.date(ChangeLog.detected_at),
-        ChangeLog.change_type
-    ).order_by('date').all()
-    
-    # Format data for chart
-    chart_data = {}
-    for date, count, change_type in changes_by_date:
-        # Handle date object or string
-        if isinstance(date, str):
-            date_str = date
-        elif hasattr(date, 'isoformat'):
-            date_str = date.isoformat()
-        else:
-            # Convert to string if it's a date object
-            date_str = str(date)
+    def build():
+        # Query changes grouped by date from the daily rollup
+        changes_by_date = RollupService.grouped_counts(project_id, start_date, end_date, ['day', 'change_type'])
+        
+        # Format data for chart
+        chart_data = {}
+        for (date_str, change_type), (count, _) in sorted(changes_by_date.items()):
+            if date_str not in chart_data:
+                chart_data[date_str] = {}
+            chart_data[date_str][change_type] = count
         
-        if date_str not in chart_data:
-            chart_data[date_str] = {}
-        chart_data[date_str][change_type] = count
+        return {
+            'data': chart_data
+        }
     
-    return jsonify({
-        'data': chart_data
-    }), 200
+    return _cached_response(project_id, 'changes-over-time', start_date, end_date, build)
 
 
 @dashboard_bp.route('/project/<int:project_id>/field-changes', methods=['GET'])
@@ -200,50 +171,23 @@ def get_field_changes(user, project_id):
     if not project:
         return jsonify({'message': 'Project not found'}), 404
     
-    # Get date filters
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
-    
-    # Build date filter
-    date_filter = None
-    if start_date_str:
-        try:
-            start_date_str_clean = start_date_str.replace('T', ' ').split('.')[0]
-            start_date = datetime.strptime(start_date_str_clean, '%Y-%m-%d %H:%M:%S')
-            date_filter = ChangeLog.detected_at >= start_date
-        except Exception as e:
-            print(f"Error parsing start_date: {e}")
-            pass
-    
-    if end_date_str:
-        try:
-            end_date_str_clean = end_date_str.replace('T', ' ').split('.')[0]
-            end_date = datetime.strptime(end_date_str_clean, '%Y-%m-%d %H:%M:%S')
-            if date_filter is not None:
-                date_filter = and_(date_filter, ChangeLog.detected_at <= end_date)
-            else:
-                date_filter = ChangeLog.detected_at <= end_date
-        except Exception as e:
-            print(f"Error parsing end_date: {e}")
-            pass
-    
-    # Build query
-    query = db.session.query(
-        ChangeLog.field_name,
-        func.count(ChangeLog.id).label('count')
-    ).filter_by(project_id=project_id)
-    
-    if date_filter is not None:
-        query = query.filter(date_filter)
-    
-    # Get changes grouped by field
-    field_changes = query.group_by(ChangeLog.field_name).order_by(
-        func.count(ChangeLog.id).desc()
-    ).limit(20).all()
+    # Get date range
+    start_date, end_date = _get_date_range()
+    
+    def build():
+        # Get changes grouped by field from the daily rollup
+        field_counts = RollupService.grouped_counts(project_id, start_date, end_date, ['field_name'])
+        field_changes = sorted(
+            ((key[0], count) for key, (count, _) in field_counts.items()),
+            key=lambda item: item[1],
+            reverse=True
+        )[:20]
+        
+        return {
+            'data': [{'field': field, 'count': count} for field, count in field_changes]
+        }
     
-    return jsonify({
-        'data': [{'field': field, 'count': count} for field, count in field_changes]
-    }), 200
+    return _cached_response(project_id, 'field-changes', start_date, end_date, build)
 
 
 @dashboard_bp.route('/project/<int:project_id>/changes-by-type', methods=['GET'])
@@ -255,52 +199,22 @@ def get_changes_by_type(user, project_id):
     if not project:
         return jsonify({'message': 'Project not found'}), 404
     
-    # Get date filters
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
-    
-    # Build date filter
-    date_filter = None
-    if start_date_str:
-        try:
-            start_date_str_clean = start_date_str.replace('T', ' ').split('.')[0]
-            start_date = datetime.strptime(start_date_str_clean, '%Y-%m-%d %H:%M:%S')
-            date_filter = ChangeLog.detected_at >= start_date
-        except Exception as e:
-            print(f"Error parsing start_date: {e}")
-            pass
-    
-    if end_date_str:
-        try:
-            end_date_str_clean = end_date_str.replace('T', ' ').split('.')[0]
-            end_date = datetime.strptime(end_date_str_clean, '%Y-%m-%d %H:%M:%S')
-            if date_filter is not None:
-                date_filter = and_(date_filter, ChangeLog.detected_at <= end_date)
-            else:
-                date_filter = ChangeLog.detected_at <= end_date
-        except Exception as e:
-            print(f"Error parsing end_date: {e}")
-            pass
+    # Get date range
+    start_date, end_date = _get_date_range()
     
-    # Build query
-    query = db.session.query(
-        ChangeLog.change_type,
-        func.count(ChangeLog.id).label('count')
-    ).filter_by(project_id=project_id)
-    
-    if date_filter is not None:
-        query = query.filter(date_filter)
-    
-    changes_by_type = query.group_by(ChangeLog.change_type).all()
-    
-    # Format as dictionary
-    result = {}
-    for change_type, count in changes_by_type:
-        result[change_type] = count
+    def build():
+        changes_by_type = RollupService.grouped_counts(project_id, start_date, end_date, ['change_type'])
+        
+        # Format as dictionary
+        result = {}
+        for (change_type,), (count, _) in changes_by_type.items():
+            result[change_type] = count
+        
+        return {
+            'data': result
+        }
     
-    return jsonify({
-        'data': result
-    }), 200
+    return _cached_response(project_id, 'changes-by-type', start_date, end_date, build)
 
 
 @dashboard_bp.route('/project/<int:project_id>/comparisons-by-status', methods=['GET'])
@@ -312,19 +226,80 @@ def get_comparisons_by_status(user, project_id):
     if not project:
         return jsonify({'message': 'Project not found'}), 404
     
-    # Get comparisons grouped by status
-    comparisons_by_status = db.session.query(
-        Comparison.status,
-        func.count(Comparison.id).label('count')
-    ).filter_by(project_id=project_id).group_by(Comparison.status).all()
+    def build():
+        # Get comparisons grouped by status
+        return {
+            'data': _comparison_totals(project_id)['by_status']
+        }
+    
+    return _cached_response(project_id, 'comparisons-by-status', None, None, build)
+
+
+
+
+@dashboard_bp.route('/project/<int:project_id>/summary', methods=['GET'])
+@token_required
+def get_project_summary(user, project_id):
+    """Get every dashboard widget for a project in one round trip
+    
+    Combines stats, changes-over-time, field-changes, changes-by-type and
+    comparisons-by-status for the same date range (default: today).
+    """
+    project = Project.query.filter_by(id=project_id, user_id=user.id).first()
+    
+    if not project:
+        return jsonify({'message': 'Project not found'}), 404
     
-    # Format as dictionary
-    result = {}
-    for status, count in comparisons_by_status:
-        result[status] = count
+    start_date, end_date = _get_date_range(default_to_today=True)
     
-    return jsonify({
-        'data': result
-    }), 200
+    def build():
+        # One conditional-aggregate query over comparisons
+        comparison_totals = _comparison_totals(project_id)
+        
+        # One grouped query over the daily rollup (plus raw change logs for partial edge days)
+        counts = RollupService.grouped_counts(project_id, start_date, end_date, ['day', 'change_type', 'field_name'])
+        
+        total_changes = 0
+        unsent_changes = 0
+        changes_by_type = {}
+        changes_by_field = {}
+        changes_over_time = {}
+        for (day, change_type, field_name), (count, unsent) in sorted(counts.items()):
+            total_changes += count
+            unsent_changes += unsent
+            changes_by_type[change_type] = changes_by_type.get(change_type, 0) + count
+            changes_by_field[field_name] = changes_by_field.get(field_name, 0) + count
+            day_data = changes_over_time.setdefault(day, {})
+            day_data[change_type] = day_data.get(change_type, 0) + count
+        
+        field_changes = sorted(changes_by_field.items(), key=lambda item: item[1], reverse=True)[:20]
+        
+        recent_comparisons = Comparison.query.filter_by(
+            project_id=project_id
+        ).order_by(Comparison.executed_at.desc()).limit(5).all()
+        
+        return {
+            'project_id': project_id,
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None,
+            'total_comparisons': comparison_totals['total_comparisons'],
+            'completed_comparisons': comparison_totals['completed_comparisons'],
+            'total_differences': comparison_totals['total_differences'],
+            'total_changes': total_changes,
+            'unsent_changes': unsent_changes,
+            'modified_fields_count': len(changes_by_field),
+            'changes_by_type': changes_by_type,
+            'recent_comparisons': [comp.to_dict() for comp in recent_comparisons],
+            'changes_over_time': changes_over_time,
+            'field_changes': [{'field': field, 'count': count} for field, count in field_changes],
+            'comparisons_by_status': comparison_totals['by_status']
+        }
+    
+    return _cached_response(project_id, 'summary', start_date, end_date, build)
 
 
+@dashboard_bp.route('/cache/stats', methods=['GET'])
+@token_required
+def get_cache_stats(user):
+    """Get dashboard cache hit/miss counters and hit rate"""
+    return jsonify(DashboardCache.get_stats()), 200
@@ -105,11 +105,12 @@ def create_project(user):
         target_config['type'] = target_connection.db_type
         
         # Map tables and generate models (already decrypted)
-        source_engine = DatabaseService.get_engine(source_config, already_decrypted=True)
-        target_engine = DatabaseService.get_engine(target_config, already_decrypted=True)
+        source_engine = DatabaseService.get_engine(source_config, already_decrypted=True, connection_id=source_connection.id)
+        target_engine = DatabaseService.get_engine(target_config, already_decrypted=True, connection_id=target_connection.id)
         
-        source_columns = DatabaseService.get_table_columns(source_engine, data['source_table'])
-        target_columns = DatabaseService.get_table_columns(target_engine, data['target_table'])
+        # Columns come from one schema snapshot per database (also used by the tables page)
+        source_columns = DatabaseService.get_table_schema(source_engine, data['source_table'])['columns']
+        target_columns = DatabaseService.get_table_schema(target_engine, data['target_table'])['columns']
         
         # Generate model code
         base_path = Path(__file__).parent.parent.parent
@@ -289,11 +290,11 @@ def update_project(user, project_id):
             target_config['type'] = target_connection.db_type
             
             # Generate models
-            source_engine = DatabaseService.get_engine(source_config, already_decrypted=True)
-            target_engine = DatabaseService.get_engine(target_config, already_decrypted=True)
+            source_engine = DatabaseService.get_engine(source_config, already_decrypted=True, connection_id=source_connection.id)
+            target_engine = DatabaseService.get_engine(target_config, already_decrypted=True, connection_id=target_connection.id)
             
-            source_columns = DatabaseService.get_table_columns(source_engine, project.source_table)
-            target_columns = DatabaseService.get_table_columns(target_engine, project.target_table)
+            source_columns = DatabaseService.get_table_schema(source_engine, project.source_table)['columns']
+            target_columns = DatabaseService.get_table_schema(target_engine, project.target_table)['columns']
             
             # Generate model code
             base_path = Path(__file__).parent.parent.parent
@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, current_app
 from app.models.project import Project
-from app.models.comparison import Comparison, ComparisonResult
+from app.models.comparison import Comparison
 from app.models.scheduled_task import ScheduledTask
 from app.utils.security import login_required_template
+from app.services.results_service import ResultsService
 
 reports_template_bp = Blueprint('reports_template', __name__)
 
@@ -49,12 +50,13 @@ def comparison_results_page(current_user, comparison_id):
         if not current_user.is_admin and project.user_id != current_user.id:
             return render_template('error.html', message='Não autorizado', current_user=current_user), 403
         
-        # Get results
-        results = ComparisonResult.query.filter_by(comparison_id=comparison_id).order_by(ComparisonResult.detected_at.desc()).all()
+        # Only the first page is rendered; the page fetches the rest from the results API
+        page_size = current_app.config.get('RESULTS_PAGE_SIZE', 500)
+        first_page = ResultsService.get_page(comparison_id, list(ResultsService.COLUMNS), limit=page_size)
         
         print(f"[REPORTS] Loading results for comparison {comparison_id}")
         print(f"[REPORTS] Comparison total_differences: {comparison.total_differences}")
-        print(f"[REPORTS] Results found in database: {len(results)}")
+        print(f"[REPORTS] First page: {len(first_page['results'])} results, has_more={first_page['has_more']}")
         
         # Check if comparison was executed by a scheduled task
         scheduled_task = None
@@ -65,7 +67,9 @@ def comparison_results_page(current_user, comparison_id):
         
         return render_template('comparison_results.html', 
                              comparison=comparison, 
-                             results=results,
+                             first_page=first_page,
+                             page_size=page_size,
+                             summary=comparison.get_summary(),
                              project=project,
                              scheduled_task=scheduled_task,
                              current_user=current_user)
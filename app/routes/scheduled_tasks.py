@@ -332,14 +332,14 @@ def get_project_columns(user, project_id):
         # Get source table columns
         source_config = project.source_connection.get_decrypted_config()
         source_config['type'] = project.source_connection.db_type
-        source_engine = DatabaseService.get_engine(source_config, already_decrypted=True)
+        source_engine = DatabaseService.get_engine(source_config, already_decrypted=True, connection_id=project.source_connection_id)
         source_columns = DatabaseService.get_table_columns(source_engine, project.source_table)
         source_primary_keys = DatabaseService.get_primary_keys(source_engine, project.source_table)
         
         # Get target table columns
         target_config = project.target_connection.get_decrypted_config()
         target_config['type'] = project.target_connection.db_type
-        target_engine = DatabaseService.get_engine(target_config, already_decrypted=True)
+        target_engine = DatabaseService.get_engine(target_config, already_decrypted=True, connection_id=project.target_connection_id)
         target_columns = DatabaseService.get_table_columns(target_engine, project.target_table)
         target_primary_keys = DatabaseService.get_primary_keys(target_engine, project.target_table)
         
@@ -1,9 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from sqlalchemy import text, MetaData, Table, Column, inspect
 from sqlalchemy.types import Integer, String, Text, DateTime, Date, Time, Float, Numeric, Boolean, LargeBinary, JSON
 from app.utils.security import token_required
 from app.services.database import DatabaseService
+from app.utils.schema_cache import SchemaCache
 from app.models.database_connection import DatabaseConnection
 from app.models.project import Project
 from app.models.table_model_mapping import TableModelMapping
@@ -63,7 +64,7 @@ def list_tables(user):
 @tables_bp.route('/columns', methods=['POST'])
 @token_required
 def get_table_columns(user):
-    """Get columns for a table"""
+    """Get columns for a table, with an estimated row count (exact_count=true for COUNT(*))"""
     data = request.get_json()
     
     if not data or not data.get('db_config') or not data.get('table_name'):
@@ -73,41 +74,105 @@ def get_table_columns(user):
         engine = DatabaseService.get_engine(data['db_config'])
         columns = DatabaseService.get_table_columns(engine, data['table_name'])
         primary_keys = DatabaseService.get_primary_keys(engine, data['table_name'])
-        row_count = DatabaseService.get_table_row_count(engine, data['table_name'])
+        row_count = DatabaseService.get_row_count(engine, data['table_name'], exact=bool(data.get('exact_count')))
         
         return jsonify({
             'columns': columns,
             'primary_keys': primary_keys,
-            'row_count': row_count
+            'row_count': row_count['row_count'],
+            'row_count_source': row_count['row_count_source']
         }), 200
     except Exception as e:
         return jsonify({'message': f'Error getting table columns: {str(e)}'}), 500
 
 
+def _browse_params(data):
+    """Read limit, columns, filters and cursor of a table browser request"""
+    limit = data.get('limit', current_app.config.get('TABLE_BROWSER_PAGE_SIZE', 100))
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    limit = max(1, min(limit, current_app.config.get('TABLE_BROWSER_MAX_PAGE_SIZE', 1000)))
+    
+    columns = data.get('columns')
+    if isinstance(columns, str):
+        columns = [name.strip() for name in columns.split(',') if name.strip()]
+    filters = data.get('filters') or []
+    if not isinstance(filters, list):
+        raise ValueError('filters must be a list of {column, op, value}')
+    return limit, columns, filters, data.get('cursor')
+
+
 @tables_bp.route('/preview', methods=['POST'])
 @token_required
 def preview_table(user):
-    """Preview table data"""
+    """Preview table data in primary key pages (same options as /browse)"""
     data = request.get_json()
     
     if not data or not data.get('db_config') or not data.get('table_name'):
         return jsonify({'message': 'Database configuration and table name required'}), 400
     
     try:
+        limit, columns, filters, cursor = _browse_params(data)
         engine = DatabaseService.get_engine(data['db_config'])
-        limit = data.get('limit', 100)
-        df = DatabaseService.get_table_data(engine, data['table_name'], limit=limit)
+        page = DatabaseService.browse_table(engine, data['table_name'], columns, filters, cursor, limit)
         
-        # Convert DataFrame to JSON
         return jsonify({
-            'data': df.to_dict(orient='records'),
-            'columns': list(df.columns),
-            'row_count': len(df)
+            'data': page['rows'],
+            'columns': page['columns'],
+            'row_count': len(page['rows']),
+            'primary_keys': page['primary_keys'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            'truncated': page['truncated']
         }), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error previewing table: {str(e)}'}), 500
 
 
+@tables_bp.route('/browse', methods=['POST'])
+@token_required
+def browse_table(user):
+    """Browse the rows of a connection's table in primary key order (keyset pagination)
+    
+    Request body: connection_id, table_name and optional limit, columns, filters
+    ([{column, op, value}]) and cursor (next_cursor of the previous page).
+    """
+    data = request.get_json()
+    
+    if not data or not data.get('connection_id') or not data.get('table_name'):
+        return jsonify({'message': 'Connection ID and table name required'}), 400
+    
+    # Verify connection - admins can access any, regular users only their own
+    if user.is_admin:
+        connection = DatabaseConnection.query.filter_by(id=data['connection_id']).first()
+    else:
+        connection = DatabaseConnection.query.filter_by(
+            id=data['connection_id'],
+            user_id=user.id
+        ).first()
+    
+    if not connection:
+        return jsonify({'message': 'Connection not found'}), 404
+    
+    try:
+        limit, columns, filters, cursor = _browse_params(data)
+        decrypted_config = connection.get_decrypted_config()
+        decrypted_config['type'] = connection.db_type
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
+        
+        page = DatabaseService.browse_table(engine, data['table_name'], columns, filters, cursor, limit)
+        page['limit'] = limit
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Error browsing table: {str(e)}'}), 500
+
+
 @tables_bp.route('/update-primary-keys', methods=['POST'])
 @token_required
 def update_primary_keys(user):
@@ -138,8 +203,9 @@ def update_primary_keys(user):
         decrypted_config = connection.get_decrypted_config()
         decrypted_config['type'] = connection.db_type
         
-        # Get table columns
-        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+        # Get table columns (read from the database, not from the schema cache)
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
+        SchemaCache.invalidate(engine, table_name)
         columns = DatabaseService.get_table_columns(engine, table_name)
         
         # Update primary_key flag in columns
@@ -190,7 +256,7 @@ def update_primary_keys(user):
             'message': f'Primary keys updated successfully. Models regenerated for {len(updated_projects)} project(s).',
             'updated_projects': updated_projects
         }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error updating primary keys: {str(e)}'}), 500
@@ -228,7 +294,8 @@ def update_column_type(user):
         # Get decrypted config
         decrypted_config = connection.get_decrypted_config()
         decrypted_config['type'] = connection.db_type
-        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
+        SchemaCache.invalidate(engine, table_name)
         
         # Get current primary keys
         current_primary_keys = DatabaseService.get_primary_keys(engine, table_name)
@@ -445,7 +512,7 @@ def update_column_type(user):
                     
                     # Transaction is automatically committed when exiting 'with' block
                     print(f"[TABLES] ===== ALTER TABLE transaction completed ======")
-                    
+            
             except Exception as e:
                 import traceback
                 print(f"[TABLES] ERROR executing ALTER TABLE: {str(e)}")
@@ -464,8 +531,9 @@ def update_column_type(user):
         except:
             pass
         
-        # Create a completely new engine
-        fresh_engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+        # Create a completely new engine and drop the cached metadata of the altered table
+        fresh_engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
+        SchemaCache.invalidate(fresh_engine, table_name)
         
         # Get updated columns (refresh after potential primary key changes)
         # This ensures we have the latest column information from the database
@@ -568,7 +636,7 @@ def update_column_type(user):
             # Verify file was created
             if not model_path.exists():
                 raise Exception(f"Model file was not created at {model_path}")
-            
+        
         except Exception as e:
             import traceback
             print(f"[TABLES] Error generating/saving model file: {str(e)}")
@@ -613,7 +681,7 @@ def update_column_type(user):
             'updated_projects': updated_projects,
             'model_file_path': mapping.model_file_path if mapping else None
         }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error updating column type: {str(e)}'}), 500
@@ -666,11 +734,93 @@ def get_model_code(user, connection_id, table_name):
             'table_name': table_name,
             'connection_name': connection.name
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'message': f'Error reading model file: {str(e)}'}), 500
 
 
+@tables_bp.route('/models/generate', methods=['POST'])
+@token_required
+def generate_models(user):
+    """Generate model files for many tables of a connection from one schema snapshot
+    
+    Request body: connection_id and optional tables (list of table names, default: all tables).
+    """
+    data = request.get_json() or {}
+    connection_id = data.get('connection_id')
+    
+    if not connection_id:
+        return jsonify({'message': 'Connection ID required'}), 400
+    
+    # Verify connection - admins can access any, regular users only their own
+    if user.is_admin:
+        connection = DatabaseConnection.query.filter_by(id=connection_id).first()
+    else:
+        connection = DatabaseConnection.query.filter_by(
+            id=connection_id,
+            user_id=user.id
+        ).first()
+    
+    if not connection:
+        return jsonify({'message': 'Connection not found'}), 404
+    
+    try:
+        decrypted_config = connection.get_decrypted_config()
+        decrypted_config['type'] = connection.db_type
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
+        snapshot = DatabaseService.get_schema_snapshot(engine)
+        
+        tables = {table['name']: table for table in snapshot['tables']}
+        requested = data.get('tables') or list(tables.keys())
+        missing = [name for name in requested if name not in tables]
+        if missing:
+            return jsonify({'message': f"Table(s) not found: {', '.join(missing)}"}), 404
+        
+        mappings = {
+            mapping.table_name: mapping
+            for mapping in TableModelMapping.query.filter(
+                TableModelMapping.connection_id == connection.id,
+                TableModelMapping.table_name.in_(requested)
+            ).all()
+        }
+        
+        base_path = Path(__file__).parent.parent.parent
+        generated = []
+        for table_name in requested:
+            model_code = TableMapper.generate_model_code(table_name, tables[table_name]['columns'], decrypted_config)
+            # Same file name as the update-column-type fallback for tables without projects
+            model_path = TableMapper.save_model_file(
+                f"{connection.name}_{table_name}",
+                table_name,
+                model_code,
+                base_path
+            )
+            
+            mapping = mappings.get(table_name)
+            if mapping:
+                mapping.model_file_path = str(model_path)
+                mapping.updated_at = datetime.utcnow()
+            else:
+                db.session.add(TableModelMapping(
+                    connection_id=connection.id,
+                    table_name=table_name,
+                    model_file_path=str(model_path),
+                    user_id=user.id
+                ))
+            generated.append({'table_name': table_name, 'file_path': str(model_path)})
+        
+        db.session.commit()
+        print(f"[TABLES] Generated {len(generated)} model file(s) for connection {connection.id}")
+        
+        return jsonify({
+            'message': f'{len(generated)} model(s) generated successfully',
+            'models': generated
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error generating models: {str(e)}'}), 500
+
+
 @tables_bp.route('/data-types', methods=['GET'])
 @token_required
 def get_data_types(user):
@@ -53,7 +53,7 @@ def edit_table_page(current_user, connection_id, table_name):
         decrypted_config = connection.get_decrypted_config()
         decrypted_config['type'] = connection.db_type
         
-        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True)
+        engine = DatabaseService.get_engine(decrypted_config, already_decrypted=True, connection_id=connection.id)
         columns = DatabaseService.get_table_columns(engine, table_name)
         primary_keys = DatabaseService.get_primary_keys(engine, table_name)
         
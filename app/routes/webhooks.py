@@ -2,7 +2,7 @@ from flask import Blueprint, request, jsonify
 from app.models.webhook_config import WebhookConfig, WebhookPayload, WebhookParams
 from app import db
 from app.utils.security import token_required
-from app.utils.encryption import PasswordEncryption
+from app.utils.encryption import PasswordEncryption, DecryptedConfigCache
 import requests
 import json
 from datetime import datetime
@@ -190,6 +190,7 @@ def update_webhook_config(user, config_id):
         
         config.updated_at = datetime.utcnow()
         db.session.commit()
+        DecryptedConfigCache.invalidate('webhook', config.id)
         
         return jsonify({
             'message': 'Webhook config updated successfully',
@@ -212,6 +213,7 @@ def delete_webhook_config(user, config_id):
     try:
         db.session.delete(config)
         db.session.commit()
+        DecryptedConfigCache.invalidate('webhook', config_id)
         
         return jsonify({'message': 'Webhook config deleted successfully'}), 200
     except Exception as e:
@@ -0,0 +1,731 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import select, and_, or_
+from app import db
+from app.models.comparison import Comparison
+from app.models.comparison_job import ComparisonJob
+from app.models.project import Project
+from app.models.scheduled_task import ScheduledTask
+from app.services.comparison_service import ComparisonService
+from app.services.database import DatabaseService, HashPartitioningUnsupported
+from app.utils.background_jobs import BackgroundJobs
+from app.utils.dashboard_cache import DashboardCache
+
+
+class ComparisonCancelled(Exception):
+    """Raised inside a running comparison job after its cancellation was requested"""
+
+
+class ComparisonJobService:
+    """Service for running project comparisons as background jobs"""
+    
+    # Job ids waiting in this process's pool (thread runner)
+    _dispatched = set()
+    _dispatched_lock = threading.Lock()
+    
+    @staticmethod
+    def _connection_configs(project: Project) -> Tuple[Dict, Dict]:
+        """Decrypted source and target connection configs of a project"""
+        source_config = project.source_connection.get_decrypted_config()
+        source_config['type'] = project.source_connection.db_type
+        
+        target_config = project.target_connection.get_decrypted_config()
+        target_config['type'] = project.target_connection.db_type
+        return source_config, target_config
+    
+    @staticmethod
+    def _primary_keys(project: Project, source_config: Dict, source_table: str, params: Dict) -> List[str]:
+        """Primary keys from the job params, or else from the source table (already decrypted config)"""
+        primary_keys = params.get('primary_keys') or []
+        if not primary_keys:
+            source_engine = DatabaseService.get_engine(source_config, already_decrypted=True, connection_id=project.source_connection_id)
+            primary_keys = DatabaseService.get_primary_keys(source_engine, source_table)
+        return primary_keys
+    
+    @staticmethod
+    def run_project_comparison(
+        project: Project,
+        params: Dict,
+        progress: Optional[Callable[..., None]] = None,
+        metadata: Optional[Dict] = None,
+        user_id: Optional[int] = None
+    ) -> Tuple[Comparison, int]:
+        """Compare a project's tables and save the results
+        
+        Args:
+            project: Project to compare
+            params: primary_keys, key_mappings, ignored_columns, source_table and
+                target_table (tables default to the project's)
+            progress: Optional progress callback passed to ComparisonService.compare_tables
+            metadata: Extra comparison metadata (e.g. scheduled_task_id)
+            user_id: User recorded on the comparison
+        
+        Returns:
+            Tuple of (saved Comparison, number of differences)
+        """
+        key_mappings = params.get('key_mappings') or {}
+        ignored_columns = params.get('ignored_columns') or []
+        source_table = params.get('source_table') or project.source_table
+        target_table = params.get('target_table') or project.target_table
+        source_config, target_config = ComparisonJobService._connection_configs(project)
+        primary_keys = ComparisonJobService._primary_keys(project, source_config, source_table, params)
+        
+        print(f"[COMPARISON_JOB] Project {project.id}: {source_table} -> {target_table}, primary keys: {primary_keys}", flush=True)
+        
+        differences_df, differences = ComparisonService.compare_tables(
+            source_config,
+            target_config,
+            source_table,
+            target_table,
+            primary_keys,
+            key_mappings,
+            ignored_columns,
+            source_connection_id=project.source_connection_id,
+            target_connection_id=project.target_connection_id,
+            progress=progress
+        )
+        
+        if progress:
+            progress('saving', differences_found=len(differences))
+        
+        comparison = ComparisonService.save_comparison_results(
+            project.id,
+            differences,
+            metadata={
+                'primary_keys': primary_keys,
+                'key_mappings': key_mappings,
+                'ignored_columns': ignored_columns,
+                'total_source_rows': len(differences_df) if not differences_df.empty else 0,
+                **(metadata or {})
+            },
+            user_id=user_id
+        )
+        return comparison, len(differences)
+    
+    @staticmethod
+    def runner() -> str:
+        """Where queued jobs run: 'thread' (web process pool) or 'worker' (deltascope worker processes)"""
+        runner = str(current_app.config.get('COMPARISON_JOB_RUNNER', 'thread')).lower()
+        return runner if runner in ('thread', 'worker') else 'thread'
+    
+    @staticmethod
+    def enqueue(
+        project_id: int,
+        user_id: Optional[int],
+        params: Dict,
+        scheduled_task_id: Optional[int] = None
+    ) -> ComparisonJob:
+        """Create a queued comparison job
+        
+        With COMPARISON_JOB_RUNNER=thread the job is also submitted to the background pool
+        of this process; with 'worker' it waits in the table for a worker process to claim it.
+        """
+        job = ComparisonJob(
+            project_id=project_id,
+            user_id=user_id,
+            status='queued',
+            phase='queued',
+            params=params,
+            progress={},
+            scheduled_task_id=scheduled_task_id
+        )
+        db.session.add(job)
+        db.session.commit()
+        
+        ComparisonJobService._dispatch(job.id)
+        print(f"[COMPARISON_JOB] Job {job.id} queued for project {project_id}", flush=True)
+        return job
+    
+    @classmethod
+    def _dispatch(cls, job_id: int) -> bool:
+        """Hand a queued job to this process's pool (thread runner); worker processes poll for it
+        
+        Returns:
+            False when the job is already waiting in this process's pool
+        """
+        if cls.runner() != 'thread':
+            return False
+        with cls._dispatched_lock:
+            if job_id in cls._dispatched:
+                return False
+            cls._dispatched.add(job_id)
+        BackgroundJobs.submit(f'comparison_job_{job_id}', cls.run_job, job_id)
+        return True
+    
+    @staticmethod
+    def queue_job(project: Project, user_id: Optional[int], params: Dict) -> ComparisonJob:
+        """Queue a manual comparison of a project"""
+        return ComparisonJobService.enqueue(project.id, user_id, params)
+    
+    @staticmethod
+    def claim(job_id: int, worker_id: str) -> bool:
+        """Atomically move a queued job to running for this worker
+        
+        The conditional UPDATE only matches while the job is still queued, so when several
+        processes race for the same job exactly one of them gets rowcount 1.
+        """
+        now = datetime.utcnow()
+        claimed = ComparisonJob.query.filter_by(id=job_id, status='queued').update({
+            'status': 'running',
+            'worker_id': worker_id,
+            'attempts': db.func.coalesce(ComparisonJob.attempts, 0) + 1,
+            'started_at': now,
+            'heartbeat_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+    
+    @staticmethod
+    def claim_next(worker_id: str) -> Optional[int]:
+        """Claim the oldest queued job
+        
+        MariaDB/MySQL and PostgreSQL lock the candidate row with SELECT ... FOR UPDATE SKIP
+        LOCKED, so concurrent workers skip each other's rows instead of waiting on them.
+        SQLite has no row locks; there the candidates are claimed with the atomic
+        conditional UPDATE of claim().
+        
+        Returns:
+            The claimed job id, or None when the queue is empty
+        """
+        if db.engine.dialect.name in ('mysql', 'mariadb', 'postgresql'):
+            job_id = db.session.execute(
+                select(ComparisonJob.id)
+                .where(ComparisonJob.status == 'queued')
+                .order_by(ComparisonJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            return job_id if ComparisonJobService.claim(job_id, worker_id) else None
+        
+        candidates = db.session.execute(
+            select(ComparisonJob.id)
+            .where(ComparisonJob.status == 'queued')
+            .order_by(ComparisonJob.id)
+            .limit(10)
+        ).scalars().all()
+        db.session.rollback()
+        for job_id in candidates:
+            if ComparisonJobService.claim(job_id, worker_id):
+                return job_id
+        return None
+    
+    @staticmethod
+    def requeue_stale() -> int:
+        """Return running jobs whose worker stopped sending heartbeats to the queue
+        
+        Jobs without a heartbeat for COMPARISON_JOB_STALE_SECONDS are queued again, or
+        marked failed once they were claimed COMPARISON_JOB_MAX_ATTEMPTS times.
+        
+        Returns:
+            Number of jobs requeued or failed
+        """
+        stale_seconds = int(current_app.config.get('COMPARISON_JOB_STALE_SECONDS', 300))
+        max_attempts = max(1, int(current_app.config.get('COMPARISON_JOB_MAX_ATTEMPTS', 3)))
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        stale = and_(ComparisonJob.status == 'running', ComparisonJob.heartbeat_at < cutoff)
+        
+        parent_ids = {
+            parent_id for (parent_id,) in db.session.query(ComparisonJob.parent_job_id).filter(
+                stale, ComparisonJob.attempts >= max_attempts, ComparisonJob.parent_job_id.isnot(None)
+            )
+        }
+        failed = ComparisonJob.query.filter(stale, ComparisonJob.attempts >= max_attempts).update({
+            'status': 'failed',
+            'error': f'Worker stopped responding ({max_attempts} attempts)',
+            'finished_at': datetime.utcnow()
+        }, synchronize_session=False)
+        requeued = ComparisonJob.query.filter(stale).update({
+            'status': 'queued',
+            'phase': 'queued',
+            'worker_id': None
+        }, synchronize_session=False)
+        db.session.commit()
+        if failed or requeued:
+            print(f"[COMPARISON_JOB] Stale jobs: {requeued} requeued, {failed} failed", flush=True)
+        for parent_id in parent_ids:
+            ComparisonJobService._finish_partition(parent_id)
+        return failed + requeued
+    
+    @staticmethod
+    def recover() -> int:
+        """Stale job recovery for the thread runner (run periodically by the scheduler leader)
+        
+        Running jobs of processes that stopped sending heartbeats are requeued or failed
+        (requeue_stale), and jobs still queued after COMPARISON_JOB_STALE_SECONDS (their
+        process exited before running them) are dispatched to this process's pool. A job
+        that is still waiting in another process's pool is not run twice: claim() lets
+        only one of them start it.
+        
+        Returns:
+            Number of jobs requeued, failed or dispatched
+        """
+        recovered = ComparisonJobService.requeue_stale()
+        stale_seconds = int(current_app.config.get('COMPARISON_JOB_STALE_SECONDS', 300))
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        job_ids = db.session.execute(
+            select(ComparisonJob.id)
+            .where(ComparisonJob.status == 'queued', ComparisonJob.created_at < cutoff)
+            .order_by(ComparisonJob.id)
+        ).scalars().all()
+        db.session.rollback()
+        # Jobs already in this process's pool are skipped, so slow pools do not pile up futures
+        dispatched = sum(1 for job_id in job_ids if ComparisonJobService._dispatch(job_id))
+        if dispatched:
+            print(f"[COMPARISON_JOB] Dispatched {dispatched} job(s) left in the queue", flush=True)
+        return recovered + dispatched
+    
+    @staticmethod
+    def _progress_callback(job_id: int) -> Callable[..., None]:
+        """Build the compare_tables progress callback of a job
+        
+        Writes the phase and counters to the job row (phase changes right away, counter
+        updates at most every COMPARISON_PROGRESS_INTERVAL seconds) and raises
+        ComparisonCancelled when the job's cancellation was requested.
+        """
+        interval = float(current_app.config.get('COMPARISON_PROGRESS_INTERVAL', 1.0))
+        state = {'phase': None, 'written_at': 0.0, 'counters': {}}
+        
+        def progress(phase, **counters):
+            state['counters'].update(counters)
+            now = time.monotonic()
+            if phase == state['phase'] and now - state['written_at'] < interval:
+                return
+            state['phase'] = phase
+            state['written_at'] = now
+            
+            ComparisonJob.query.filter_by(id=job_id).update(
+                {'phase': phase, 'progress': dict(state['counters']), 'heartbeat_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+            cancel_requested = db.session.query(ComparisonJob.cancel_requested).filter_by(id=job_id).scalar()
+            db.session.commit()
+            if cancel_requested:
+                raise ComparisonCancelled(f'Comparison job {job_id} was cancelled')
+        
+        return progress
+    
+    @staticmethod
+    def _start_heartbeat(job_id: int) -> threading.Event:
+        """Refresh the job's heartbeat_at every COMPARISON_JOB_HEARTBEAT seconds until the
+        returned event is set (long table reads report no progress for a while)"""
+        app = current_app._get_current_object()
+        interval = max(1, int(current_app.config.get('COMPARISON_JOB_HEARTBEAT', 30)))
+        stop = threading.Event()
+        
+        def beat():
+            with app.app_context():
+                try:
+                    while not stop.wait(interval):
+                        ComparisonJob.query.filter_by(id=job_id, status='running').update(
+                            {'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+                        )
+                        db.session.commit()
+                except Exception as e:
+                    print(f"[COMPARISON_JOB] Heartbeat of job {job_id} stopped: {str(e)}", flush=True)
+                finally:
+                    db.session.remove()
+        
+        threading.Thread(target=beat, name=f'comparison-job-{job_id}-heartbeat', daemon=True).start()
+        return stop
+    
+    @classmethod
+    def run_job(cls, job_id: int):
+        """Claim and execute a queued comparison job on this process's background pool"""
+        # Out of the pool queue: a partition that requeues itself for a retry can be dispatched again
+        with cls._dispatched_lock:
+            cls._dispatched.discard(job_id)
+        worker_id = f'web:{socket.gethostname()}:{os.getpid()}'
+        if cls.claim(job_id, worker_id):
+            cls.execute(job_id)
+    
+    @staticmethod
+    def execute(job_id: int):
+        """Execute a comparison job claimed by this process
+        
+        Plain jobs compare the whole tables. Jobs with params.partitions > 1 are coordinators:
+        they plan key partitions and queue one partition job each, which any process
+        (thread pool or worker) may claim; the last partition to finish merges the results.
+        """
+        job = db.session.get(ComparisonJob, job_id)
+        if not job or job.status != 'running':
+            return
+        
+        print(f"[COMPARISON_JOB] Job {job_id} started on {job.worker_id} (attempt {job.attempts})", flush=True)
+        heartbeat = ComparisonJobService._start_heartbeat(job_id)
+        try:
+            if job.parent_job_id:
+                ComparisonJobService._execute_partition(job_id)
+            elif int((job.params or {}).get('partitions') or 1) > 1:
+                ComparisonJobService._execute_coordinator(job_id)
+            else:
+                ComparisonJobService._execute_comparison(job_id)
+        finally:
+            heartbeat.set()
+    
+    @staticmethod
+    def _execute_comparison(job_id: int, note: Optional[Dict] = None):
+        """Compare the whole tables of a job's project and save the comparison
+        
+        Args:
+            job_id: Running job
+            note: Extra comparison metadata (e.g. why a partitioned job runs unpartitioned)
+        """
+        job = db.session.get(ComparisonJob, job_id)
+        status, error, comparison_id, total = 'completed', None, None, None
+        try:
+            if job.cancel_requested:
+                raise ComparisonCancelled(f'Comparison job {job_id} was cancelled')
+            project = db.session.get(Project, job.project_id)
+            if not project:
+                raise ValueError(f'Project {job.project_id} not found')
+            metadata = dict(note or {})
+            if job.scheduled_task_id:
+                metadata['scheduled_task_id'] = job.scheduled_task_id
+            comparison, total = ComparisonJobService.run_project_comparison(
+                project,
+                job.params or {},
+                progress=ComparisonJobService._progress_callback(job_id),
+                metadata=metadata,
+                user_id=job.user_id if job.scheduled_task_id else None
+            )
+            comparison_id = comparison.id
+        except ComparisonCancelled:
+            db.session.rollback()
+            status = 'cancelled'
+        except Exception as e:
+            import traceback
+            db.session.rollback()
+            status, error = 'failed', str(e)
+            print(f"[COMPARISON_JOB] Job {job_id} failed: {error}", flush=True)
+            print(traceback.format_exc(), flush=True)
+        
+        job = db.session.get(ComparisonJob, job_id)
+        job.status = status
+        job.error = error
+        job.comparison_id = comparison_id
+        job.finished_at = datetime.utcnow()
+        if status == 'completed':
+            job.phase = 'done'
+            job.progress = dict(job.progress or {}, differences_found=total)
+        if job.scheduled_task_id:
+            ComparisonJobService._finish_scheduled_task(job, total)
+        db.session.commit()
+        print(f"[COMPARISON_JOB] Job {job_id} {status}", flush=True)
+    
+    @staticmethod
+    def _execute_coordinator(job_id: int):
+        """Plan the key partitions of a job, create its comparison and queue the partition jobs"""
+        job = db.session.get(ComparisonJob, job_id)
+        try:
+            progress = ComparisonJobService._progress_callback(job_id)
+            progress('planning')
+            project = db.session.get(Project, job.project_id)
+            if not project:
+                raise ValueError(f'Project {job.project_id} not found')
+            
+            params = dict(job.params or {})
+            count = int(params.pop('partitions'))
+            key_mappings = params.get('key_mappings') or {}
+            source_table = params.get('source_table') or project.source_table
+            target_table = params.get('target_table') or project.target_table
+            source_config, target_config = ComparisonJobService._connection_configs(project)
+            primary_keys = ComparisonJobService._primary_keys(project, source_config, source_table, params)
+            if not primary_keys:
+                raise ValueError('Partitioned comparisons need primary keys (none given and none found on the source table)')
+            
+            source_engine = DatabaseService.get_engine(source_config, already_decrypted=True, connection_id=project.source_connection_id)
+            target_engine = DatabaseService.get_engine(target_config, already_decrypted=True, connection_id=project.target_connection_id)
+            try:
+                strategy, partitions = DatabaseService.plan_key_partitions(
+                    source_engine, source_table, primary_keys,
+                    target_engine, target_table, [key_mappings.get(pk, pk) for pk in primary_keys],
+                    count
+                )
+            except HashPartitioningUnsupported as e:
+                # Hash buckets would not match across the two sides: compare the whole tables
+                print(f"[COMPARISON_JOB] Job {job_id} runs unpartitioned: {str(e)}", flush=True)
+                db.session.rollback()
+                ComparisonJobService._execute_comparison(job_id, note={'partitioning_skipped': str(e)})
+                return
+            
+            metadata = {
+                'primary_keys': primary_keys,
+                'key_mappings': key_mappings,
+                'ignored_columns': params.get('ignored_columns') or [],
+                'partitioned': {'strategy': strategy, 'partitions': len(partitions), 'job_id': job_id}
+            }
+            if job.scheduled_task_id:
+                metadata['scheduled_task_id'] = job.scheduled_task_id
+            comparison = Comparison(
+                project_id=project.id,
+                status='running',
+                total_differences=0,
+                comparison_metadata=metadata
+            )
+            db.session.add(comparison)
+            db.session.flush()
+            
+            child_params = dict(params, primary_keys=primary_keys)
+            children = [
+                ComparisonJob(
+                    project_id=project.id,
+                    user_id=job.user_id,
+                    status='queued',
+                    phase='queued',
+                    params=child_params,
+                    progress={},
+                    parent_job_id=job_id,
+                    partition_index=index,
+                    partition_spec={'strategy': strategy, 'condition': condition, 'params': condition_params},
+                    comparison_id=comparison.id
+                )
+                for index, (condition, condition_params) in enumerate(partitions)
+            ]
+            db.session.add_all(children)
+            
+            job = db.session.get(ComparisonJob, job_id)
+            job.status = 'waiting'
+            job.phase = 'partitioned'
+            job.comparison_id = comparison.id
+            job.progress = {
+                'partitions_total': len(children),
+                'partitions_done': 0,
+                'partitions_failed': 0,
+                'differences_found': 0
+            }
+            db.session.commit()
+            print(f"[COMPARISON_JOB] Job {job_id} split into {len(children)} {strategy} partitions (comparison {comparison.id})", flush=True)
+            
+            for child in children:
+                ComparisonJobService._dispatch(child.id)
+        except Exception as e:
+            db.session.rollback()
+            cancelled = isinstance(e, ComparisonCancelled)
+            if not cancelled:
+                import traceback
+                print(f"[COMPARISON_JOB] Job {job_id} failed to plan partitions: {str(e)}", flush=True)
+                print(traceback.format_exc(), flush=True)
+            job = db.session.get(ComparisonJob, job_id)
+            job.status = 'cancelled' if cancelled else 'failed'
+            job.error = None if cancelled else str(e)
+            job.finished_at = datetime.utcnow()
+            if job.scheduled_task_id:
+                ComparisonJobService._finish_scheduled_task(job, None)
+            db.session.commit()
+    
+    @staticmethod
+    def _execute_partition(job_id: int):
+        """Compare one key partition and add its differences to the coordinator's comparison
+        
+        A failed partition is queued again on its own until it was claimed
+        COMPARISON_JOB_MAX_ATTEMPTS times; the other partitions are not affected.
+        """
+        job = db.session.get(ComparisonJob, job_id)
+        parent_id = job.parent_job_id
+        retry = False
+        try:
+            if job.cancel_requested:
+                raise ComparisonCancelled(f'Comparison job {job_id} was cancelled')
+            project = db.session.get(Project, job.project_id)
+            if not project:
+                raise ValueError(f'Project {job.project_id} not found')
+            
+            params = job.params or {}
+            spec = job.partition_spec or {}
+            source_config, target_config = ComparisonJobService._connection_configs(project)
+            progress = ComparisonJobService._progress_callback(job_id)
+            _, differences = ComparisonService.compare_tables(
+                source_config,
+                target_config,
+                params.get('source_table') or project.source_table,
+                params.get('target_table') or project.target_table,
+                params.get('primary_keys') or [],
+                params.get('key_mappings') or {},
+                params.get('ignored_columns') or [],
+                source_connection_id=project.source_connection_id,
+                target_connection_id=project.target_connection_id,
+                progress=progress,
+                partition=(spec.get('condition'), spec.get('params') or {})
+            )
+            progress('saving', differences_found=len(differences))
+            
+            # Results and the partition's status are committed together
+            summary = ComparisonService.append_comparison_results(job.comparison_id, job.project_id, differences)
+            job = db.session.get(ComparisonJob, job_id)
+            job.status = 'completed'
+            job.phase = 'done'
+            job.error = None
+            job.progress = dict(job.progress or {}, differences_found=len(differences), summary=summary)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ComparisonJob, job_id)
+            if isinstance(e, ComparisonCancelled):
+                job.status = 'cancelled'
+            else:
+                import traceback
+                max_attempts = max(1, int(current_app.config.get('COMPARISON_JOB_MAX_ATTEMPTS', 3)))
+                retry = (job.attempts or 0) < max_attempts and not job.cancel_requested
+                print(f"[COMPARISON_JOB] Partition job {job_id} failed (attempt {job.attempts}/{max_attempts}): {str(e)}", flush=True)
+                print(traceback.format_exc(), flush=True)
+                job.error = str(e)
+                job.status = 'queued' if retry else 'failed'
+                job.phase = 'queued' if retry else job.phase
+                job.worker_id = None
+            if not retry:
+                job.finished_at = datetime.utcnow()
+            db.session.commit()
+        
+        print(f"[COMPARISON_JOB] Partition job {job_id} {db.session.get(ComparisonJob, job_id).status}", flush=True)
+        if retry:
+            ComparisonJobService._dispatch(job_id)
+        else:
+            ComparisonJobService._finish_partition(parent_id)
+    
+    @staticmethod
+    def _finish_partition(parent_id: int):
+        """Update a coordinator after one of its partitions finished, merging when all did
+        
+        Only the caller whose conditional UPDATE moves the coordinator from 'partitioned'
+        to 'merging' merges, so concurrent partitions finishing together merge once.
+        """
+        children = ComparisonJob.query.filter_by(parent_job_id=parent_id).order_by(ComparisonJob.partition_index).all()
+        completed = [child for child in children if child.status == 'completed']
+        failed = [child for child in children if child.status == 'failed']
+        cancelled = [child for child in children if child.status == 'cancelled']
+        progress = {
+            'partitions_total': len(children),
+            'partitions_done': len(completed),
+            'partitions_failed': len(failed),
+            'partitions_cancelled': len(cancelled),
+            'differences_found': sum((child.progress or {}).get('differences_found') or 0 for child in completed)
+        }
+        
+        if any(child.status in ('queued', 'running') for child in children):
+            ComparisonJob.query.filter_by(id=parent_id, status='waiting').update(
+                {'progress': progress, 'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+            return
+        
+        merging = ComparisonJob.query.filter_by(id=parent_id, status='waiting', phase='partitioned').update(
+            {'phase': 'merging'}, synchronize_session=False
+        )
+        db.session.commit()
+        if merging != 1:
+            return
+        
+        parent = db.session.get(ComparisonJob, parent_id)
+        comparison = db.session.get(Comparison, parent.comparison_id)
+        summary = ComparisonService.merge_summaries([(child.progress or {}).get('summary') or {} for child in completed])
+        
+        if failed or cancelled:
+            status = 'cancelled' if parent.cancel_requested and not failed else 'failed'
+            errors = [f'partition {child.partition_index}: {child.error}' for child in failed if child.error]
+            parent.error = None if status == 'cancelled' else f'{len(failed)} of {len(children)} partitions failed' + (f' ({errors[0]})' if errors else '')
+            parent.phase = 'partitioned'
+        else:
+            status = 'completed'
+            parent.error = None
+            parent.phase = 'done'
+        
+        comparison.status = 'completed' if status == 'completed' else 'failed'
+        comparison.total_differences = summary['total']
+        comparison.comparison_metadata = dict(comparison.comparison_metadata or {}, summary=summary)
+        parent.status = status
+        parent.progress = progress
+        parent.finished_at = datetime.utcnow()
+        if parent.scheduled_task_id:
+            ComparisonJobService._finish_scheduled_task(parent, summary['total'])
+        db.session.commit()
+        DashboardCache.invalidate(parent.project_id)
+        print(f"[COMPARISON_JOB] Job {parent_id} {status}: merged {len(completed)}/{len(children)} partitions, {summary['total']} differences", flush=True)
+    
+    @staticmethod
+    def retry_partitions(job: ComparisonJob) -> int:
+        """Queue the failed and cancelled partitions of a finished partitioned job again
+        
+        Completed partitions keep their results; the coordinator waits for the retried
+        partitions and merges again.
+        
+        Returns:
+            Number of partitions queued
+        """
+        retried = [
+            child for child in ComparisonJob.query.filter_by(parent_job_id=job.id)
+            if child.status in ('failed', 'cancelled')
+        ]
+        if not retried:
+            return 0
+        for child in retried:
+            child.status = 'queued'
+            child.phase = 'queued'
+            child.attempts = 0
+            child.error = None
+            child.worker_id = None
+            child.cancel_requested = False
+            child.finished_at = None
+        job.status = 'waiting'
+        job.phase = 'partitioned'
+        job.error = None
+        job.cancel_requested = False
+        job.finished_at = None
+        comparison = db.session.get(Comparison, job.comparison_id)
+        if comparison:
+            comparison.status = 'running'
+        db.session.commit()
+        
+        for child in retried:
+            ComparisonJobService._dispatch(child.id)
+        print(f"[COMPARISON_JOB] Job {job.id}: {len(retried)} partitions queued again", flush=True)
+        return len(retried)
+    
+    @staticmethod
+    def _finish_scheduled_task(job: ComparisonJob, total: Optional[int]):
+        """Record the outcome of a queued scheduled comparison on its task"""
+        from app.services.scheduler_service import SchedulerService
+        
+        task = db.session.get(ScheduledTask, job.scheduled_task_id)
+        if not task:
+            return
+        if job.status == 'completed':
+            task.last_run_status = 'success'
+            task.last_run_message = f'Comparison completed successfully. Found {total} differences.'
+            task.successful_runs = (task.successful_runs or 0) + 1
+        else:
+            task.last_run_status = 'failed'
+            task.last_run_message = (job.error or f'Comparison job {job.status}')[:500]
+            task.failed_runs = (task.failed_runs or 0) + 1
+        task.next_run_at = SchedulerService.calculate_next_run(
+            task.schedule_type,
+            task.schedule_value,
+            task.last_run_at
+        )
+    
+    @staticmethod
+    def request_cancel(job: ComparisonJob) -> ComparisonJob:
+        """Cancel a job and its partitions: queued jobs stop right away, running jobs at their next chunk"""
+        if job.is_finished:
+            return job
+        # Conditional updates: a worker may claim the job (or one of its partitions)
+        # between these statements
+        targets = or_(ComparisonJob.id == job.id, ComparisonJob.parent_job_id == job.id)
+        ComparisonJob.query.filter(targets).update({'cancel_requested': True}, synchronize_session=False)
+        ComparisonJob.query.filter(targets, ComparisonJob.status == 'queued').update({
+            'status': 'cancelled',
+            'finished_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        if job.status == 'waiting':
+            ComparisonJobService._finish_partition(job.id)
+        db.session.refresh(job)
+        return job
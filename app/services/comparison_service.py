@@ -1,11 +1,16 @@
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 from datetime import datetime
 from app.services.database import DatabaseService
 from app.models.comparison import Comparison, ComparisonResult
 from app.models.change_log import ChangeLog
+from app.models.project import Project
+from app.services.rollup_service import RollupService
+from app.utils.dashboard_cache import DashboardCache
+from app.utils.pagination import encode_cursor, decode_cursor
 from app import db
 import requests
+from sqlalchemy import select, func, or_, and_
 from flask import current_app
 import sys
 import json
@@ -22,7 +27,11 @@ class ComparisonService:
         target_table: str,
         primary_keys: List[str],
         key_mappings: Optional[Dict[str, str]] = None,
-        ignored_columns: Optional[List[str]] = None
+        ignored_columns: Optional[List[str]] = None,
+        source_connection_id: Optional[int] = None,
+        target_connection_id: Optional[int] = None,
+        progress: Optional[Callable[..., None]] = None,
+        partition: Optional[Tuple[str, Dict]] = None
     ) -> Tuple[pd.DataFrame, List[Dict]]:
         """
         Compare two tables and return differences
@@ -36,6 +45,14 @@ class ComparisonService:
             key_mappings: Dictionary mapping source column names to target column names
                         e.g., {'user_id': 'id_user', 'name': 'nome'}
             ignored_columns: List of column names to ignore during comparison
+            source_connection_id: Source DatabaseConnection id (reuses its pooled engine)
+            target_connection_id: Target DatabaseConnection id (reuses its pooled engine)
+            progress: Optional callback progress(phase, **counters) called after each table
+                read and every COMPARISON_PROGRESS_CHUNK records; it may raise to stop the
+                comparison (used for cooperative cancellation of background jobs)
+            partition: Optional (key condition template, params) from
+                DatabaseService.plan_key_partitions; only the rows of that key partition are
+                read from both tables (primary_keys is required)
         
         Returns:
             Tuple of (differences DataFrame, list of change dictionaries)
@@ -43,12 +60,19 @@ class ComparisonService:
         key_mappings = key_mappings or {}
         ignored_columns = ignored_columns or []
         
+        counters = {}
+        chunk_size = max(1, int(current_app.config.get('COMPARISON_PROGRESS_CHUNK', 1000)))
+        
+        def report(phase, **values):
+            counters.update(values)
+            if progress:
+                progress(phase, **counters)
+        
         # Ensure key_mappings is a dict
         if not isinstance(key_mappings, dict):
             print(f"[COMPARISON] WARNING: key_mappings is not a dict, converting. Type: {type(key_mappings)}, Value: {key_mappings}", flush=True)
             if isinstance(key_mappings, str):
                 try:
-                    import json
                     key_mappings = json.loads(key_mappings)
                 except:
                     key_mappings = {}
@@ -58,12 +82,25 @@ class ComparisonService:
         print(f"[COMPARISON] Starting comparison with key_mappings: {key_mappings}", flush=True)
         print(f"[COMPARISON] Key mappings type: {type(key_mappings)}, length: {len(key_mappings)}", flush=True)
         
-        source_engine = DatabaseService.get_engine(source_config, already_decrypted=True)
-        target_engine = DatabaseService.get_engine(target_config, already_decrypted=True)
+        source_engine = DatabaseService.get_engine(source_config, already_decrypted=True, connection_id=source_connection_id)
+        target_engine = DatabaseService.get_engine(target_config, already_decrypted=True, connection_id=target_connection_id)
         
         # Get data from both tables
-        source_df = DatabaseService.get_table_data(source_engine, source_table)
-        target_df = DatabaseService.get_table_data(target_engine, target_table)
+        report('reading_source')
+        if partition:
+            if not primary_keys:
+                raise ValueError('Partitioned comparisons need primary keys')
+            condition, condition_params = partition
+            source_df = DatabaseService.read_partition(source_engine, source_table, None, primary_keys, condition, condition_params)
+            report('reading_target', source_rows=len(source_df), rows_read=len(source_df))
+            target_df = DatabaseService.read_partition(
+                target_engine, target_table, None, [key_mappings.get(pk, pk) for pk in primary_keys], condition, condition_params
+            )
+        else:
+            source_df = DatabaseService.get_table_data(source_engine, source_table)
+            report('reading_target', source_rows=len(source_df), rows_read=len(source_df))
+            target_df = DatabaseService.get_table_data(target_engine, target_table)
+        report('comparing', target_rows=len(target_df), rows_read=len(source_df) + len(target_df))
         
         print(f"[COMPARISON] Source table rows: {len(source_df)}, columns: {list(source_df.columns)}", flush=True)
         print(f"[COMPARISON] Target table rows: {len(target_df)}, columns: {list(target_df.columns)}", flush=True)
@@ -177,10 +214,23 @@ class ComparisonService:
         # Find differences
         differences = []
         
-        # Find records in source but not in target (added)
         source_only = source_df_indexed.index.difference(target_df_indexed.index)
+        target_only = target_df_indexed.index.difference(source_df_indexed.index)
+        common_index = source_df_indexed.index.intersection(target_df_indexed.index)
+        records_compared = 0
+        report('comparing', records_total=len(source_only) + len(target_only) + len(common_index),
+               records_compared=0, differences_found=0)
+        
+        def record_done():
+            nonlocal records_compared
+            records_compared += 1
+            if records_compared % chunk_size == 0:
+                report('comparing', records_compared=records_compared, differences_found=len(differences))
+        
+        # Find records in source but not in target (added)
         print(f"[COMPARISON] Records only in source: {len(source_only)}", flush=True)
         for idx in source_only:
+            record_done()
             record = source_df_indexed.loc[idx]
             for col in source_df.columns:
                 if col not in primary_keys and col not in ignored_columns:
@@ -194,9 +244,9 @@ class ComparisonService:
                     })
         
         # Find records in target but not in source (deleted)
-        target_only = target_df_indexed.index.difference(source_df_indexed.index)
         print(f"[COMPARISON] Records only in target: {len(target_only)}", flush=True)
         for idx in target_only:
+            record_done()
             record = target_df_indexed.loc[idx]
             # Use columns from mapped target dataframe
             for col in target_df_indexed.columns:
@@ -211,11 +261,11 @@ class ComparisonService:
                     })
         
         # Find modified records
-        common_index = source_df_indexed.index.intersection(target_df_indexed.index)
         print(f"[COMPARISON] Common records: {len(common_index)}", flush=True)
         modified_count = 0
         
         for idx in common_index:
+            record_done()
             source_record = source_df_indexed.loc[idx]
             target_record = target_df_indexed.loc[idx]
             
@@ -256,6 +306,7 @@ class ComparisonService:
         
         # Enrich differences with complete target record data
         print(f"[COMPARISON] Enriching differences with target record data...", flush=True)
+        report('enriching', records_compared=records_compared, differences_found=len(differences))
         differences_with_target_data = []
         
         # Group differences by record_id to fetch complete records
@@ -268,7 +319,9 @@ class ComparisonService:
                 differences_by_record[record_id].append(diff)
         
         # Fetch complete target records for each record_id
-        for record_id, record_diffs in differences_by_record.items():
+        for enriched, (record_id, record_diffs) in enumerate(differences_by_record.items(), start=1):
+            if enriched % chunk_size == 0:
+                report('enriching')
             try:
                 # Parse record_id to get index values
                 if '|' in str(record_id):
@@ -433,30 +486,39 @@ class ComparisonService:
         return differences_df, differences_with_target_data
     
     @staticmethod
-    def save_comparison_results(
-        project_id: int,
-        differences: List[Dict],
-        metadata: Optional[Dict] = None,
-        user_id: Optional[int] = None
-    ) -> Comparison:
-        """Save comparison results to database"""
-        print(f"[SAVE_RESULTS] Saving {len(differences)} differences for project {project_id}", flush=True)
+    def summarize_differences(differences: List[Dict]) -> Dict:
+        """Build the per-comparison summary stored in comparison_metadata
         
-        comparison = Comparison(
-            project_id=project_id,
-            status='completed',
-            total_differences=len(differences),
-            comparison_metadata=metadata or {}
-        )
-        if user_id:
-            comparison.user_id = user_id
-        db.session.add(comparison)
-        db.session.flush()
-        
-        print(f"[SAVE_RESULTS] Comparison created with ID: {comparison.id}, total_differences: {comparison.total_differences}", flush=True)
+        Returns:
+            Dictionary with counts per change_type, per field, the number of distinct
+            records touched and the total number of differences
+        """
+        by_change_type = {}
+        by_field = {}
+        records = set()
+        for diff in differences:
+            change_type = diff.get('change_type')
+            field_name = diff.get('field_name')
+            by_change_type[change_type] = by_change_type.get(change_type, 0) + 1
+            by_field[field_name] = by_field.get(field_name, 0) + 1
+            record_id = diff.get('record_id')
+            records.add(str(record_id) if record_id is not None else None)
+        return {
+            'by_change_type': by_change_type,
+            'by_field': by_field,
+            'records_touched': len(records),
+            'total': len(differences)
+        }
+    
+    @staticmethod
+    def _add_results(comparison: Comparison, project_id: int, differences: List[Dict], detected_at: datetime) -> Tuple[int, List[Dict]]:
+        """Add the ComparisonResult and ChangeLog rows of differences to the session
         
-        # Save individual results
+        Returns:
+            Tuple of (number of results added, differences that were logged)
+        """
         results_saved = 0
+        logged_differences = []
         if len(differences) == 0:
             print(f"[SAVE_RESULTS] WARNING: No differences to save! differences list is empty.", flush=True)
         else:
@@ -493,20 +555,97 @@ class ComparisonService:
                         field_name=field_name,
                         old_value=target_value,
                         new_value=source_value,
-                        change_type=change_type
+                        change_type=change_type,
+                        detected_at=detected_at
                     )
                     db.session.add(change_log)
+                    logged_differences.append(diff)
                 except Exception as e:
                     print(f"[SAVE_RESULTS] Error saving diff {i}: {str(e)}", flush=True)
                     import traceback
                     print(traceback.format_exc(), flush=True)
                     continue
         
+        return results_saved, logged_differences
+    
+    @staticmethod
+    def append_comparison_results(comparison_id: int, project_id: int, differences: List[Dict]) -> Dict:
+        """Add the differences of one partition to an existing comparison (without committing)
+        
+        The caller commits, so the results and the partition job's status are stored together.
+        
+        Returns:
+            Summary of the added differences (see summarize_differences)
+        """
+        comparison = db.session.get(Comparison, comparison_id)
+        if not comparison:
+            raise ValueError(f'Comparison {comparison_id} not found')
+        detected_at = datetime.utcnow()
+        results_saved, logged_differences = ComparisonService._add_results(comparison, project_id, differences, detected_at)
+        RollupService.record_changes(project_id, logged_differences, detected_at)
+        print(f"[SAVE_RESULTS] Added {results_saved} partition results to comparison {comparison_id}", flush=True)
+        return ComparisonService.summarize_differences(logged_differences)
+    
+    @staticmethod
+    def merge_summaries(summaries: List[Dict]) -> Dict:
+        """Combine the summaries of disjoint key partitions into one comparison summary"""
+        by_change_type = {}
+        by_field = {}
+        records_touched = 0
+        for summary in summaries:
+            for change_type, count in (summary.get('by_change_type') or {}).items():
+                by_change_type[change_type] = by_change_type.get(change_type, 0) + count
+            for field_name, count in (summary.get('by_field') or {}).items():
+                by_field[field_name] = by_field.get(field_name, 0) + count
+            records_touched += summary.get('records_touched') or 0
+        return {
+            'by_change_type': by_change_type,
+            'by_field': by_field,
+            'records_touched': records_touched,
+            'total': sum(by_change_type.values())
+        }
+    
+    @staticmethod
+    def save_comparison_results(
+        project_id: int,
+        differences: List[Dict],
+        metadata: Optional[Dict] = None,
+        user_id: Optional[int] = None
+    ) -> Comparison:
+        """Save comparison results to database"""
+        print(f"[SAVE_RESULTS] Saving {len(differences)} differences for project {project_id}", flush=True)
+        
+        comparison = Comparison(
+            project_id=project_id,
+            status='completed',
+            total_differences=len(differences),
+            comparison_metadata=metadata or {}
+        )
+        if user_id:
+            comparison.user_id = user_id
+        db.session.add(comparison)
+        db.session.flush()
+        
+        print(f"[SAVE_RESULTS] Comparison created with ID: {comparison.id}, total_differences: {comparison.total_differences}", flush=True)
+        
+        # Save individual results
+        detected_at = datetime.utcnow()
+        results_saved, logged_differences = ComparisonService._add_results(comparison, project_id, differences, detected_at)
+        
         print(f"[SAVE_RESULTS] Added {results_saved} ComparisonResult records to session", flush=True)
         
+        # Store result counts so readers don't need COUNT queries over comparison_results
+        comparison.comparison_metadata = dict(
+            comparison.comparison_metadata or {},
+            summary=ComparisonService.summarize_differences(logged_differences)
+        )
+        
         try:
+            # Update dashboard rollups in the same transaction as the change logs
+            RollupService.record_changes(project_id, logged_differences, detected_at)
             db.session.commit()
             print(f"[SAVE_RESULTS] Committed to database. Comparison ID: {comparison.id}", flush=True)
+            DashboardCache.invalidate(project_id)
         except Exception as e:
             print(f"[SAVE_RESULTS] ERROR committing to database: {str(e)}", flush=True)
             import traceback
@@ -538,6 +677,7 @@ class ComparisonService:
             'success': [],
             'failed': []
         }
+        sent_logs = []
         
         for change_log in change_logs:
             if change_log.sent_to_api:
@@ -571,6 +711,7 @@ class ComparisonService:
                 
                 change_log.sent_to_api = True
                 change_log.sent_at = datetime.utcnow()
+                sent_logs.append(change_log)
                 change_log.api_response = {
                     'status_code': response.status_code,
                     'response': response.text[:500]  # Limit response size
@@ -591,7 +732,92 @@ class ComparisonService:
                     'error': str(e)
                 })
         
+        RollupService.mark_sent(sent_logs)
         db.session.commit()
+        for project_id in {log.project_id for log in sent_logs}:
+            DashboardCache.invalidate(project_id)
         return results
-
-
+    
+    @staticmethod
+    def list_comparisons(
+        user_id: int,
+        filters: Optional[Dict] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """Get one keyset page of comparisons of a user's active projects, newest first
+        
+        Project name and tables come from a join, and pages continue after the
+        (executed_at, id) position of the previous page instead of using OFFSET.
+        
+        Args:
+            user_id: Owner of the projects
+            filters: Optional dict with project_id, status, start_date and end_date
+            limit: Page size
+            cursor: Position returned by the previous page
+        
+        Returns:
+            Dictionary with comparisons, next_cursor, has_more and total. total is only
+            counted for the first page (no cursor) and is None otherwise.
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        filters = filters or {}
+        stmt = select(
+            Comparison, Project.name, Project.source_table, Project.target_table
+        ).join(Project, Comparison.project_id == Project.id).where(
+            Project.user_id == user_id,
+            Project.is_active == True
+        )
+        if filters.get('project_id'):
+            stmt = stmt.where(Comparison.project_id == filters['project_id'])
+        if filters.get('status'):
+            stmt = stmt.where(Comparison.status == filters['status'])
+        if filters.get('start_date'):
+            stmt = stmt.where(Comparison.executed_at >= filters['start_date'])
+        if filters.get('end_date'):
+            stmt = stmt.where(Comparison.executed_at <= filters['end_date'])
+        
+        total = None
+        if not cursor:
+            total = db.session.execute(
+                stmt.with_only_columns(func.count(Comparison.id)).order_by(None)
+            ).scalar() or 0
+        
+        if cursor:
+            executed_at, comparison_id = decode_cursor(cursor, is_datetime=True)
+            if executed_at is None:
+                # NULL dates sort last in descending order
+                stmt = stmt.where(Comparison.executed_at.is_(None), Comparison.id < comparison_id)
+            else:
+                stmt = stmt.where(or_(
+                    Comparison.executed_at < executed_at,
+                    and_(Comparison.executed_at == executed_at, Comparison.id < comparison_id),
+                    Comparison.executed_at.is_(None)
+                ))
+        
+        stmt = stmt.order_by(Comparison.executed_at.desc(), Comparison.id.desc()).limit(limit + 1)
+        rows = db.session.execute(stmt).all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        comparisons = []
+        for comparison, project_name, source_table, target_table in rows:
+            comp_dict = comparison.to_dict()
+            comp_dict['project_name'] = project_name
+            comp_dict['project_source_table'] = source_table
+            comp_dict['project_target_table'] = target_table
+            comparisons.append(comp_dict)
+        
+        next_cursor = None
+        if has_more:
+            last = rows[-1][0]
+            next_cursor = encode_cursor(last.executed_at, last.id)
+        
+        return {
+            'comparisons': comparisons,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'total': total
+        }
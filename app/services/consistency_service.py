@@ -1,214 +1,1001 @@
-from typing import Dict, List, Tuple, Optional
-from sqlalchemy import create_engine, text, inspect
+from typing import Dict, Iterator, List, Tuple, Optional
+from flask import current_app
+from sqlalchemy import create_engine, text, inspect, select, tuple_, table as sa_table, column as sa_column
 from app.services.database import DatabaseService
+from app.utils.background_jobs import BackgroundJobs
 import pandas as pd
+import numpy as np
 from app import db
 from app.models.data_consistency import DataConsistencyConfig, DataConsistencyCheck, DataConsistencyResult
-from datetime import datetime
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 
 
 class ConsistencyService:
     """Service for data consistency checks between different tables"""
     
+    # Keys per IN (...) query when reading the counterpart rows of an incremental check
+    KEY_BATCH_SIZE = 500
+    
     @staticmethod
-    def check_consistency(config: DataConsistencyConfig) -> Tuple[DataConsistencyCheck, List[Dict]]:
-        """
-        Check data consistency between two tables based on configuration
+    def _text_values(merged_df: pd.DataFrame, column: str) -> np.ndarray:
+        """Column values as an object array (all None when the column is missing)"""
+        if column not in merged_df.columns:
+            return np.full(len(merged_df), None, dtype=object)
+        return merged_df[column].to_numpy(dtype=object)
+    
+    @staticmethod
+    def _differs(source: pd.Series, target: pd.Series) -> np.ndarray:
+        """Element-wise str(source) != str(target), ignoring null positions"""
+        same_numpy_dtype = (
+            isinstance(source.dtype, np.dtype) and source.dtype == target.dtype
+            and source.dtype.kind in 'biufmM'
+        )
+        if same_numpy_dtype:
+            # Equal values of the same numpy dtype print the same and vice versa, except
+            # floats: 0.0 == -0.0 but they print differently, so compare the sign bit too
+            source_values = source.to_numpy()
+            target_values = target.to_numpy()
+            differs = source_values != target_values
+            if source.dtype.kind == 'f':
+                differs |= np.signbit(source_values) != np.signbit(target_values)
+            return differs
+        source_text = source.map(str, na_action='ignore').to_numpy(dtype=object)
+        target_text = target.map(str, na_action='ignore').to_numpy(dtype=object)
+        return source_text != target_text
+    
+    @staticmethod
+    def _iter_inconsistent_rows(merged_df: pd.DataFrame, source_key_cols: List[str], comparison_fields: List[Dict]) -> Iterator[List[Dict]]:
+        """Find inconsistent cells of an outer merge with per-field column masks
+        
+        Rows present on one side only yield one result per comparison field; rows present
+        on both sides yield one result per field whose values differ as text. Result dicts
+        are only built for failing cells and are yielded per merged row, in field order.
         
         Args:
-            config: DataConsistencyConfig with join mappings and comparison fields
+            merged_df: Outer merge of source and target with suffixes _source/_target and _merge indicator
+            source_key_cols: Join key columns (source names)
+            comparison_fields: List of {'source_field', 'target_field'}
+        
+        Yields:
+            List of inconsistency dicts of one merged row
+        """
+        if merged_df.empty:
+            return
+        
+        indicator = merged_df['_merge'].to_numpy(dtype=object)
+        left_only = indicator == 'left_only'
+        right_only = indicator == 'right_only'
+        both = indicator == 'both'
+        
+        positions = []
+        field_indexes = []
+        types = []
+        for field_index, field_map in enumerate(comparison_fields):
+            source_field = field_map['source_field']
+            source_col = f"{source_field}_source"
+            target_col = f"{source_field}_target"
+            
+            if source_col in merged_df.columns and target_col in merged_df.columns:
+                source_null = merged_df[source_col].isna().to_numpy()
+                target_null = merged_df[target_col].isna().to_numpy()
+                differs = ConsistencyService._differs(merged_df[source_col], merged_df[target_col])
+                mismatch = both & ((source_null != target_null) | (~source_null & ~target_null & differs))
+            else:
+                # A missing side reads as None, so only a present non-null value can differ
+                present = source_col if source_col in merged_df.columns else target_col
+                if present in merged_df.columns:
+                    mismatch = both & merged_df[present].notna().to_numpy()
+                else:
+                    mismatch = np.zeros(len(merged_df), dtype=bool)
+            
+            for mask, inconsistency_type in (
+                (left_only, 'missing_in_target'),
+                (right_only, 'missing_in_source'),
+                (mismatch, 'value_mismatch')
+            ):
+                failing = np.flatnonzero(mask)
+                positions.append(failing)
+                field_indexes.append(np.full(len(failing), field_index))
+                types.append(np.full(len(failing), inconsistency_type, dtype=object))
+        
+        positions = np.concatenate(positions)
+        if len(positions) == 0:
+            return
+        field_indexes = np.concatenate(field_indexes)
+        types = np.concatenate(types)
+        order = np.lexsort((field_indexes, positions))
+        
+        key_values = {col: ConsistencyService._text_values(merged_df, col) for col in source_key_cols}
+        field_values = {}
+        for field_map in comparison_fields:
+            source_field = field_map['source_field']
+            field_values[source_field] = (
+                ConsistencyService._text_values(merged_df, f"{source_field}_source"),
+                ConsistencyService._text_values(merged_df, f"{source_field}_target")
+            )
+        
+        def as_text(value):
+            return str(value) if pd.notna(value) else None
+        
+        current_position = None
+        row_inconsistencies = []
+        for i in order:
+            position = positions[i]
+            if position != current_position:
+                if row_inconsistencies:
+                    yield row_inconsistencies
+                current_position = position
+                row_inconsistencies = []
+                join_key_values = {}
+                for col, values in key_values.items():
+                    key_text = as_text(values[position])
+                    join_key_values[col] = key_text if key_text is not None else 'N/A'
             
+            source_field = comparison_fields[field_indexes[i]]['source_field']
+            source_values, target_values = field_values[source_field]
+            inconsistency_type = types[i]
+            row_inconsistencies.append({
+                'join_key_values': join_key_values,
+                'field_name': source_field,
+                'source_value': None if inconsistency_type == 'missing_in_source' else as_text(source_values[position]),
+                'target_value': None if inconsistency_type == 'missing_in_target' else as_text(target_values[position]),
+                'inconsistency_type': inconsistency_type
+            })
+        
+        if row_inconsistencies:
+            yield row_inconsistencies
+    
+    @staticmethod
+    def _compact_row(row_inconsistencies: List[Dict]) -> Dict:
+        """Merge the per-field inconsistencies of one join key into a single result"""
+        types = {item['inconsistency_type'] for item in row_inconsistencies}
+        return {
+            'join_key_values': row_inconsistencies[0]['join_key_values'],
+            'field_name': '*',
+            'source_value': None,
+            'target_value': None,
+            'inconsistency_type': types.pop() if len(types) == 1 else 'value_mismatch',
+            'field_mismatches': {
+                item['field_name']: {
+                    'source_value': item['source_value'],
+                    'target_value': item['target_value']
+                }
+                for item in row_inconsistencies
+            }
+        }
+    
+    @staticmethod
+    def _save_results(check: DataConsistencyCheck, rows: Iterator[List[Dict]], compact: bool = False) -> Dict:
+        """Insert inconsistencies in batches with Core executemany, committing after each batch
+        
+        check.total_inconsistencies is updated with every batch, so a running check shows
+        its progress to other requests.
+        
+        Args:
+            check: Running DataConsistencyCheck (already committed)
+            rows: Per-row lists of inconsistency dicts (see _iter_inconsistent_rows)
+            compact: Store one result per join key instead of one per field
+        
+        Returns:
+            Dictionary with total_inconsistencies and result_rows
+        """
+        batch_size = max(1, int(current_app.config.get('CONSISTENCY_RESULT_BATCH_SIZE', 1000)))
+        table = DataConsistencyResult.__table__
+        detected_at = datetime.utcnow()
+        total = 0
+        result_rows = 0
+        batch = []
+        
+        def flush(batch, total):
+            db.session.execute(table.insert(), batch)
+            check.total_inconsistencies = total
+            db.session.commit()
+        
+        for row_inconsistencies in rows:
+            total += len(row_inconsistencies)
+            items = [ConsistencyService._compact_row(row_inconsistencies)] if compact else row_inconsistencies
+            for item in items:
+                batch.append({
+                    'check_id': check.id,
+                    'join_key_values': item['join_key_values'],
+                    'field_name': item['field_name'],
+                    'source_value': item['source_value'],
+                    'target_value': item['target_value'],
+                    'inconsistency_type': item['inconsistency_type'],
+                    'field_mismatches': item.get('field_mismatches'),
+                    'detected_at': detected_at
+                })
+            if len(batch) >= batch_size:
+                result_rows += len(batch)
+                flush(batch, total)
+                batch = []
+        
+        if batch:
+            result_rows += len(batch)
+            flush(batch, total)
+        
+        return {'total_inconsistencies': total, 'result_rows': result_rows}
+    
+    @staticmethod
+    def _source_columns(config: DataConsistencyConfig) -> List[str]:
+        """Columns a config reads from its source table (join keys, then comparison fields)"""
+        join_mappings = config.join_mappings or {}
+        comparison_fields = config.comparison_fields or []
+        
+        if not join_mappings:
+            raise ValueError("No join mappings defined")
+        
+        if not comparison_fields:
+            raise ValueError("No comparison fields defined")
+        
+        return list(join_mappings.keys()) + [field_map['source_field'] for field_map in comparison_fields]
+    
+    @staticmethod
+    def _target_columns(config: DataConsistencyConfig) -> List[str]:
+        """Columns a config reads from its target table (join keys, then comparison fields)"""
+        join_mappings = config.join_mappings or {}
+        comparison_fields = config.comparison_fields or []
+        return list(join_mappings.values()) + [field_map['target_field'] for field_map in comparison_fields]
+    
+    @staticmethod
+    def _source_read_columns(config: DataConsistencyConfig) -> List[str]:
+        """Source columns to read: the config's columns plus its watermark column"""
+        extra = [config.watermark_column] if config.watermark_column else []
+        return ConsistencyService._source_columns(config) + extra
+    
+    @staticmethod
+    def _target_read_columns(config: DataConsistencyConfig) -> List[str]:
+        """Target columns to read: the config's columns plus its target watermark column"""
+        extra = [config.target_watermark_column] if config.watermark_column and config.target_watermark_column else []
+        return ConsistencyService._target_columns(config) + extra
+    
+    @staticmethod
+    def _get_engine(connection):
+        """Pooled engine of a DatabaseConnection"""
+        connection_config = connection.get_decrypted_config()
+        connection_config['type'] = connection.db_type
+        return DatabaseService.get_engine(connection_config, already_decrypted=True, connection_id=connection.id)
+    
+    @staticmethod
+    def _read_columns(engine, table_name: str, columns: List[str]) -> pd.DataFrame:
+        """Read the given columns (each once) of a whole table"""
+        unique_columns = list(dict.fromkeys(columns))
+        sql = f"SELECT {', '.join(unique_columns)} FROM {table_name}"
+        return pd.read_sql(text(sql), engine)
+    
+    @staticmethod
+    def _watermark_value(series: pd.Series):
+        """JSON-safe maximum of a watermark column (None for an empty or all-null column)"""
+        value = series.max() if len(series) else None
+        if value is None or pd.isna(value):
+            return None
+        if isinstance(value, np.integer):
+            return int(value)
+        if isinstance(value, np.floating):
+            return float(value)
+        if isinstance(value, (int, float)):
+            return value
+        # Datetimes become 'YYYY-MM-DD HH:MM:SS', which compares correctly as a SQL parameter
+        return str(value)
+    
+    @staticmethod
+    def _watermark(config: DataConsistencyConfig, source_df: pd.DataFrame, target_df: pd.DataFrame, previous: Optional[Dict] = None) -> Dict:
+        """Watermark reached by a check, keeping the previous values of sides without new rows"""
+        previous = previous or {}
+        watermark = {
+            'column': config.watermark_column,
+            'value': ConsistencyService._watermark_value(source_df[config.watermark_column]),
+            'target_column': config.target_watermark_column,
+            'target_value': None
+        }
+        if config.target_watermark_column and config.target_watermark_column in target_df.columns:
+            watermark['target_value'] = ConsistencyService._watermark_value(target_df[config.target_watermark_column])
+        if watermark['value'] is None:
+            watermark['value'] = previous.get('value')
+        if watermark['target_value'] is None and previous.get('target_column') == config.target_watermark_column:
+            watermark['target_value'] = previous.get('target_value')
+        return watermark
+    
+    @staticmethod
+    def _last_watermark(config: DataConsistencyConfig) -> Optional[Dict]:
+        """Watermark of the latest completed check that used the config's watermark column
+        
+        The returned dict also holds check_id, the check the watermark comes from.
+        """
+        checks = DataConsistencyCheck.query.filter_by(
+            config_id=config.id,
+            status='completed'
+        ).order_by(DataConsistencyCheck.executed_at.desc(), DataConsistencyCheck.id.desc()).limit(20)
+        for check in checks:
+            watermark = (check.check_metadata or {}).get('watermark')
+            if watermark and watermark.get('column') == config.watermark_column:
+                return dict(watermark, check_id=check.id)
+        return None
+    
+    @staticmethod
+    def _overlap_start(value):
+        """Lower a watermark by CONSISTENCY_WATERMARK_LAG to re-read late-committed rows
+        
+        The lag is in seconds for date/time watermarks and in watermark units for numeric ones.
+        
+        Returns:
+            Tuple of (value, inclusive): read rows >= value when inclusive, > value otherwise
+        """
+        lag = current_app.config.get('CONSISTENCY_WATERMARK_LAG', 60)
+        if not lag or value is None or isinstance(value, bool):
+            return value, False
+        if isinstance(value, (int, float)):
+            return value - lag, True
+        try:
+            return str(datetime.fromisoformat(str(value)) - timedelta(seconds=lag)), True
+        except ValueError:
+            # Text watermark without a known order distance
+            return value, False
+    
+    @staticmethod
+    def _read_changed(engine, table_name: str, columns: List[str], watermark_column: str, value) -> pd.DataFrame:
+        """Read the rows whose watermark column is greater than value, minus the overlap window"""
+        unique_columns = list(dict.fromkeys(columns))
+        value, inclusive = ConsistencyService._overlap_start(value)
+        operator = '>=' if inclusive else '>'
+        sql = f"SELECT {', '.join(unique_columns)} FROM {table_name} WHERE {watermark_column} {operator} :watermark"
+        return pd.read_sql(text(sql), engine, params={'watermark': value})
+    
+    @staticmethod
+    def _read_by_keys(engine, table_name: str, columns: List[str], key_columns: List[str], keys: List[tuple]) -> pd.DataFrame:
+        """Read the rows of the given join keys, KEY_BATCH_SIZE keys per query"""
+        unique_columns = list(dict.fromkeys(columns))
+        if not keys:
+            return pd.DataFrame(columns=unique_columns)
+        
+        table = sa_table(table_name, *[sa_column(name) for name in dict.fromkeys(unique_columns + key_columns)])
+        key_cols = [table.c[name] for name in key_columns]
+        frames = []
+        for start in range(0, len(keys), ConsistencyService.KEY_BATCH_SIZE):
+            chunk = keys[start:start + ConsistencyService.KEY_BATCH_SIZE]
+            if len(key_cols) == 1:
+                condition = key_cols[0].in_([key[0] for key in chunk])
+            else:
+                condition = tuple_(*key_cols).in_(chunk)
+            stmt = select(*[table.c[name] for name in unique_columns]).where(condition)
+            frames.append(pd.read_sql(stmt, engine))
+        return pd.concat(frames, ignore_index=True)
+    
+    @staticmethod
+    def _key_set(df: pd.DataFrame, key_columns: List[str]) -> set:
+        """Distinct join keys of a frame as tuples of Python values"""
+        if df.empty:
+            return set()
+        return set(map(tuple, df[key_columns].drop_duplicates().astype(object).values.tolist()))
+    
+    @staticmethod
+    def _read_incremental(config: DataConsistencyConfig, source_engine, target_engine, previous: Dict) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+        """Read only the rows changed since the previous watermark, plus their counterparts
+        
+        Changed rows are those whose watermark column grew (on the source, and on the target
+        when target_watermark_column is set), re-reading an overlap window of
+        CONSISTENCY_WATERMARK_LAG before the watermark for rows committed late. For each
+        changed key, the row on the other side is read by key, so both versions of every
+        changed record are compared. Rows deleted since the previous check are not detected
+        in this mode.
+        
         Returns:
-            Tuple of (DataConsistencyCheck, list of inconsistency results)
+            Tuple of (source_df, target_df, new watermark)
         """
-        # Create consistency check record
+        source_keys = list((config.join_mappings or {}).keys())
+        target_keys = list((config.join_mappings or {}).values())
+        source_columns = ConsistencyService._source_read_columns(config)
+        target_columns = ConsistencyService._target_read_columns(config)
+        
+        source_changed = ConsistencyService._read_changed(
+            source_engine, config.source_table, source_columns, config.watermark_column, previous['value']
+        )
+        if not config.target_watermark_column:
+            target_changed = pd.DataFrame(columns=list(dict.fromkeys(target_columns)))
+        elif previous.get('target_column') == config.target_watermark_column and previous.get('target_value') is not None:
+            target_changed = ConsistencyService._read_changed(
+                target_engine, config.target_table, target_columns, config.target_watermark_column, previous['target_value']
+            )
+        else:
+            # No target watermark yet: every target row counts as changed
+            target_changed = ConsistencyService._read_columns(target_engine, config.target_table, target_columns)
+        
+        watermark = ConsistencyService._watermark(config, source_changed, target_changed, previous)
+        
+        source_key_set = ConsistencyService._key_set(source_changed, source_keys)
+        target_key_set = ConsistencyService._key_set(target_changed, target_keys)
+        target_rest = ConsistencyService._read_by_keys(
+            target_engine, config.target_table, target_columns, target_keys, sorted(source_key_set - target_key_set, key=str)
+        )
+        source_rest = ConsistencyService._read_by_keys(
+            source_engine, config.source_table, source_columns, source_keys, sorted(target_key_set - source_key_set, key=str)
+        )
+        
+        source_df = pd.concat([source_changed, source_rest], ignore_index=True) if len(source_rest) else source_changed
+        target_df = pd.concat([target_changed, target_rest], ignore_index=True) if len(target_rest) else target_changed
+        return source_df, target_df, watermark
+    
+    @staticmethod
+    def _start_check(config: DataConsistencyConfig) -> DataConsistencyCheck:
+        """Create the running check record of a config"""
         check = DataConsistencyCheck(
             config_id=config.id,
             status='running',
             total_inconsistencies=0
         )
         db.session.add(check)
-        db.session.flush()
+        # Commit right away so the running check and its progress are visible
+        db.session.commit()
+        return check
+    
+    @staticmethod
+    def _fail_check(check: DataConsistencyCheck, error: Exception):
+        """Mark a check as failed"""
+        # Batches committed before the error stay, total_inconsistencies counts them
+        db.session.rollback()
+        check.status = 'failed'
+        check.check_metadata = {'error': str(error)}
+        db.session.commit()
+    
+    @staticmethod
+    def _merge(config: DataConsistencyConfig, source_df: pd.DataFrame, target_df: pd.DataFrame) -> pd.DataFrame:
+        """Outer-merge the frames of a config on its join keys (suffixes _source/_target, _merge indicator)"""
+        join_mappings = config.join_mappings or {}
+        comparison_fields = config.comparison_fields or []
         
-        try:
-            # Get database connections
-            source_connection = config.source_connection
-            target_connection = config.target_connection
-            
-            # Get decrypted configs
-            source_config = source_connection.get_decrypted_config()
-            source_config['type'] = source_connection.db_type
-            
-            target_config = target_connection.get_decrypted_config()
-            target_config['type'] = target_connection.db_type
-            
-            # Create engines
-            source_engine = DatabaseService.get_engine(source_config, already_decrypted=True)
-            target_engine = DatabaseService.get_engine(target_config, already_decrypted=True)
-            
-            # Get join mappings and comparison fields
-            join_mappings = config.join_mappings or {}
-            comparison_fields = config.comparison_fields or []
-            
-            if not join_mappings:
-                raise ValueError("No join mappings defined")
-            
-            if not comparison_fields:
-                raise ValueError("No comparison fields defined")
-            
-            # Since tables are in different databases, we need to query them separately
-            # and compare in memory using pandas
-            
-            # Build SELECT clause for source table
-            source_select_fields = []
-            for source_field in join_mappings.keys():
-                source_select_fields.append(f"{source_field}")
-            for field_map in comparison_fields:
-                source_select_fields.append(field_map['source_field'])
-            
-            source_select = ", ".join(source_select_fields)
-            
-            # Query source table
-            source_sql = f"SELECT {source_select} FROM {config.source_table}"
-            source_df = pd.read_sql(text(source_sql), source_engine)
-            
-            # Build SELECT clause for target table
-            target_select_fields = []
-            for target_field in join_mappings.values():
-                target_select_fields.append(f"{target_field}")
-            for field_map in comparison_fields:
-                target_select_fields.append(field_map['target_field'])
-            
-            target_select = ", ".join(target_select_fields)
-            
-            # Query target table
-            target_sql = f"SELECT {target_select} FROM {config.target_table}"
-            target_df = pd.read_sql(text(target_sql), target_engine)
-            
-            # Create a composite key for joining dataframes
-            # Build key columns for source
-            source_key_cols = list(join_mappings.keys())
-            # Build key columns for target (mapped values)
-            target_key_cols = list(join_mappings.values())
-            
-            # Rename target columns to match source for easier comparison
-            target_df_renamed = target_df.copy()
-            rename_map = {}
-            
-            # Rename join key columns
-            for source_field, target_field in join_mappings.items():
-                rename_map[target_field] = source_field
-            
-            # Rename comparison fields to match source field names
-            # This way, merge will add suffixes _source and _target correctly
-            for field_map in comparison_fields:
-                source_field = field_map['source_field']
-                target_field = field_map['target_field']
-                rename_map[target_field] = source_field
-            
-            target_df_renamed = target_df_renamed.rename(columns=rename_map)
+        # Keep only this config's columns, in the order its own SELECT would return them
+        source_df = source_df[ConsistencyService._source_columns(config)]
+        target_df = target_df[ConsistencyService._target_columns(config)]
+        
+        # Create a composite key for joining dataframes
+        # Build key columns for source
+        source_key_cols = list(join_mappings.keys())
+        
+        # Rename target columns to match source for easier comparison
+        rename_map = {}
+        
+        # Rename join key columns
+        for source_field, target_field in join_mappings.items():
+            rename_map[target_field] = source_field
+        
+        # Rename comparison fields to match source field names
+        # This way, merge will add suffixes _source and _target correctly
+        for field_map in comparison_fields:
+            source_field = field_map['source_field']
+            target_field = field_map['target_field']
+            rename_map[target_field] = source_field
+        
+        target_df_renamed = target_df.rename(columns=rename_map)
+        
+        # Merge dataframes on join keys
+        # Only merge on the key columns (which are now renamed to match)
+        return source_df.merge(
+            target_df_renamed,
+            on=source_key_cols,
+            how='outer',
+            suffixes=('_source', '_target'),
+            indicator=True
+        )
+    
+    @staticmethod
+    def _finish_check(config: DataConsistencyConfig, check: DataConsistencyCheck, saved: Dict, metadata: Dict) -> int:
+        """Mark a check completed with the counts returned by _save_results"""
+        check.status = 'completed'
+        check.total_inconsistencies = saved['total_inconsistencies']
+        check.check_metadata = dict(
+            metadata,
+            result_mode=config.result_mode or 'per_field',
+            result_rows=saved['result_rows']
+        )
+        db.session.commit()
+        
+        return saved['total_inconsistencies']
+    
+    @staticmethod
+    def _carry_forward(check: DataConsistencyCheck, previous_check_id: int, checked_keys: set, saved: Dict) -> int:
+        """Copy the previous check's results of join keys this check did not re-read
+        
+        An incremental check only compares changed rows; carrying the unchanged keys'
+        inconsistencies forward keeps its total the current state of the tables. Results are
+        paged by id and inserted in CONSISTENCY_RESULT_BATCH_SIZE batches, and saved is
+        updated with the copied counts.
+        
+        Args:
+            check: Running incremental DataConsistencyCheck
+            previous_check_id: Check the incremental read started from
+            checked_keys: Join key values (as stored in join_key_values) compared by this check
+            saved: Counts returned by _save_results
+        
+        Returns:
+            Number of inconsistencies carried forward
+        """
+        batch_size = max(1, int(current_app.config.get('CONSISTENCY_RESULT_BATCH_SIZE', 1000)))
+        table = DataConsistencyResult.__table__
+        columns = [col for col in table.columns if col.name not in ('id', 'check_id')]
+        carried = 0
+        last_id = 0
+        
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, *columns)
+                .where(table.c.check_id == previous_check_id, table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
             
-            # For merge, we need to ensure both dataframes have the same key column names
-            # The target_df_renamed already has renamed join keys matching source
+            batch = []
+            for row in rows:
+                values = row._asdict()
+                if tuple(sorted((values['join_key_values'] or {}).items())) in checked_keys:
+                    continue
+                del values['id']
+                values['check_id'] = check.id
+                batch.append(values)
+                mismatches = values.get('field_mismatches')
+                carried += len(mismatches) if values['field_name'] == '*' and mismatches else 1
             
-            # Merge dataframes on join keys
-            # Only merge on the key columns (which are now renamed to match)
-            merged_df = source_df.merge(
-                target_df_renamed,
-                on=source_key_cols,
-                how='outer',
-                suffixes=('_source', '_target'),
-                indicator=True
+            if batch:
+                db.session.execute(table.insert(), batch)
+                saved['result_rows'] += len(batch)
+                check.total_inconsistencies = saved['total_inconsistencies'] + carried
+                db.session.commit()
+        
+        saved['total_inconsistencies'] += carried
+        return carried
+    
+    @staticmethod
+    def _checked_keys(merged_df: pd.DataFrame, source_key_cols: List[str]) -> set:
+        """Join keys of a merged frame in the form stored in join_key_values (sorted item tuples)"""
+        columns = [ConsistencyService._text_values(merged_df, col) for col in source_key_cols]
+        return {
+            tuple(sorted(
+                (col, str(value) if pd.notna(value) else 'N/A')
+                for col, value in zip(source_key_cols, values)
+            ))
+            for values in zip(*columns)
+        }
+    
+    @staticmethod
+    def _evaluate(config: DataConsistencyConfig, check: DataConsistencyCheck, source_df: pd.DataFrame, target_df: pd.DataFrame, metadata: Optional[Dict] = None, watermark: Optional[Dict] = None, previous_check_id: Optional[int] = None) -> int:
+        """Merge the frames of a config on its join keys, save the inconsistencies and complete the check
+        
+        Args:
+            config: DataConsistencyConfig being checked
+            check: Its running DataConsistencyCheck
+            source_df: Source rows (may hold extra columns read for other configs)
+            target_df: Target rows (may hold extra columns read for other configs)
+            metadata: Extra check metadata
+            watermark: Watermark reached (computed from the frames when None and the config has a watermark column)
+            previous_check_id: For incremental checks, the check whose results of keys not
+                re-read are carried forward (see _carry_forward)
+        
+        Returns:
+            Number of inconsistencies
+        """
+        metadata = dict(metadata or {})
+        
+        if watermark is None and config.watermark_column and config.watermark_column in source_df.columns:
+            watermark = ConsistencyService._watermark(config, source_df, target_df)
+        if watermark is not None:
+            metadata['watermark'] = watermark
+        
+        source_key_cols = list((config.join_mappings or {}).keys())
+        merged_df = ConsistencyService._merge(config, source_df, target_df)
+        saved = ConsistencyService._save_results(
+            check,
+            ConsistencyService._iter_inconsistent_rows(
+                merged_df, source_key_cols, config.comparison_fields or []
+            ),
+            compact=(config.result_mode or 'per_field') == 'compact'
+        )
+        
+        if previous_check_id is not None:
+            checked_keys = ConsistencyService._checked_keys(merged_df, source_key_cols)
+            metadata['changed_inconsistencies'] = saved['total_inconsistencies']
+            metadata['carried_forward'] = {
+                'from_check_id': previous_check_id,
+                'inconsistencies': ConsistencyService._carry_forward(check, previous_check_id, checked_keys, saved)
+            }
+        return ConsistencyService._finish_check(config, check, saved, metadata)
+    
+    @staticmethod
+    def _plan_partitions(config: DataConsistencyConfig, source_engine, target_engine, count: int) -> Tuple[str, List[Tuple[str, Dict]]]:
+        """Split the join-key space of a config into partitions (see DatabaseService.plan_key_partitions)"""
+        return DatabaseService.plan_key_partitions(
+            source_engine, config.source_table, list((config.join_mappings or {}).keys()),
+            target_engine, config.target_table, list((config.join_mappings or {}).values()),
+            count
+        )
+    
+    @staticmethod
+    def _config_snapshot(config: DataConsistencyConfig) -> SimpleNamespace:
+        """Plain copy of the config settings a partition worker needs
+        
+        Worker threads have no application context, and the ORM instance is expired by every
+        commit of _save_results, so they must never touch it.
+        """
+        snapshot = SimpleNamespace(
+            id=config.id,
+            source_table=config.source_table,
+            target_table=config.target_table,
+            join_mappings=dict(config.join_mappings or {}),
+            comparison_fields=[dict(field_map) for field_map in (config.comparison_fields or [])],
+            watermark_column=config.watermark_column,
+            target_watermark_column=config.target_watermark_column,
+            result_mode=config.result_mode or 'per_field'
+        )
+        snapshot.source_read_columns = ConsistencyService._source_read_columns(snapshot)
+        snapshot.target_read_columns = ConsistencyService._target_read_columns(snapshot)
+        return snapshot
+    
+    @staticmethod
+    def _check_partition(snapshot: SimpleNamespace, source_engine, target_engine, condition: str, params: Dict) -> Tuple[List[List[Dict]], object, object]:
+        """Read and compare one partition (runs on worker threads, without database session access)
+        
+        Args:
+            snapshot: Config settings from _config_snapshot
+        
+        Returns:
+            Tuple of (inconsistent rows, source watermark, target watermark)
+        """
+        source_keys = list(snapshot.join_mappings.keys())
+        target_keys = list(snapshot.join_mappings.values())
+        source_df = DatabaseService.read_partition(
+            source_engine, snapshot.source_table, snapshot.source_read_columns, source_keys, condition, params
+        )
+        target_df = DatabaseService.read_partition(
+            target_engine, snapshot.target_table, snapshot.target_read_columns, target_keys, condition, params
+        )
+        
+        source_watermark = target_watermark = None
+        if snapshot.watermark_column:
+            watermark = ConsistencyService._watermark(snapshot, source_df, target_df)
+            source_watermark, target_watermark = watermark['value'], watermark['target_value']
+        
+        merged_df = ConsistencyService._merge(snapshot, source_df, target_df)
+        rows = list(ConsistencyService._iter_inconsistent_rows(merged_df, source_keys, snapshot.comparison_fields))
+        return rows, source_watermark, target_watermark
+    
+    @staticmethod
+    def _evaluate_partitioned(config: DataConsistencyConfig, check: DataConsistencyCheck, source_engine, target_engine) -> int:
+        """Check a config one key partition at a time, writing results after each partition
+        
+        Only one partition per worker is held in memory. Partitions are read and compared on
+        CONSISTENCY_PARTITION_WORKERS threads; results are written by the calling thread, in
+        partition order.
+        """
+        strategy, partitions = ConsistencyService._plan_partitions(
+            config, source_engine, target_engine, int(config.partition_count)
+        )
+        workers = max(1, int(current_app.config.get('CONSISTENCY_PARTITION_WORKERS', 1)))
+        print(f"[CONSISTENCY] Partitioned check of config {config.id}: {len(partitions)} {strategy} partition(s), {workers} worker(s)", flush=True)
+        
+        snapshot = ConsistencyService._config_snapshot(config)
+        watermarks = {'value': [], 'target_value': []}
+        
+        def submit(partition):
+            condition, params = partition
+            return executor.submit(
+                ConsistencyService._check_partition, snapshot, source_engine, target_engine, condition, params
             )
+        
+        def rows():
+            remaining = iter(partitions)
+            # Keep at most one partition per worker in flight so memory stays bounded
+            pending = deque(submit(partition) for partition in islice(remaining, workers))
+            while pending:
+                partition_rows, source_watermark, target_watermark = pending.popleft().result()
+                next_partition = next(remaining, None)
+                if next_partition is not None:
+                    pending.append(submit(next_partition))
+                if source_watermark is not None:
+                    watermarks['value'].append(source_watermark)
+                if target_watermark is not None:
+                    watermarks['target_value'].append(target_watermark)
+                yield from partition_rows
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            saved = ConsistencyService._save_results(
+                check, rows(), compact=snapshot.result_mode == 'compact'
+            )
+        
+        metadata = {'partitioned': {'strategy': strategy, 'partitions': len(partitions), 'workers': workers}}
+        if snapshot.watermark_column:
+            metadata['watermark'] = {
+                'column': snapshot.watermark_column,
+                'value': max(watermarks['value']) if watermarks['value'] else None,
+                'target_column': snapshot.target_watermark_column,
+                'target_value': max(watermarks['target_value']) if watermarks['target_value'] else None
+            }
+        return ConsistencyService._finish_check(config, check, saved, metadata)
+    
+    @staticmethod
+    def check_consistency(config: DataConsistencyConfig, check: Optional[DataConsistencyCheck] = None, full: bool = False) -> Tuple[DataConsistencyCheck, int]:
+        """
+        Check data consistency between two tables based on configuration
+        
+        Inconsistencies are streamed to the database in batches instead of being collected
+        first; with config.result_mode == 'compact' one result is stored per join key.
+        When the config has a watermark column and a previous check recorded a watermark,
+        only rows changed since then are checked (see _read_incremental).
+        
+        Args:
+            config: DataConsistencyConfig with join mappings and comparison fields
+            check: Pending check to run (created when None)
+            full: Check every row even when an incremental watermark is available
+        
+        Returns:
+            Tuple of (DataConsistencyCheck, number of inconsistencies)
+        """
+        if check is None:
+            check = ConsistencyService._start_check(config)
+        else:
+            check.status = 'running'
+            db.session.commit()
+        
+        try:
+            source_engine = ConsistencyService._get_engine(config.source_connection)
+            target_engine = ConsistencyService._get_engine(config.target_connection)
             
-            inconsistencies = []
-            
-            # Process merged results
-            for idx, row in merged_df.iterrows():
-                # Build join key values
-                join_key_values = {}
-                for source_field in source_key_cols:
-                    value = row.get(source_field)
-                    if pd.notna(value):
-                        join_key_values[source_field] = str(value)
-                    else:
-                        # Try to get from target (for right_only cases)
-                        value = row.get(f"{source_field}_target")
-                        if pd.notna(value):
-                            join_key_values[source_field] = str(value)
-                        else:
-                            join_key_values[source_field] = 'N/A'
-                
-                # Check merge indicator
-                merge_indicator = row.get('_merge', 'both')
-                
-                # Check each comparison field
-                for field_map in comparison_fields:
-                    source_field = field_map['source_field']
-                    source_col = f"{source_field}_source"
-                    target_col = f"{source_field}_target"
-                    
-                    source_value = row.get(source_col)
-                    target_value = row.get(target_col)
-                    
-                    # Determine inconsistency type
-                    if merge_indicator == 'left_only':
-                        # Record exists only in source - add inconsistency for this field
-                        inconsistency_type = 'missing_in_target'
-                        inconsistencies.append({
-                            'join_key_values': join_key_values,
-                            'field_name': source_field,
-                            'source_value': str(source_value) if pd.notna(source_value) else None,
-                            'target_value': None,
-                            'inconsistency_type': inconsistency_type
-                        })
-                    elif merge_indicator == 'right_only':
-                        # Record exists only in target - add inconsistency for this field
-                        inconsistency_type = 'missing_in_source'
-                        inconsistencies.append({
-                            'join_key_values': join_key_values,
-                            'field_name': source_field,
-                            'source_value': None,
-                            'target_value': str(target_value) if pd.notna(target_value) else None,
-                            'inconsistency_type': inconsistency_type
-                        })
-                    elif merge_indicator == 'both':
-                        # Both records exist, check if values match
-                        source_str = str(source_value) if pd.notna(source_value) else None
-                        target_str = str(target_value) if pd.notna(target_value) else None
-                        
-                        if source_str != target_str:
-                            inconsistency_type = 'value_mismatch'
-                            inconsistencies.append({
-                                'join_key_values': join_key_values,
-                                'field_name': source_field,
-                                'source_value': source_str,
-                                'target_value': target_str,
-                                'inconsistency_type': inconsistency_type
-                            })
-            
-            # Save inconsistencies
-            check.status = 'completed'
-            check.total_inconsistencies = len(inconsistencies)
+            previous = None
+            if config.watermark_column and not full:
+                previous = ConsistencyService._last_watermark(config)
             
-            for inconsistency in inconsistencies:
-                result = DataConsistencyResult(
-                    check_id=check.id,
-                    join_key_values=inconsistency['join_key_values'],
-                    field_name=inconsistency['field_name'],
-                    source_value=inconsistency['source_value'],
-                    target_value=inconsistency['target_value'],
-                    inconsistency_type=inconsistency['inconsistency_type']
+            if previous and previous.get('value') is not None:
+                source_df, target_df, watermark = ConsistencyService._read_incremental(
+                    config, source_engine, target_engine, previous
                 )
-                db.session.add(result)
-            
-            db.session.commit()
-            
-            return check, inconsistencies
+                metadata = {
+                    'incremental': True,
+                    'since': {'value': previous.get('value'), 'target_value': previous.get('target_value')},
+                    'rows_checked': {'source': len(source_df), 'target': len(target_df)}
+                }
+                print(f"[CONSISTENCY] Incremental check of config {config.id}: {len(source_df)} source / {len(target_df)} target row(s)", flush=True)
+            elif config.partition_count and int(config.partition_count) > 1:
+                # Validates the join mappings and comparison fields
+                ConsistencyService._source_columns(config)
+                total = ConsistencyService._evaluate_partitioned(config, check, source_engine, target_engine)
+                return check, total
+            else:
+                # Since tables are in different databases, we need to query them separately
+                # and compare in memory using pandas
+                source_df = ConsistencyService._read_columns(
+                    source_engine, config.source_table, ConsistencyService._source_read_columns(config)
+                )
+                target_df = ConsistencyService._read_columns(
+                    target_engine, config.target_table, ConsistencyService._target_read_columns(config)
+                )
+                watermark = None
+                metadata = {}
             
+            total = ConsistencyService._evaluate(
+                config, check, source_df, target_df, metadata, watermark,
+                previous_check_id=previous.get('check_id') if metadata.get('incremental') else None
+            )
+            return check, total
+        
         except Exception as e:
-            check.status = 'failed'
-            check.check_metadata = {'error': str(e)}
-            db.session.commit()
+            ConsistencyService._fail_check(check, e)
             raise e
-
+    
+    @staticmethod
+    def queue_check(config: DataConsistencyConfig, full: bool = False) -> DataConsistencyCheck:
+        """Create a pending check and run it on a background worker
+        
+        Args:
+            config: DataConsistencyConfig to check
+            full: Check every row even when an incremental watermark is available
+        
+        Returns:
+            The pending DataConsistencyCheck (poll it for status and progress)
+        """
+        check = DataConsistencyCheck(
+            config_id=config.id,
+            status='pending',
+            total_inconsistencies=0
+        )
+        db.session.add(check)
+        db.session.commit()
+        
+        BackgroundJobs.submit(
+            f'consistency_check_{check.id}',
+            ConsistencyService.run_queued_check,
+            config.id,
+            check.id,
+            full
+        )
+        return check
+    
+    @staticmethod
+    def run_queued_check(config_id: int, check_id: int, full: bool = False):
+        """Background job body of queue_check"""
+        config = db.session.get(DataConsistencyConfig, config_id)
+        check = db.session.get(DataConsistencyCheck, check_id)
+        if not config or not check:
+            print(f"[CONSISTENCY] Config {config_id} or check {check_id} not found, skipping", flush=True)
+            return
+        
+        try:
+            ConsistencyService.check_consistency(config, check=check, full=full)
+        except Exception as e:
+            # Already recorded on the check
+            print(f"[CONSISTENCY] Check {check_id} of config {config_id} failed: {str(e)}", flush=True)
+    
+    @staticmethod
+    def queue_batch(configs: List[DataConsistencyConfig]) -> List[DataConsistencyCheck]:
+        """Create a pending check per config and run the batch on a background worker
+        
+        Args:
+            configs: DataConsistencyConfigs to run
+        
+        Returns:
+            The pending DataConsistencyChecks, in config order (poll them for status)
+        """
+        checks = [
+            DataConsistencyCheck(config_id=config.id, status='pending', total_inconsistencies=0)
+            for config in configs
+        ]
+        db.session.add_all(checks)
+        db.session.commit()
+        
+        BackgroundJobs.submit(
+            f'consistency_batch_{checks[0].id}',
+            ConsistencyService.run_queued_batch,
+            [config.id for config in configs],
+            [check.id for check in checks]
+        )
+        return checks
+    
+    @staticmethod
+    def run_queued_batch(config_ids: List[int], check_ids: List[int]):
+        """Background job body of queue_batch"""
+        configs = []
+        checks = {}
+        for config_id, check_id in zip(config_ids, check_ids):
+            config = db.session.get(DataConsistencyConfig, config_id)
+            check = db.session.get(DataConsistencyCheck, check_id)
+            if not check:
+                continue
+            if not config:
+                ConsistencyService._fail_check(check, ValueError(f'Consistency config {config_id} not found'))
+                continue
+            configs.append(config)
+            checks[config_id] = check
+        
+        if not configs:
+            return
+        
+        summary = ConsistencyService.run_batch(configs, checks)
+        print(
+            f"[CONSISTENCY] Batch finished: {summary['completed']} completed, {summary['failed']} failed, "
+            f"{summary['source_reads']} source read(s) and {summary['target_reads']} target read(s)",
+            flush=True
+        )
+    
+    @staticmethod
+    def _batch_check(config: DataConsistencyConfig, checks: Optional[Dict[int, DataConsistencyCheck]]) -> DataConsistencyCheck:
+        """Mark the pending check of a queued batch as running, or create one"""
+        check = (checks or {}).get(config.id)
+        if check is None:
+            return ConsistencyService._start_check(config)
+        check.status = 'running'
+        db.session.commit()
+        return check
+    
+    @staticmethod
+    def run_batch(configs: List[DataConsistencyConfig], checks: Optional[Dict[int, DataConsistencyCheck]] = None) -> Dict:
+        """Run several consistency configs sharing table reads
+        
+        Configs are grouped by (source connection, source table): each source table is read
+        once with the union of the columns its configs need, and every config of the group
+        is evaluated against that frame. Target tables are shared the same way across the
+        whole batch, and a target frame is released once no remaining config needs it.
+        A failing read or config only fails the checks that depend on it.
+        
+        Args:
+            configs: DataConsistencyConfigs to run
+            checks: Pending checks by config id (see queue_batch); created when missing
+        
+        Returns:
+            Dictionary with per-config results and read counts
+        """
+        checks = checks or {}
+        results = []
+        valid_configs = []
+        for config in configs:
+            if config.partition_count and int(config.partition_count) > 1:
+                # Partitioned configs keep their bounded-memory reads instead of a shared full scan
+                try:
+                    check, total = ConsistencyService.check_consistency(config, check=checks.get(config.id))
+                    results.append({'config_id': config.id, 'check_id': check.id, 'status': 'completed', 'total_inconsistencies': total})
+                except Exception as e:
+                    latest = DataConsistencyCheck.query.filter_by(config_id=config.id).order_by(DataConsistencyCheck.id.desc()).first()
+                    results.append({'config_id': config.id, 'check_id': latest.id if latest else None, 'status': 'failed', 'error': str(e)})
+                continue
+            try:
+                ConsistencyService._source_columns(config)
+                valid_configs.append(config)
+            except ValueError as e:
+                check = ConsistencyService._batch_check(config, checks)
+                ConsistencyService._fail_check(check, e)
+                results.append({'config_id': config.id, 'check_id': check.id, 'status': 'failed', 'error': str(e)})
+        
+        source_groups = {}
+        target_columns = {}
+        target_refs = {}
+        for config in valid_configs:
+            source_groups.setdefault((config.source_connection_id, config.source_table), []).append(config)
+            target_key = (config.target_connection_id, config.target_table)
+            target_columns.setdefault(target_key, []).extend(ConsistencyService._target_read_columns(config))
+            target_refs[target_key] = target_refs.get(target_key, 0) + 1
+        
+        target_config_counts = dict(target_refs)
+        target_frames = {}
+        target_errors = {}
+        reads = {'source': 0, 'target': 0}
+        
+        for (source_connection_id, source_table), group in source_groups.items():
+            group_checks = [ConsistencyService._batch_check(config, checks) for config in group]
+            print(f"[CONSISTENCY] Shared scan of {source_table} (connection {source_connection_id}) for {len(group)} config(s)", flush=True)
+            
+            try:
+                columns = [col for config in group for col in ConsistencyService._source_read_columns(config)]
+                source_df = ConsistencyService._read_columns(
+                    ConsistencyService._get_engine(group[0].source_connection), source_table, columns
+                )
+                reads['source'] += 1
+            except Exception as e:
+                source_df = None
+                for config, check in zip(group, group_checks):
+                    ConsistencyService._fail_check(check, e)
+                    results.append({'config_id': config.id, 'check_id': check.id, 'status': 'failed', 'error': str(e)})
+            
+            for config, check in zip(group, group_checks):
+                target_key = (config.target_connection_id, config.target_table)
+                try:
+                    if source_df is None:
+                        continue
+                    if target_key in target_errors:
+                        raise target_errors[target_key]
+                    if target_key not in target_frames:
+                        try:
+                            target_frames[target_key] = ConsistencyService._read_columns(
+                                ConsistencyService._get_engine(config.target_connection), config.target_table, target_columns[target_key]
+                            )
+                            reads['target'] += 1
+                        except Exception as e:
+                            target_errors[target_key] = e
+                            raise
+                    
+                    total = ConsistencyService._evaluate(
+                        config, check, source_df, target_frames[target_key],
+                        metadata={'shared_scan': {
+                            'source_configs': len(group),
+                            'target_configs': target_config_counts[target_key]
+                        }}
+                    )
+                    results.append({'config_id': config.id, 'check_id': check.id, 'status': 'completed', 'total_inconsistencies': total})
+                except Exception as e:
+                    print(f"[CONSISTENCY] Config {config.id} failed in batch: {str(e)}", flush=True)
+                    ConsistencyService._fail_check(check, e)
+                    results.append({'config_id': config.id, 'check_id': check.id, 'status': 'failed', 'error': str(e)})
+                finally:
+                    target_refs[target_key] -= 1
+                    if target_refs[target_key] == 0:
+                        target_frames.pop(target_key, None)
+        
+        return {
+            'results': results,
+            'total_configs': len(configs),
+            'completed': sum(1 for result in results if result['status'] == 'completed'),
+            'failed': sum(1 for result in results if result['status'] == 'failed'),
+            'source_reads': reads['source'],
+            'target_reads': reads['target']
+        }
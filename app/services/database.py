@@ -1,9 +1,20 @@
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import inspect, text, select, tuple_, table as sa_table, column as sa_column
 from sqlalchemy.engine import Engine
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, date, time
+from decimal import Decimal
+import base64
+import zlib
 import pandas as pd
 from urllib.parse import quote_plus
 from app.utils.encryption import decrypt_db_config
+from app.utils.engine_registry import EngineRegistry
+from app.utils.schema_cache import SchemaCache
+from app.utils.pagination import encode_key, decode_key
+
+
+class HashPartitioningUnsupported(ValueError):
+    """The key buckets of a hash partitioning could differ between the two tables"""
 
 
 class DatabaseService:
@@ -34,12 +45,14 @@ class DatabaseService:
             raise ValueError(f"Unsupported database type: {db_type}")
     
     @staticmethod
-    def get_engine(db_config: Dict, already_decrypted: bool = False) -> Engine:
-        """Get SQLAlchemy engine from config
+    def get_engine(db_config: Dict, already_decrypted: bool = False, connection_id: Optional[int] = None) -> Engine:
+        """Get the pooled SQLAlchemy engine for a config from the process-wide registry
         
         Args:
             db_config: Database configuration dictionary
             already_decrypted: If True, assumes password is already decrypted
+            connection_id: DatabaseConnection id, so the engine is disposed when the
+                connection is updated or deleted
         """
         # Only decrypt if not already decrypted
         if already_decrypted:
@@ -48,51 +61,29 @@ class DatabaseService:
             decrypted_config = decrypt_db_config(db_config)
         
         connection_string = DatabaseService.create_connection_string(decrypted_config)
-        return create_engine(connection_string)
+        return EngineRegistry.get_engine(connection_string, connection_id)
     
     @staticmethod
     def get_tables(engine: Engine) -> List[str]:
-        """Get list of table names from database"""
-        inspector = inspect(engine)
-        return inspector.get_table_names()
+        """Get list of table names from database (cached, see SchemaCache)"""
+        return SchemaCache.get_or_load(engine, 'tables', None, lambda: inspect(engine).get_table_names())
     
     @staticmethod
     def get_table_columns(engine: Engine, table_name: str) -> List[Dict]:
-        """Get column information for a table"""
+        """Get column information for a table (cached, see SchemaCache)"""
+        return SchemaCache.get_or_load(
+            engine, 'columns', table_name,
+            lambda: DatabaseService._load_table_columns(engine, table_name)
+        )
+    
+    @staticmethod
+    def _load_table_columns(engine: Engine, table_name: str) -> List[Dict]:
         inspector = inspect(engine)
         columns = inspector.get_columns(table_name)
         result = []
         for col in columns:
             # Get type as string, handling different SQLAlchemy type formats
-            col_type_obj = col['type']
-            col_type_str = str(col_type_obj)
-            
-            # Extract the actual database type name
-            # SQLAlchemy types can be like: VARCHAR(255), INTEGER, TINYINT(1), etc.
-            # They might also include module paths like "sqlalchemy.sql.sqltypes.VARCHAR"
-            if '.' in col_type_str:
-                # Extract just the type name (last part after the last dot)
-                col_type_str = col_type_str.split('.')[-1]
-            
-            # Handle types with parameters like VARCHAR(255), TINYINT(1), DECIMAL(10,2)
-            if '(' in col_type_str:
-                # Keep the full type with parameters
-                type_parts = col_type_str.split('(')
-                base_type = type_parts[0].strip().upper()
-                params = '(' + type_parts[1] if len(type_parts) > 1 else ''
-                # Remove any trailing characters that might be from SQLAlchemy representation
-                if params and ')' in params:
-                    params = params.split(')')[0] + ')'
-                col_type = base_type + params
-            else:
-                # Just the type name - remove any trailing characters
-                col_type = col_type_str.split()[0].upper() if col_type_str.split() else col_type_str.upper()
-            
-            # Special handling for common MySQL/MariaDB types
-            if 'TINYINT' in col_type and '1' in col_type:
-                col_type = 'TINYINT(1)'
-            elif 'VARCHAR' in col_type and '(' not in col_type:
-                col_type = 'VARCHAR(255)'  # Default VARCHAR size
+            col_type = DatabaseService._normalize_column_type(str(col['type']))
             
             result.append({
                 'name': col['name'],
@@ -102,6 +93,40 @@ class DatabaseService:
             })
         return result
     
+    @staticmethod
+    def _normalize_column_type(col_type_str: str) -> str:
+        """Normalize a reflected or information_schema type to the form shown in the UI"""
+        # Extract the actual database type name
+        # SQLAlchemy types can be like: VARCHAR(255), INTEGER, TINYINT(1), etc.
+        # They might also include module paths like "sqlalchemy.sql.sqltypes.VARCHAR"
+        if '.' in col_type_str:
+            # Extract just the type name (last part after the last dot)
+            col_type_str = col_type_str.split('.')[-1]
+        
+        # Handle types with parameters like VARCHAR(255), TINYINT(1), DECIMAL(10,2)
+        if '(' in col_type_str:
+            # Keep the full type with parameters
+            type_parts = col_type_str.split('(')
+            base_type = type_parts[0].strip().upper()
+            params = '(' + type_parts[1] if len(type_parts) > 1 else ''
+            # Remove any trailing characters that might be from SQLAlchemy representation
+            if params and ')' in params:
+                params = params.split(')')[0] + ')'
+            col_type = base_type + params
+        else:
+            # Just the type name - remove any trailing characters
+            col_type = col_type_str.split()[0].upper() if col_type_str.split() else col_type_str.upper()
+        
+        # Special handling for common MySQL/MariaDB types
+        if 'TINYINT' in col_type and '1' in col_type:
+            col_type = 'TINYINT(1)'
+        elif 'VARCHAR' in col_type and '(' not in col_type:
+            col_type = 'VARCHAR(255)'  # Default VARCHAR size
+        elif col_type == 'INT' or col_type.startswith('INT('):
+            col_type = 'INTEGER' + col_type[3:]  # information_schema/PRAGMA spelling of SQLAlchemy's INTEGER
+        
+        return col_type
+    
     @staticmethod
     def get_table_data(engine: Engine, table_name: str, limit: Optional[int] = None) -> pd.DataFrame:
         """Get data from a table as pandas DataFrame"""
@@ -111,6 +136,232 @@ class DatabaseService:
         
         return pd.read_sql(query, engine)
     
+    # Key column types whose text form is the same in Python and in MariaDB/MySQL CONCAT_WS
+    HASH_KEY_TYPES = (
+        'INT', 'INTEGER', 'BIGINT', 'SMALLINT', 'MEDIUMINT', 'TINYINT',
+        'CHAR', 'VARCHAR', 'NCHAR', 'NVARCHAR', 'TEXT', 'TINYTEXT', 'MEDIUMTEXT', 'LONGTEXT'
+    )
+    
+    @staticmethod
+    def _crc32(*values):
+        """CRC32 of the values joined by '|' (NULLs skipped), like MariaDB CRC32(CONCAT_WS('|', ...))"""
+        joined = '|'.join(str(value) for value in values if value is not None)
+        return zlib.crc32(joined.encode('utf-8'))
+    
+    @staticmethod
+    def plan_key_partitions(
+        source_engine: Engine,
+        source_table: str,
+        source_keys: List[str],
+        target_engine: Engine,
+        target_table: str,
+        target_keys: List[str],
+        count: int
+    ) -> Tuple[str, List[Tuple[str, Dict]]]:
+        """Split the key space shared by a source and a target table into partitions
+        
+        A single integer key is split into equal key ranges (plus one partition for NULL
+        keys), which both sides can read through their key index. Other keys are split into
+        hash buckets computed in SQL. A key only lands in the same bucket on both sides when
+        its text form is the same, so hash partitioning needs both tables on the same
+        database family (MariaDB/MySQL or SQLite) and integer or text key columns.
+        
+        Raises:
+            HashPartitioningUnsupported: The keys need hash partitioning and don't meet those conditions
+        
+        Returns:
+            Tuple of (strategy, list of (key condition template, params)); the template holds
+            {keys} or {hash}, which read_partition fills in with each side's key columns
+        """
+        if len(source_keys) == 1:
+            bounds = []
+            for engine, table_name, key in (
+                (source_engine, source_table, source_keys[0]),
+                (target_engine, target_table, target_keys[0])
+            ):
+                with engine.connect() as conn:
+                    bounds.append(conn.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table_name}")).fetchone())
+            values = [value for bound in bounds for value in bound if value is not None]
+            if values and all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+                low, high = min(values), max(values)
+                step = max(1, -(-(high - low + 1) // count))
+                partitions = [
+                    ('{keys} >= :low AND {keys} < :high', {'low': start, 'high': start + step})
+                    for start in range(low, high + 1, step)
+                ]
+                partitions.append(('{keys} IS NULL', {}))
+                return 'range', partitions
+        
+        families = []
+        for engine in (source_engine, target_engine):
+            if engine.dialect.name not in ('mysql', 'mariadb', 'sqlite'):
+                raise HashPartitioningUnsupported(f"Hash partitioning is not supported for {engine.dialect.name} (use a single integer key)")
+            families.append('sqlite' if engine.dialect.name == 'sqlite' else 'mysql')
+        if families[0] != families[1]:
+            raise HashPartitioningUnsupported(
+                f"Hash partitioning needs both tables on the same kind of database "
+                f"({source_engine.dialect.name} and {target_engine.dialect.name} hash keys differently; use a single integer key)"
+            )
+        for engine, table_name, keys in ((source_engine, source_table, source_keys), (target_engine, target_table, target_keys)):
+            types = {column['name']: column['type'] for column in DatabaseService.get_table_columns(engine, table_name)}
+            for key in keys:
+                base_type = str(types.get(key, '')).split('(')[0].strip().upper()
+                if base_type not in DatabaseService.HASH_KEY_TYPES:
+                    raise HashPartitioningUnsupported(
+                        f"Hash partitioning needs integer or text keys ({table_name}.{key} is {base_type or 'of unknown type'})"
+                    )
+        return 'hash', [('{hash} = :bucket', {'buckets': count, 'bucket': bucket}) for bucket in range(count)]
+    
+    @staticmethod
+    def read_partition(
+        engine: Engine,
+        table_name: str,
+        columns: Optional[List[str]],
+        key_columns: List[str],
+        condition: str,
+        params: Dict
+    ) -> pd.DataFrame:
+        """Read the rows of one partition planned by plan_key_partitions (all columns when columns is None)"""
+        select_list = ', '.join(dict.fromkeys(columns)) if columns else '*'
+        if '{hash}' in condition:
+            if engine.dialect.name == 'sqlite':
+                hash_sql = f"(deltascope_crc32({', '.join(key_columns)}) % :buckets)"
+            else:
+                hash_sql = f"MOD(CRC32(CONCAT_WS('|', {', '.join(key_columns)})), :buckets)"
+            where = condition.replace('{hash}', hash_sql)
+        else:
+            where = condition.replace('{keys}', key_columns[0])
+        sql = f"SELECT {select_list} FROM {table_name} WHERE {where}"
+        
+        with engine.connect() as conn:
+            if engine.dialect.name == 'sqlite':
+                conn.connection.driver_connection.create_function('deltascope_crc32', -1, DatabaseService._crc32, deterministic=True)
+            return pd.read_sql(text(sql), conn, params=params)
+    
+    # Filter operators accepted by browse_table
+    BROWSE_OPERATORS = ('eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'like', 'in', 'is_null', 'not_null')
+    
+    @staticmethod
+    def _json_value(value):
+        """Convert a DBAPI value to a JSON-serializable value"""
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, (datetime, date, time)):
+            return value.isoformat()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return base64.b64encode(bytes(value)).decode()
+        return str(value)
+    
+    @staticmethod
+    def browse_table(
+        engine: Engine,
+        table_name: str,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List[Dict]] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Dict:
+        """Read one page of a table in primary key order (keyset pagination)
+        
+        Pages continue with WHERE pk > :cursor ORDER BY pk LIMIT :n (a row-value comparison
+        for composite keys), so any page costs the same as the first. Column selection and
+        filters are pushed down to SQL, and rows are serialized straight from the cursor.
+        Tables without a primary key only return the first page.
+        
+        Args:
+            engine: Engine of the database
+            table_name: Table name
+            columns: Columns to return (default: all); primary key columns are always included
+            filters: List of {'column', 'op', 'value'} with op in BROWSE_OPERATORS (default 'eq')
+            cursor: next_cursor of the previous page
+            limit: Page size
+        
+        Returns:
+            Dictionary with columns, primary_keys, rows, next_cursor, has_more and truncated
+        
+        Raises:
+            ValueError: If a column, operator or cursor is invalid, or a key type cannot
+                be carried in a cursor
+        """
+        table_columns = [col['name'] for col in DatabaseService.get_table_columns(engine, table_name)]
+        primary_keys = DatabaseService.get_primary_keys(engine, table_name)
+        
+        requested = columns or table_columns
+        unknown = [name for name in requested if name not in table_columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+        selected = [name for name in table_columns if name in requested or name in primary_keys]
+        
+        table = sa_table(table_name, *[sa_column(name) for name in table_columns])
+        stmt = select(*[table.c[name] for name in selected])
+        
+        for condition in filters or []:
+            name = condition.get('column')
+            op = condition.get('op', 'eq')
+            value = condition.get('value')
+            if name not in table_columns:
+                raise ValueError(f"Unknown filter column: {name}")
+            if op not in DatabaseService.BROWSE_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            col = table.c[name]
+            if op == 'eq':
+                stmt = stmt.where(col == value)
+            elif op == 'ne':
+                stmt = stmt.where(col != value)
+            elif op == 'lt':
+                stmt = stmt.where(col < value)
+            elif op == 'lte':
+                stmt = stmt.where(col <= value)
+            elif op == 'gt':
+                stmt = stmt.where(col > value)
+            elif op == 'gte':
+                stmt = stmt.where(col >= value)
+            elif op == 'like':
+                stmt = stmt.where(col.like(value))
+            elif op == 'in':
+                stmt = stmt.where(col.in_(value if isinstance(value, list) else [value]))
+            elif op == 'is_null':
+                stmt = stmt.where(col.is_(None))
+            else:
+                stmt = stmt.where(col.isnot(None))
+        
+        if primary_keys:
+            pk_columns = [table.c[name] for name in primary_keys]
+            if cursor:
+                values = decode_key(cursor, len(primary_keys))
+                if len(pk_columns) == 1:
+                    stmt = stmt.where(pk_columns[0] > values[0])
+                else:
+                    stmt = stmt.where(tuple_(*pk_columns) > tuple_(*values))
+            stmt = stmt.order_by(*pk_columns)
+        elif cursor:
+            raise ValueError('Table has no primary key; only the first page can be read')
+        
+        with engine.connect() as conn:
+            raw_rows = conn.execute(stmt.limit(limit + 1)).all()
+        
+        # Without a primary key there is no next page, truncated tells the caller rows were cut
+        truncated = len(raw_rows) > limit
+        has_more = truncated and bool(primary_keys)
+        raw_rows = raw_rows[:limit]
+        rows = [
+            {name: DatabaseService._json_value(value) for name, value in zip(selected, row)}
+            for row in raw_rows
+        ]
+        # The cursor carries the raw key values, not their JSON display form
+        next_cursor = encode_key([raw_rows[-1][selected.index(name)] for name in primary_keys]) if has_more else None
+        
+        return {
+            'columns': selected,
+            'primary_keys': primary_keys,
+            'rows': rows,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'truncated': truncated
+        }
+    
     @staticmethod
     def get_table_row_count(engine: Engine, table_name: str) -> int:
         """Get row count for a table"""
@@ -118,11 +369,258 @@ class DatabaseService:
             result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
             return result.scalar()
     
+    @staticmethod
+    def estimate_row_count(engine: Engine, table_name: str) -> Optional[int]:
+        """Get the catalog's row estimate for a table without scanning it
+        
+        MySQL/MariaDB: information_schema.TABLES.TABLE_ROWS. SQLite: sqlite_stat1 (after
+        ANALYZE). MAX(rowid) is not used: after deletes it can be far above the real count.
+        
+        Returns:
+            Estimated number of rows, or None if the database has no estimate
+        """
+        dialect = engine.dialect.name
+        with engine.connect() as conn:
+            if dialect in ('mysql', 'mariadb'):
+                value = conn.execute(text(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+                ), {'table_name': table_name}).scalar()
+                return int(value) if value is not None else None
+            
+            if dialect == 'sqlite':
+                has_stats = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+                )).first()
+                if has_stats:
+                    stats = conn.execute(text(
+                        "SELECT stat FROM sqlite_stat1 WHERE tbl = :table_name"
+                    ), {'table_name': table_name}).scalars().all()
+                    if stats:
+                        return max(int(str(stat).split()[0]) for stat in stats if stat)
+        
+        return None
+    
+    @staticmethod
+    def get_row_count(engine: Engine, table_name: str, exact: bool = False) -> Dict:
+        """Get a table's row count, estimated by default
+        
+        The estimate comes from the catalog (see estimate_row_count). An exact count runs
+        COUNT(*) and is cached with the schema metadata (see SchemaCache), so repeated
+        requests do not rescan the table. When the database has no estimate, the exact
+        count is used.
+        
+        Returns:
+            Dictionary with row_count and row_count_source ('estimate', 'exact' or
+            'exact_cached')
+        """
+        if not exact:
+            estimate = DatabaseService.estimate_row_count(engine, table_name)
+            if estimate is not None:
+                return {'row_count': estimate, 'row_count_source': 'estimate'}
+        
+        cached = SchemaCache.get(engine, 'row_count', table_name)
+        if cached is not None:
+            return {'row_count': cached, 'row_count_source': 'exact_cached'}
+        
+        row_count = DatabaseService.get_table_row_count(engine, table_name)
+        SchemaCache.put(engine, 'row_count', table_name, row_count)
+        return {'row_count': row_count, 'row_count_source': 'exact'}
+    
     @staticmethod
     def get_primary_keys(engine: Engine, table_name: str) -> List[str]:
-        """Get primary key columns for a table"""
-        inspector = inspect(engine)
-        pk_constraint = inspector.get_pk_constraint(table_name)
-        return pk_constraint.get('constrained_columns', [])
-
-
+        """Get primary key columns for a table (cached, see SchemaCache)"""
+        return SchemaCache.get_or_load(
+            engine, 'primary_keys', table_name,
+            lambda: inspect(engine).get_pk_constraint(table_name).get('constrained_columns', [])
+        )
+    
+    @staticmethod
+    def get_schema_snapshot(engine: Engine, refresh: bool = False) -> Dict:
+        """Get the complete schema of a database in a handful of catalog queries
+        
+        MySQL/MariaDB read information_schema (tables, columns, statistics) with one query
+        each; SQLite joins sqlite_master with the pragma table-valued functions. Other
+        dialects fall back to SQLAlchemy's multi-table reflection. The snapshot is cached
+        (see SchemaCache) and also fills the per-table column and primary key entries, so
+        later get_table_columns/get_primary_keys calls for any table are cache hits.
+        
+        Args:
+            engine: Engine of the database
+            refresh: Drop the cached schema of this database first
+        
+        Returns:
+            Dictionary with dialect and tables, each table with name, columns (same format as
+            get_table_columns), primary_keys, indexes and row_count_estimate (None if unknown)
+        """
+        if refresh:
+            SchemaCache.invalidate(engine)
+        
+        def load():
+            dialect = engine.dialect.name
+            with engine.connect() as conn:
+                if dialect in ('mysql', 'mariadb'):
+                    tables = DatabaseService._mysql_schema(conn)
+                elif dialect == 'sqlite':
+                    tables = DatabaseService._sqlite_schema(conn)
+                else:
+                    tables = DatabaseService._reflected_schema(conn)
+            
+            for table in tables:
+                pk_columns = set(table['primary_keys'])
+                for col in table['columns']:
+                    col['primary_key'] = col['name'] in pk_columns
+            
+            snapshot = {'dialect': dialect, 'tables': tables}
+            # Serve later per-table lookups from the same snapshot
+            SchemaCache.put(engine, 'tables', None, [table['name'] for table in tables])
+            for table in tables:
+                SchemaCache.put(engine, 'columns', table['name'], table['columns'])
+                SchemaCache.put(engine, 'primary_keys', table['name'], table['primary_keys'])
+            return snapshot
+        
+        return SchemaCache.get_or_load(engine, 'snapshot', None, load)
+    
+    @staticmethod
+    def get_table_schema(engine: Engine, table_name: str) -> Dict:
+        """Get one table of the schema snapshot
+        
+        Raises:
+            ValueError: If the table does not exist
+        """
+        for table in DatabaseService.get_schema_snapshot(engine)['tables']:
+            if table['name'] == table_name:
+                return table
+        raise ValueError(f"Table not found: {table_name}")
+    
+    @staticmethod
+    def _new_table(name: str, row_count_estimate=None) -> Dict:
+        return {
+            'name': name,
+            'columns': [],
+            'primary_keys': [],
+            'indexes': [],
+            'row_count_estimate': row_count_estimate
+        }
+    
+    @staticmethod
+    def _mysql_schema(conn) -> List[Dict]:
+        tables = {}
+        rows = conn.execute(text(
+            "SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE' ORDER BY TABLE_NAME"
+        ))
+        for table_name, table_rows in rows:
+            tables[table_name] = DatabaseService._new_table(
+                table_name, int(table_rows) if table_rows is not None else None
+            )
+        
+        rows = conn.execute(text(
+            "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        ))
+        for table_name, column_name, column_type, is_nullable in rows:
+            if table_name in tables:
+                tables[table_name]['columns'].append({
+                    'name': column_name,
+                    'type': DatabaseService._normalize_column_type(str(column_type)),
+                    'nullable': is_nullable == 'YES',
+                    'primary_key': False
+                })
+        
+        indexes = {}
+        rows = conn.execute(text(
+            "SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+        ))
+        for table_name, index_name, non_unique, column_name in rows:
+            if table_name not in tables:
+                continue
+            if index_name == 'PRIMARY':
+                tables[table_name]['primary_keys'].append(column_name)
+                continue
+            key = (table_name, index_name)
+            if key not in indexes:
+                indexes[key] = {'name': index_name, 'columns': [], 'unique': not int(non_unique)}
+                tables[table_name]['indexes'].append(indexes[key])
+            indexes[key]['columns'].append(column_name)
+        
+        return list(tables.values())
+    
+    @staticmethod
+    def _sqlite_schema(conn) -> List[Dict]:
+        user_tables = "m.type = 'table' AND m.name NOT LIKE 'sqlite_%'"
+        tables = {}
+        for (table_name,) in conn.execute(text(
+            f"SELECT m.name FROM sqlite_master m WHERE {user_tables} ORDER BY m.name"
+        )):
+            tables[table_name] = DatabaseService._new_table(table_name)
+        
+        primary_keys = {}
+        rows = conn.execute(text(
+            "SELECT m.name, p.name, p.type, p.\"notnull\", p.pk "
+            f"FROM sqlite_master m JOIN pragma_table_info(m.name) p WHERE {user_tables} "
+            "ORDER BY m.name, p.cid"
+        ))
+        for table_name, column_name, column_type, notnull, pk in rows:
+            tables[table_name]['columns'].append({
+                'name': column_name,
+                'type': DatabaseService._normalize_column_type(column_type or 'NULL'),
+                'nullable': not notnull,
+                'primary_key': False
+            })
+            if pk:
+                primary_keys.setdefault(table_name, []).append((pk, column_name))
+        for table_name, pk_columns in primary_keys.items():
+            tables[table_name]['primary_keys'] = [name for _, name in sorted(pk_columns)]
+        
+        indexes = {}
+        rows = conn.execute(text(
+            "SELECT m.name, il.name, il.\"unique\", ii.name "
+            "FROM sqlite_master m JOIN pragma_index_list(m.name) il JOIN pragma_index_info(il.name) ii "
+            f"WHERE {user_tables} AND il.origin != 'pk' ORDER BY m.name, il.name, ii.seqno"
+        ))
+        for table_name, index_name, unique, column_name in rows:
+            key = (table_name, index_name)
+            if key not in indexes:
+                indexes[key] = {'name': index_name, 'columns': [], 'unique': bool(unique)}
+                tables[table_name]['indexes'].append(indexes[key])
+            indexes[key]['columns'].append(column_name)
+        
+        # Row estimates exist only after ANALYZE (first number of each sqlite_stat1 entry)
+        has_stats = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )).first()
+        if has_stats:
+            for table_name, stat in conn.execute(text("SELECT tbl, stat FROM sqlite_stat1")):
+                if table_name in tables and stat:
+                    estimate = int(str(stat).split()[0])
+                    current = tables[table_name]['row_count_estimate']
+                    tables[table_name]['row_count_estimate'] = max(current or 0, estimate)
+        
+        return list(tables.values())
+    
+    @staticmethod
+    def _reflected_schema(conn) -> List[Dict]:
+        inspector = inspect(conn)
+        columns = inspector.get_multi_columns()
+        pk_constraints = inspector.get_multi_pk_constraint()
+        indexes = inspector.get_multi_indexes()
+        
+        tables = []
+        for schema, table_name in sorted(columns, key=lambda key: key[1]):
+            table = DatabaseService._new_table(table_name)
+            table['columns'] = [{
+                'name': col['name'],
+                'type': DatabaseService._normalize_column_type(str(col['type'])),
+                'nullable': col.get('nullable', True),
+                'primary_key': False
+            } for col in columns[(schema, table_name)]]
+            table['primary_keys'] = pk_constraints.get((schema, table_name), {}).get('constrained_columns', [])
+            table['indexes'] = [{
+                'name': index['name'],
+                'columns': index['column_names'],
+                'unique': bool(index.get('unique'))
+            } for index in indexes.get((schema, table_name), [])]
+            tables.append(table)
+        return tables
@@ -0,0 +1,243 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import zlib
+from datetime import datetime, date
+from typing import Dict, Iterable, Iterator, List, Tuple
+from app import db
+
+
+class ExportService:
+    """Service for streaming result exports (CSV, XLSX, Parquet) from a server-side cursor
+    
+    Columns are given as (name, kind) pairs where kind is one of 'int', 'str', 'json',
+    'datetime' or 'bool'. Rows are read with yield_per so only one batch is held in memory;
+    XLSX and Parquet are written to a temporary file by constant-memory writers and then
+    sent in chunks.
+    """
+    
+    FORMATS = {
+        'csv': ('text/csv; charset=utf-8', 'csv'),
+        'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+        'parquet': ('application/vnd.apache.parquet', 'parquet')
+    }
+    
+    # Rows fetched per round trip and written per CSV chunk / Parquet row group
+    BATCH_SIZE = 5000
+    
+    # Bytes read per chunk when sending a temporary file
+    FILE_CHUNK_SIZE = 64 * 1024
+    
+    @staticmethod
+    def validate_format(export_format: str):
+        """Check that a format is supported and its writer is installed
+        
+        Raises:
+            ValueError: If the format is unknown or its optional dependency is missing
+        """
+        if export_format not in ExportService.FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}. Use one of: {', '.join(ExportService.FORMATS)}")
+        if export_format == 'xlsx':
+            try:
+                import openpyxl  # noqa: F401
+            except ImportError:
+                raise ValueError('XLSX export requires openpyxl (pip install openpyxl)')
+        if export_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ValueError('Parquet export requires pyarrow (pip install pyarrow)')
+    
+    @staticmethod
+    def iter_rows(stmt) -> Iterator[Tuple]:
+        """Yield rows of a select statement from a server-side cursor"""
+        result = db.session.execute(stmt.execution_options(
+            stream_results=True,
+            yield_per=ExportService.BATCH_SIZE
+        ))
+        try:
+            for row in result:
+                yield tuple(row)
+        finally:
+            result.close()
+    
+    @staticmethod
+    def _to_text(value, kind: str):
+        """Convert a value to a CSV/XLSX cell"""
+        if value is None:
+            return None
+        if kind == 'json' or isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+    
+    @staticmethod
+    def csv_chunks(columns: List[Tuple[str, str]], rows: Iterable[Tuple]) -> Iterator[bytes]:
+        """Write rows as CSV, yielding one encoded chunk per batch"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM so Excel detects UTF-8, as in the client-side exports
+        buffer.write('\ufeff')
+        writer.writerow([name for name, _ in columns])
+        
+        pending = 0
+        for row in rows:
+            writer.writerow([
+                '' if value is None else ExportService._to_text(value, kind)
+                for value, (_, kind) in zip(row, columns)
+            ])
+            pending += 1
+            if pending >= ExportService.BATCH_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+        
+        remaining = buffer.getvalue()
+        if remaining:
+            yield remaining.encode('utf-8')
+    
+    @staticmethod
+    def _file_chunks(path: str) -> Iterator[bytes]:
+        """Send a temporary file in chunks and delete it afterwards"""
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(ExportService.FILE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    @staticmethod
+    def _temp_path(suffix: str) -> str:
+        fd, path = tempfile.mkstemp(prefix='deltascope_export_', suffix=suffix)
+        os.close(fd)
+        return path
+    
+    @staticmethod
+    def xlsx_chunks(columns: List[Tuple[str, str]], rows: Iterable[Tuple], sheet_title: str = 'Resultados') -> Iterator[bytes]:
+        """Write rows with openpyxl's write-only workbook and yield the file in chunks"""
+        from openpyxl import Workbook
+        
+        path = ExportService._temp_path('.xlsx')
+        try:
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet(title=sheet_title[:31])
+            sheet.append([name for name, _ in columns])
+            for row in rows:
+                sheet.append([
+                    ExportService._to_text(value, kind)
+                    for value, (_, kind) in zip(row, columns)
+                ])
+            workbook.save(path)
+        except Exception:
+            os.remove(path)
+            raise
+        
+        yield from ExportService._file_chunks(path)
+    
+    @staticmethod
+    def parquet_chunks(columns: List[Tuple[str, str]], rows: Iterable[Tuple]) -> Iterator[bytes]:
+        """Write rows with pyarrow, one row group per batch, and yield the file in chunks"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        arrow_types = {
+            'int': pa.int64(),
+            'str': pa.string(),
+            'json': pa.string(),
+            'datetime': pa.timestamp('us'),
+            'bool': pa.bool_()
+        }
+        schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+        
+        def convert(value, kind):
+            if value is None:
+                return None
+            if kind == 'json':
+                return json.dumps(value, ensure_ascii=False, default=str)
+            if kind == 'str' and not isinstance(value, str):
+                return str(value)
+            return value
+        
+        def write_batch(writer, batch):
+            arrays = [
+                pa.array([convert(row[index], kind) for row in batch], type=arrow_types[kind])
+                for index, (_, kind) in enumerate(columns)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        
+        path = ExportService._temp_path('.parquet')
+        try:
+            with pq.ParquetWriter(path, schema) as writer:
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= ExportService.BATCH_SIZE:
+                        write_batch(writer, batch)
+                        batch = []
+                if batch:
+                    write_batch(writer, batch)
+        except Exception:
+            os.remove(path)
+            raise
+        
+        yield from ExportService._file_chunks(path)
+    
+    @staticmethod
+    def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Compress a chunk stream into a gzip file stream"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    
+    @staticmethod
+    def export(
+        stmt,
+        columns: List[Tuple[str, str]],
+        export_format: str,
+        filename: str,
+        use_gzip: bool = False
+    ) -> Tuple[Iterator[bytes], Dict[str, str], str]:
+        """Build a streamed export
+        
+        Args:
+            stmt: Select statement returning the columns in order
+            columns: List of (name, kind) pairs
+            export_format: csv, xlsx or parquet
+            filename: Download file name without extension
+            use_gzip: Compress the download (adds .gz)
+        
+        Returns:
+            Tuple of (chunk generator, response headers, mimetype)
+        """
+        ExportService.validate_format(export_format)
+        mimetype, extension = ExportService.FORMATS[export_format]
+        
+        rows = ExportService.iter_rows(stmt)
+        if export_format == 'csv':
+            chunks = ExportService.csv_chunks(columns, rows)
+        elif export_format == 'xlsx':
+            chunks = ExportService.xlsx_chunks(columns, rows)
+        else:
+            chunks = ExportService.parquet_chunks(columns, rows)
+        
+        download_name = f"{filename}.{extension}"
+        if use_gzip:
+            chunks = ExportService.gzip_chunks(chunks)
+            mimetype = 'application/gzip'
+            download_name += '.gz'
+        
+        headers = {'Content-Disposition': f'attachment; filename="{download_name}"'}
+        return chunks, headers, mimetype
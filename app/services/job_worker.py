@@ -0,0 +1,77 @@
+"""
+Standalone worker that runs queued comparison jobs outside the web process
+
+Started with `python deltascope.py worker`. Each worker process claims one job at a time
+from the comparison_jobs table, runs it and writes its results; start several processes
+(on one or more hosts) to scale comparisons independently of the web workers.
+"""
+import os
+import socket
+import threading
+from app import db
+from app.services.comparison_job_service import ComparisonJobService
+
+
+class JobWorker:
+    """Polling loop claiming and executing comparison jobs"""
+    
+    def __init__(self, app, poll_interval=None, worker_id=None):
+        self.app = app
+        self.poll_interval = float(poll_interval if poll_interval is not None else app.config.get('WORKER_POLL_INTERVAL', 2.0))
+        self.worker_id = worker_id or f'worker:{socket.gethostname()}:{os.getpid()}'
+        self._stopping = threading.Event()
+    
+    def stop(self, *args):
+        """Finish the current job, then exit the loop (used as a signal handler)"""
+        if not self._stopping.is_set():
+            print(f"[WORKER] {self.worker_id} stopping after the current job...", flush=True)
+        self._stopping.set()
+    
+    def run_once(self):
+        """Claim and execute one job
+        
+        Returns:
+            The executed job id, or None when the queue was empty
+        """
+        try:
+            ComparisonJobService.requeue_stale()
+            job_id = ComparisonJobService.claim_next(self.worker_id)
+        except Exception as e:
+            print(f"[WORKER] Error claiming a job: {str(e)}", flush=True)
+            db.session.rollback()
+            return None
+        
+        if job_id is None:
+            return None
+        try:
+            ComparisonJobService.execute(job_id)
+        finally:
+            db.session.remove()
+        return job_id
+    
+    def run(self, once=False, max_jobs=None):
+        """Process jobs until stopped
+        
+        Args:
+            once: Exit as soon as the queue is empty
+            max_jobs: Exit after executing this many jobs
+        
+        Returns:
+            Number of jobs executed
+        """
+        executed = 0
+        with self.app.app_context():
+            print(f"[WORKER] {self.worker_id} started (runner={ComparisonJobService.runner()}, poll every {self.poll_interval}s)", flush=True)
+            while not self._stopping.is_set():
+                job_id = self.run_once()
+                if job_id is None:
+                    if once:
+                        break
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                
+                executed += 1
+                if max_jobs and executed >= max_jobs:
+                    break
+            print(f"[WORKER] {self.worker_id} exiting after {executed} job(s)", flush=True)
+        return executed
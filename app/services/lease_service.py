@@ -0,0 +1,115 @@
+"""
+Database leases shared by all DeltaScope processes
+
+A lease is a row of scheduler_leases owned by one process until its expires_at; the owner
+renews it while it is alive and any process may take it over once it has expired. Every
+change is a single conditional UPDATE (or the INSERT of a missing row), so two processes
+can never both believe they hold the same lease.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.scheduler_lease import SchedulerLease
+
+
+class LeaseService:
+    """Acquire, renew and release named leases"""
+    
+    _holder = None
+    _holder_pid = None
+    
+    @classmethod
+    def holder(cls) -> str:
+        """Identifier of this process (a fresh one after a fork)"""
+        if cls._holder is None or cls._holder_pid != os.getpid():
+            cls._holder_pid = os.getpid()
+            cls._holder = f'{socket.gethostname()}:{cls._holder_pid}:{uuid.uuid4().hex[:8]}'
+        return cls._holder
+    
+    @classmethod
+    def acquire(cls, name: str, ttl: int) -> bool:
+        """Take or renew a lease for ttl seconds
+        
+        Args:
+            name: Lease name
+            ttl: Seconds until the lease expires unless renewed
+        
+        Returns:
+            True when this process holds the lease
+        """
+        holder = cls.holder()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl)
+        
+        renewed = SchedulerLease.query.filter_by(name=name, holder=holder).update(
+            {'heartbeat_at': now, 'expires_at': expires_at}, synchronize_session=False
+        )
+        if not renewed:
+            renewed = SchedulerLease.query.filter(
+                SchedulerLease.name == name,
+                or_(
+                    SchedulerLease.holder.is_(None),
+                    SchedulerLease.expires_at.is_(None),
+                    SchedulerLease.expires_at <= now
+                )
+            ).update({
+                'holder': holder,
+                'acquired_at': now,
+                'heartbeat_at': now,
+                'expires_at': expires_at
+            }, synchronize_session=False)
+        if renewed:
+            db.session.commit()
+            return True
+        
+        exists = SchedulerLease.query.filter_by(name=name).count()
+        db.session.commit()
+        if exists:
+            return False
+        try:
+            db.session.add(SchedulerLease(
+                name=name, holder=holder, acquired_at=now, heartbeat_at=now, expires_at=expires_at, version=0
+            ))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Another process inserted it first
+            db.session.rollback()
+            return False
+    
+    @classmethod
+    def release(cls, name: str) -> bool:
+        """Give up a lease held by this process so another one can take it at once"""
+        released = SchedulerLease.query.filter_by(name=name, holder=cls.holder()).update(
+            {'holder': None, 'expires_at': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        return bool(released)
+    
+    @classmethod
+    def get(cls, name: str) -> Optional[SchedulerLease]:
+        """Current state of a lease, read from the database"""
+        lease = SchedulerLease.query.filter_by(name=name).first()
+        if lease:
+            db.session.refresh(lease)
+        return lease
+    
+    @classmethod
+    def bump_version(cls, name: str):
+        """Signal the holder of a lease that the state it loaded changed"""
+        SchedulerLease.query.filter_by(name=name).update(
+            {'version': db.func.coalesce(SchedulerLease.version, 0) + 1}, synchronize_session=False
+        )
+        db.session.commit()
+    
+    @classmethod
+    def get_version(cls, name: str) -> int:
+        """Version of a lease (0 when it does not exist yet)"""
+        version = db.session.query(SchedulerLease.version).filter_by(name=name).scalar()
+        db.session.commit()
+        return version or 0
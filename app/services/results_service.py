@@ -0,0 +1,208 @@
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import select, func, or_, and_
+from app import db
+from app.models.comparison import ComparisonResult
+from app.utils.pagination import encode_cursor, decode_cursor
+
+
+class ResultsService:
+    """Service for reading comparison results in pages or as a stream
+    
+    Results are always read in id order, so pages use keyset pagination
+    (id > cursor) instead of OFFSET and streams can resume from any id.
+    """
+    
+    # Columns that can be selected, in output order
+    COLUMNS = (
+        'id', 'comparison_id', 'record_id', 'field_name', 'source_value',
+        'target_value', 'target_record_json', 'change_type', 'detected_at'
+    )
+    
+    # Column kinds used by ExportService
+    COLUMN_KINDS = {
+        'id': 'int',
+        'comparison_id': 'int',
+        'record_id': 'str',
+        'field_name': 'str',
+        'source_value': 'str',
+        'target_value': 'str',
+        'target_record_json': 'json',
+        'change_type': 'str',
+        'detected_at': 'datetime'
+    }
+    
+    # Columns results can be sorted by (id is always the tie-breaker)
+    SORT_COLUMNS = ('id', 'record_id', 'field_name', 'change_type', 'detected_at')
+    
+    # Rows fetched per round trip when streaming
+    STREAM_BATCH_SIZE = 1000
+    
+    @staticmethod
+    def parse_columns(fields: Optional[str] = None, exclude: Optional[str] = None) -> List[str]:
+        """Resolve the selected columns from comma-separated fields/exclude parameters
+        
+        The id column is always included because it is the pagination cursor.
+        
+        Raises:
+            ValueError: If an unknown column is requested
+        """
+        requested = [name.strip() for name in (fields or '').split(',') if name.strip()]
+        excluded = [name.strip() for name in (exclude or '').split(',') if name.strip()]
+        
+        unknown = [name for name in requested + excluded if name not in ResultsService.COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown result column(s): {', '.join(unknown)}")
+        
+        columns = [
+            name for name in ResultsService.COLUMNS
+            if (not requested or name in requested or name == 'id') and (name not in excluded or name == 'id')
+        ]
+        return columns
+    
+    @staticmethod
+    def encode_cursor(sort_value, row_id: int) -> str:
+        """Encode the (sort value, id) position of the last row of a page"""
+        return encode_cursor(sort_value, row_id)
+    
+    @staticmethod
+    def decode_cursor(cursor: str, sort: str):
+        """Decode a cursor produced by encode_cursor
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        return decode_cursor(cursor, is_datetime=(sort == 'detected_at'))
+    
+    @staticmethod
+    def _sort_expression(sort: str):
+        column = getattr(ComparisonResult, sort)
+        if sort in ('record_id', 'field_name', 'change_type'):
+            # NULLs cannot be compared in a keyset condition
+            return func.coalesce(column, '')
+        return column
+    
+    @staticmethod
+    def build_query(
+        comparison_id: int,
+        columns: List[str],
+        filters: Optional[Dict] = None,
+        after_id: Optional[int] = None,
+        sort: str = 'id',
+        descending: bool = False,
+        cursor: Optional[str] = None
+    ):
+        """Build the select statement for a comparison's results
+        
+        Args:
+            comparison_id: Comparison ID
+            columns: Column names from COLUMNS
+            filters: Optional dict with field_name, change_type and record_id_prefix
+            after_id: Only return results with id greater than this cursor (id ascending sort)
+            sort: Column from SORT_COLUMNS
+            descending: Sort direction
+            cursor: Position returned by a previous page for the same sort (see encode_cursor)
+        
+        Raises:
+            ValueError: If the sort column or cursor is invalid
+        """
+        if sort not in ResultsService.SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort column: {sort}")
+        
+        filters = filters or {}
+        stmt = select(*[getattr(ComparisonResult, name) for name in columns]).where(
+            ComparisonResult.comparison_id == comparison_id
+        )
+        if filters.get('field_name'):
+            stmt = stmt.where(ComparisonResult.field_name == filters['field_name'])
+        if filters.get('change_type'):
+            stmt = stmt.where(ComparisonResult.change_type == filters['change_type'])
+        if filters.get('record_id_prefix'):
+            stmt = stmt.where(ComparisonResult.record_id.startswith(filters['record_id_prefix'], autoescape=True))
+        if after_id is not None:
+            stmt = stmt.where(ComparisonResult.id > after_id)
+        
+        sort_expr = ResultsService._sort_expression(sort)
+        if cursor:
+            sort_value, row_id = ResultsService.decode_cursor(cursor, sort)
+            if sort == 'id':
+                stmt = stmt.where(ComparisonResult.id < row_id if descending else ComparisonResult.id > row_id)
+            elif descending:
+                stmt = stmt.where(or_(sort_expr < sort_value, and_(sort_expr == sort_value, ComparisonResult.id < row_id)))
+            else:
+                stmt = stmt.where(or_(sort_expr > sort_value, and_(sort_expr == sort_value, ComparisonResult.id > row_id)))
+        
+        if sort == 'id':
+            return stmt.order_by(ComparisonResult.id.desc() if descending else ComparisonResult.id)
+        if descending:
+            return stmt.order_by(sort_expr.desc(), ComparisonResult.id.desc())
+        return stmt.order_by(sort_expr, ComparisonResult.id)
+    
+    @staticmethod
+    def row_to_dict(row, columns: List[str]) -> Dict:
+        """Convert a selected row to a JSON-serializable dictionary"""
+        data = dict(zip(columns, row))
+        if data.get('detected_at') is not None:
+            data['detected_at'] = data['detected_at'].isoformat()
+        return data
+    
+    @staticmethod
+    def get_page(
+        comparison_id: int,
+        columns: List[str],
+        filters: Optional[Dict] = None,
+        after_id: Optional[int] = None,
+        limit: int = 500,
+        sort: str = 'id',
+        descending: bool = False,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """Get one keyset page of results
+        
+        Returns:
+            Dictionary with results, next_cursor and has_more. For the default id ascending
+            sort next_cursor is the last id (pass it as after_id); for other sorts it is an
+            opaque string to pass back as cursor.
+        """
+        stmt = ResultsService.build_query(
+            comparison_id, columns, filters, after_id, sort, descending, cursor
+        ).add_columns(ResultsService._sort_expression(sort).label('_sort_value')).limit(limit + 1)
+        rows = db.session.execute(stmt).all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        results = [ResultsService.row_to_dict(row[:-1], columns) for row in rows]
+        
+        next_cursor = None
+        if has_more:
+            last_row = rows[-1]
+            if sort == 'id' and not descending:
+                next_cursor = results[-1]['id']
+            else:
+                next_cursor = ResultsService.encode_cursor(last_row[-1], results[-1]['id'])
+        
+        return {
+            'results': results,
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+    
+    @staticmethod
+    def iter_results(
+        comparison_id: int,
+        columns: List[str],
+        filters: Optional[Dict] = None,
+        after_id: Optional[int] = None,
+        sort: str = 'id',
+        descending: bool = False
+    ) -> Iterator[Dict]:
+        """Yield results one by one from a server-side cursor"""
+        stmt = ResultsService.build_query(comparison_id, columns, filters, after_id, sort, descending).execution_options(
+            stream_results=True,
+            yield_per=ResultsService.STREAM_BATCH_SIZE
+        )
+        result = db.session.execute(stmt)
+        try:
+            for row in result:
+                yield ResultsService.row_to_dict(row, columns)
+        finally:
+            result.close()
@@ -0,0 +1,302 @@
+from collections import Counter
+from datetime import datetime, date, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, and_, case, select, insert
+from app import db
+from app.models.change_log import ChangeLog, ChangeLogDailyRollup
+
+
+class RollupService:
+    """Service for the incrementally maintained daily change log rollup used by the dashboard
+    
+    Rollup rows are keyed by (project_id, day, change_type, field_name) and hold the number
+    of change logs and how many of them were not yet sent to the external API. They are
+    updated in the same transaction that writes, sends or deletes the change logs.
+    """
+    
+    # Columns callers can group by in grouped_counts()
+    GROUP_COLUMNS = ('day', 'change_type', 'field_name')
+    
+    BATCH_SIZE = 500
+    
+    @staticmethod
+    def _upsert(deltas: Dict[Tuple[int, date, str, str], Tuple[int, int]]):
+        """Add (change_count, unsent_count) deltas to rollup rows, creating them when missing"""
+        if not deltas:
+            return
+        
+        table = ChangeLogDailyRollup.__table__
+        rows = [
+            {
+                'project_id': project_id,
+                'day': day,
+                'change_type': change_type,
+                'field_name': field_name,
+                'change_count': change_count,
+                'unsent_count': unsent_count
+            }
+            for (project_id, day, change_type, field_name), (change_count, unsent_count) in deltas.items()
+        ]
+        dialect = db.session.get_bind().dialect.name
+        
+        for start in range(0, len(rows), RollupService.BATCH_SIZE):
+            batch = rows[start:start + RollupService.BATCH_SIZE]
+            
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+                stmt = sqlite_insert(table).values(batch)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['project_id', 'day', 'change_type', 'field_name'],
+                    set_={
+                        'change_count': table.c.change_count + stmt.excluded.change_count,
+                        'unsent_count': table.c.unsent_count + stmt.excluded.unsent_count
+                    }
+                )
+                db.session.execute(stmt)
+            elif dialect in ('mysql', 'mariadb'):
+                from sqlalchemy.dialects.mysql import insert as mysql_insert
+                stmt = mysql_insert(table).values(batch)
+                stmt = stmt.on_duplicate_key_update(
+                    change_count=table.c.change_count + stmt.inserted.change_count,
+                    unsent_count=table.c.unsent_count + stmt.inserted.unsent_count
+                )
+                db.session.execute(stmt)
+            else:
+                # Generic fallback: update existing rows, insert the rest
+                for row in batch:
+                    updated = db.session.execute(
+                        table.update().where(and_(
+                            table.c.project_id == row['project_id'],
+                            table.c.day == row['day'],
+                            table.c.change_type == row['change_type'],
+                            table.c.field_name == row['field_name']
+                        )).values(
+                            change_count=table.c.change_count + row['change_count'],
+                            unsent_count=table.c.unsent_count + row['unsent_count']
+                        )
+                    )
+                    if updated.rowcount == 0:
+                        db.session.execute(table.insert().values(**row))
+    
+    @staticmethod
+    def _prune(project_ids: Iterable[int]):
+        """Delete rollup rows whose counts dropped to zero"""
+        project_ids = list(set(project_ids))
+        if not project_ids:
+            return
+        table = ChangeLogDailyRollup.__table__
+        db.session.execute(
+            table.delete().where(and_(
+                table.c.project_id.in_(project_ids),
+                table.c.change_count <= 0
+            ))
+        )
+    
+    @staticmethod
+    def record_changes(project_id: int, differences: List[Dict], detected_at: datetime):
+        """Add the change logs written for a comparison to the rollup (does not commit)"""
+        counts = Counter(
+            (diff.get('change_type'), diff.get('field_name'))
+            for diff in differences
+            if diff.get('change_type') and diff.get('field_name')
+        )
+        day = detected_at.date()
+        RollupService._upsert({
+            (project_id, day, change_type, field_name): (count, count)
+            for (change_type, field_name), count in counts.items()
+        })
+    
+    @staticmethod
+    def mark_sent(change_logs: Iterable[ChangeLog]):
+        """Decrement unsent counts for change logs that were just marked as sent (does not commit)"""
+        counts = Counter(
+            (log.project_id, log.detected_at.date(), log.change_type, log.field_name)
+            for log in change_logs
+            if log.detected_at is not None
+        )
+        RollupService._upsert({key: (0, -count) for key, count in counts.items()})
+    
+    @staticmethod
+    def remove_comparisons(comparison_ids: List[int]):
+        """Subtract the change logs of comparisons about to be deleted (does not commit)
+        
+        Must run before the change logs are deleted.
+        """
+        if not comparison_ids:
+            return
+        day = func.date(ChangeLog.detected_at)
+        rows = db.session.query(
+            ChangeLog.project_id,
+            day,
+            ChangeLog.change_type,
+            ChangeLog.field_name,
+            func.count(ChangeLog.id),
+            func.sum(case((ChangeLog.sent_to_api == False, 1), else_=0))  # noqa: E712
+        ).filter(
+            ChangeLog.comparison_id.in_(comparison_ids)
+        ).group_by(
+            ChangeLog.project_id, day, ChangeLog.change_type, ChangeLog.field_name
+        ).all()
+        
+        deltas = {}
+        for project_id, log_day, change_type, field_name, count, unsent in rows:
+            key = (project_id, RollupService._to_date(log_day), change_type, field_name)
+            deltas[key] = (-count, -(unsent or 0))
+        RollupService._upsert(deltas)
+        RollupService._prune(key[0] for key in deltas)
+    
+    @staticmethod
+    def rebuild(project_id: Optional[int] = None) -> int:
+        """Rebuild rollup rows from the raw change logs (backfill) and commit
+        
+        Args:
+            project_id: Rebuild a single project, or all projects if None
+        
+        Returns:
+            Number of rollup rows written
+        """
+        table = ChangeLogDailyRollup.__table__
+        delete_stmt = table.delete()
+        if project_id is not None:
+            delete_stmt = delete_stmt.where(table.c.project_id == project_id)
+        db.session.execute(delete_stmt)
+        
+        day = func.date(ChangeLog.detected_at)
+        source = select(
+            ChangeLog.project_id,
+            day,
+            ChangeLog.change_type,
+            ChangeLog.field_name,
+            func.count(ChangeLog.id),
+            func.sum(case((ChangeLog.sent_to_api == False, 1), else_=0))  # noqa: E712
+        ).group_by(
+            ChangeLog.project_id, day, ChangeLog.change_type, ChangeLog.field_name
+        )
+        if project_id is not None:
+            source = source.where(ChangeLog.project_id == project_id)
+        
+        result = db.session.execute(
+            insert(table).from_select(
+                ['project_id', 'day', 'change_type', 'field_name', 'change_count', 'unsent_count'],
+                source
+            )
+        )
+        db.session.commit()
+        return result.rowcount
+    
+    @staticmethod
+    def _to_date(value) -> date:
+        """Normalize a DATE() result (date object on MySQL, string on SQLite)"""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    
+    # Range ends from this time on count as the end of their day (inputs without microseconds)
+    END_OF_DAY = time(23, 59, 59)
+    
+    @staticmethod
+    def split_range(start: Optional[datetime], end: Optional[datetime]):
+        """Split an inclusive datetime range into whole days and partial edge ranges
+        
+        Whole days are answered from the rollup table; the partial days at either end
+        are answered from the raw change logs so results match the unrolled queries.
+        An end at 23:59:59 or later (any fraction of that second) closes its day.
+        
+        Returns:
+            Tuple of ((first_day, last_day) or None, list of ChangeLog filter conditions).
+            first_day/last_day may be None for an unbounded side.
+        """
+        first_day = None
+        last_day = None
+        if start is not None:
+            first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+        if end is not None:
+            last_day = end.date() if end.time() >= RollupService.END_OF_DAY else end.date() - timedelta(days=1)
+        
+        if first_day is not None and last_day is not None and first_day > last_day:
+            # No whole day inside the range
+            return None, [and_(ChangeLog.detected_at >= start, ChangeLog.detected_at <= end)]
+        
+        edges = []
+        if start is not None and start.time() != time.min:
+            edges.append(and_(
+                ChangeLog.detected_at >= start,
+                ChangeLog.detected_at < datetime.combine(first_day, time.min)
+            ))
+        if end is not None and end.time() < RollupService.END_OF_DAY:
+            edges.append(and_(
+                ChangeLog.detected_at >= datetime.combine(last_day + timedelta(days=1), time.min),
+                ChangeLog.detected_at <= end
+            ))
+        return (first_day, last_day), edges
+    
+    @staticmethod
+    def grouped_counts(
+        project_id: int,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        group_by: List[str]
+    ) -> Dict[Tuple, Tuple[int, int]]:
+        """Count change logs of a project in [start, end] grouped by the given columns
+        
+        Args:
+            project_id: Project ID
+            start: Inclusive lower bound (None for unbounded)
+            end: Inclusive upper bound (None for unbounded)
+            group_by: Subset of GROUP_COLUMNS, e.g. ['change_type'] or ['day', 'change_type']
+        
+        Returns:
+            Dictionary mapping group key tuples to (change_count, unsent_count). Days are ISO strings.
+        """
+        for column in group_by:
+            if column not in RollupService.GROUP_COLUMNS:
+                raise ValueError(f"Unsupported rollup group column: {column}")
+        
+        totals = {}
+        
+        def add(key, count, unsent):
+            key = tuple(
+                RollupService._to_date(value).isoformat() if column == 'day' else value
+                for column, value in zip(group_by, key)
+            )
+            previous = totals.get(key, (0, 0))
+            totals[key] = (previous[0] + int(count or 0), previous[1] + int(unsent or 0))
+        
+        full_days, edges = RollupService.split_range(start, end)
+        
+        if full_days is not None:
+            first_day, last_day = full_days
+            columns = [getattr(ChangeLogDailyRollup, column) for column in group_by]
+            query = db.session.query(
+                *columns,
+                func.sum(ChangeLogDailyRollup.change_count),
+                func.sum(ChangeLogDailyRollup.unsent_count)
+            ).filter(ChangeLogDailyRollup.project_id == project_id)
+            if first_day is not None:
+                query = query.filter(ChangeLogDailyRollup.day >= first_day)
+            if last_day is not None:
+                query = query.filter(ChangeLogDailyRollup.day <= last_day)
+            if columns:
+                query = query.group_by(*columns)
+            for row in query.all():
+                add(row[:-2], row[-2], row[-1])
+        
+        for edge_filter in edges:
+            columns = [
+                func.date(ChangeLog.detected_at) if column == 'day' else getattr(ChangeLog, column)
+                for column in group_by
+            ]
+            query = db.session.query(
+                *columns,
+                func.count(ChangeLog.id),
+                func.sum(case((ChangeLog.sent_to_api == False, 1), else_=0))  # noqa: E712
+            ).filter(ChangeLog.project_id == project_id, edge_filter)
+            if columns:
+                query = query.group_by(*columns)
+            for row in query.all():
+                add(row[:-2], row[-2], row[-1])
+        
+        # Drop groups that only had edge/rollup rows summing to zero
+        return {key: value for key, value in totals.items() if value[0] > 0}
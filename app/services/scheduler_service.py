@@ -3,22 +3,43 @@ from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timedelta
 from croniter import croniter
+import atexit
 import requests
 import os
+import threading
+import time
 from app.models.scheduled_task import ScheduledTask
 from app.models.comparison import Comparison, ComparisonResult
+from app.models.comparison_job import ComparisonJob
 from app.models.project import Project
 from app import db
 from app.services.comparison_service import ComparisonService
+from app.services.comparison_job_service import ComparisonJobService
 from app.services.database import DatabaseService
+from app.services.lease_service import LeaseService
 
 
 class SchedulerService:
-    """Service for managing scheduled tasks"""
+    """Service for managing scheduled tasks
+    
+    Every web process starts a scheduler, but only the holder of the 'scheduler' lease
+    (the leader) loads the scheduled jobs. The others keep trying to take the lease over
+    and load the jobs when the leader stops renewing it.
+    """
     
     _scheduler = None
     _running_tasks = set()  # Track currently running tasks to prevent duplicates
     
+    LEASE_NAME = 'scheduler'
+    LEASE_JOB_ID = 'scheduler_lease'
+    
+    _app = None  # Application the scheduled jobs run in (bound once)
+    _app_lock = threading.Lock()
+    _leader = False
+    _lease_valid_until = None  # Local expiry of the last successful renewal
+    _loaded_version = None  # Lease version of the loaded jobs
+    _exit_registered = False
+    
     @classmethod
     def get_scheduler(cls):
         """Get or create scheduler instance"""
@@ -31,6 +52,184 @@ class SchedulerService:
             cls._scheduler.start()
         return cls._scheduler
     
+    @classmethod
+    def start(cls):
+        """Start the scheduler of this process and join the leader election
+        
+        Runs the election once right away (the first process takes the lease and loads
+        the jobs) and then every SCHEDULER_LEASE_RENEW seconds.
+        """
+        from flask import current_app
+        
+        cls._app = current_app._get_current_object()
+        scheduler = cls.get_scheduler()
+        
+        if not current_app.config.get('SCHEDULER_LEADER_ELECTION', True):
+            cls._leader = True
+            cls.load_all_tasks()
+            return
+        
+        scheduler.add_job(
+            cls.check_leadership,
+            trigger=IntervalTrigger(seconds=max(1, int(current_app.config.get('SCHEDULER_LEASE_RENEW', 15)))),
+            id=cls.LEASE_JOB_ID,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        if not cls._exit_registered:
+            atexit.register(cls.release_leadership)
+            cls._exit_registered = True
+        cls.check_leadership()
+    
+    @classmethod
+    def get_app(cls):
+        """Application scheduled jobs run in
+        
+        The current application when called inside a context, otherwise the one the
+        scheduler was bound to by start(). Without either (jobs called from a script), a
+        lightweight job app is built once and kept, instead of a full create_app() per run.
+        """
+        from flask import current_app
+        
+        try:
+            return current_app._get_current_object()
+        except RuntimeError:
+            pass
+        if cls._app is None:
+            with cls._app_lock:
+                if cls._app is None:
+                    from app import create_job_app
+                    cls._app = create_job_app(os.getenv('FLASK_ENV', 'default'))
+                    print("[SCHEDULER] Bound scheduled jobs to a lightweight job app", flush=True)
+        return cls._app
+    
+    @classmethod
+    def is_leader(cls):
+        """Whether this process runs the scheduled jobs"""
+        return cls._leader
+    
+    @classmethod
+    def check_leadership(cls):
+        """Take or renew the scheduler lease and load or drop the jobs accordingly
+        
+        The leader also reloads its jobs when another process changed the scheduled
+        tasks (lease version bumped). A leader that cannot reach the database steps down
+        once its lease would have expired, since another process may have taken it.
+        """
+        app = cls._app
+        if app is None:
+            return
+        
+        with app.app_context():
+            try:
+                ttl = max(2, int(app.config.get('SCHEDULER_LEASE_TTL', 60)))
+                holds = LeaseService.acquire(cls.LEASE_NAME, ttl)
+                if holds:
+                    cls._lease_valid_until = datetime.utcnow() + timedelta(seconds=ttl)
+                    version = LeaseService.get_version(cls.LEASE_NAME)
+                    if not cls._leader:
+                        print(f"[SCHEDULER] Process {LeaseService.holder()} is now the scheduler leader", flush=True)
+                        cls._leader = True
+                        cls._loaded_version = version
+                        cls.load_all_tasks()
+                    elif version != cls._loaded_version:
+                        print(f"[SCHEDULER] Scheduled tasks changed (version {cls._loaded_version} -> {version}), reloading", flush=True)
+                        cls._loaded_version = version
+                        cls.load_all_tasks()
+                elif cls._leader:
+                    print(f"[SCHEDULER] Process {LeaseService.holder()} lost the scheduler lease, unloading jobs", flush=True)
+                    cls._step_down()
+            except Exception as e:
+                print(f"[SCHEDULER] Error checking the scheduler lease: {str(e)}", flush=True)
+                db.session.rollback()
+                if cls._leader and (cls._lease_valid_until is None or datetime.utcnow() >= cls._lease_valid_until):
+                    print("[SCHEDULER] Scheduler lease could not be renewed before expiring, unloading jobs", flush=True)
+                    cls._step_down()
+            finally:
+                db.session.remove()
+    
+    @classmethod
+    def _step_down(cls):
+        """Stop running scheduled jobs on this process"""
+        cls._leader = False
+        cls._loaded_version = None
+        cls._remove_scheduled_jobs(cls.get_scheduler())
+    
+    @classmethod
+    def release_leadership(cls):
+        """Hand the scheduler lease back on shutdown so another process takes over at once"""
+        if not cls._leader or cls._app is None:
+            return
+        try:
+            with cls._app.app_context():
+                LeaseService.release(cls.LEASE_NAME)
+                db.session.remove()
+            print("[SCHEDULER] Released the scheduler lease", flush=True)
+        except Exception as e:
+            print(f"[SCHEDULER] Error releasing the scheduler lease: {str(e)}", flush=True)
+        cls._step_down()
+    
+    @classmethod
+    def _remove_scheduled_jobs(cls, scheduler):
+        """Remove every job except the leader election job"""
+        for job in scheduler.get_jobs():
+            if job.id != cls.LEASE_JOB_ID:
+                try:
+                    scheduler.remove_job(job.id)
+                except Exception:
+                    pass
+    
+    @classmethod
+    def _notify_leader(cls, change):
+        """Make the leader reload its jobs after a scheduled task changed on this process"""
+        try:
+            LeaseService.bump_version(cls.LEASE_NAME)
+            print(f"[SCHEDULER] Not the scheduler leader, {change} will be picked up by the leader", flush=True)
+        except Exception as e:
+            print(f"[SCHEDULER] Error notifying the scheduler leader: {str(e)}", flush=True)
+            db.session.rollback()
+    
+    @classmethod
+    def _lock_run(cls, run_key):
+        """Take the cross-process lease of a job run, renewed in the background
+        
+        Returns:
+            Callable releasing the lease, or None when another process is running the job
+        """
+        from flask import current_app
+        
+        ttl = max(2, int(current_app.config.get('SCHEDULER_RUN_LOCK_TTL', 300)))
+        if not LeaseService.acquire(run_key, ttl):
+            return None
+        
+        app = current_app._get_current_object()
+        stop = threading.Event()
+        
+        def renew():
+            with app.app_context():
+                try:
+                    while not stop.wait(max(1, ttl // 3)):
+                        LeaseService.acquire(run_key, ttl)
+                except Exception as e:
+                    print(f"[SCHEDULER] Renewal of run lock {run_key} stopped: {str(e)}", flush=True)
+                finally:
+                    db.session.remove()
+        
+        renewer = threading.Thread(target=renew, name=f'{run_key}-lock', daemon=True)
+        renewer.start()
+        
+        def release():
+            stop.set()
+            renewer.join()
+            try:
+                LeaseService.release(run_key)
+            except Exception as e:
+                print(f"[SCHEDULER] Error releasing run lock {run_key}: {str(e)}", flush=True)
+                db.session.rollback()
+        
+        return release
+    
     @classmethod
     def calculate_next_run(cls, schedule_type, schedule_value, last_run=None):
         """Calculate next run time based on schedule type and value"""
@@ -103,6 +302,8 @@ class SchedulerService:
     @classmethod
     def execute_scheduled_task(cls, task_id):
         """Execute a scheduled task"""
+        started = time.perf_counter()
+        
         # Prevent duplicate executions
         if task_id in cls._running_tasks:
             print(f"[SCHEDULER] Task {task_id} is already running, skipping duplicate execution", flush=True)
@@ -112,33 +313,55 @@ class SchedulerService:
         cls._running_tasks.add(task_id)
         
         try:
-            from flask import Flask
-            from app import create_app
-            
-            # Get or create app instance for background execution
-            app = None
-            try:
-                from flask import current_app
-                app = current_app._get_current_object()
-            except RuntimeError:
-                # No application context, create one
-                app = create_app()
-            
+            app = cls.get_app()
             with app.app_context():
+                release_lock = cls._lock_run(f'scheduled_task_{task_id}')
+                if release_lock is None:
+                    print(f"[SCHEDULER] Task {task_id} is running on another process, skipping", flush=True)
+                    return
+                
                 try:
                     task = ScheduledTask.query.get(task_id)
                     if not task or not task.is_active:
                         print(f"[SCHEDULER] Task {task_id} not found or inactive", flush=True)
                         return
                     
+                    # Time spent before the comparison starts (app context, run lock, task load)
+                    overhead_ms = round((time.perf_counter() - started) * 1000, 2)
+                    
                     # Update task status
                     task.last_run_at = datetime.utcnow()
                     task.last_run_status = 'running'
+                    task.last_run_metadata = {'overhead_ms': overhead_ms}
                     task.total_runs += 1
                     db.session.commit()
                     
                     print(f"[SCHEDULER] Executing task {task_id}: {task.name}", flush=True)
                     
+                    # Worker mode: queue the comparison for a deltascope worker process,
+                    # which records the outcome on the task when the job finishes
+                    if ComparisonJobService.runner() == 'worker':
+                        pending = ComparisonJob.query.filter(
+                            ComparisonJob.scheduled_task_id == task_id,
+                            ComparisonJob.status.in_(('queued', 'running'))
+                        ).first()
+                        if pending:
+                            print(f"[SCHEDULER] Task {task_id} still has job {pending.id} {pending.status}, skipping", flush=True)
+                            task.last_run_status = 'skipped'
+                            task.last_run_message = f'Previous comparison job {pending.id} is still {pending.status}'
+                        else:
+                            job = ComparisonJobService.enqueue(
+                                task.project_id,
+                                task.user_id,
+                                {'key_mappings': task.key_mappings or {}},
+                                scheduled_task_id=task_id
+                            )
+                            task.last_run_status = 'queued'
+                            task.last_run_message = f'Comparison job {job.id} queued'
+                        task.next_run_at = cls.calculate_next_run(task.schedule_type, task.schedule_value, task.last_run_at)
+                        db.session.commit()
+                        return
+                    
                     # Get project
                     project = Project.query.get(task.project_id)
                     if not project:
@@ -159,7 +382,7 @@ class SchedulerService:
                     target_config['type'] = project.target_connection.db_type
                     
                     # Get primary keys
-                    source_engine = DatabaseService.get_engine(source_config, already_decrypted=True)
+                    source_engine = DatabaseService.get_engine(source_config, already_decrypted=True, connection_id=project.source_connection_id)
                     primary_keys = DatabaseService.get_primary_keys(source_engine, project.source_table)
                     print(f"[SCHEDULER] Primary keys found from DB: {primary_keys}", flush=True)
                     
@@ -215,7 +438,9 @@ class SchedulerService:
                         project.source_table,
                         project.target_table,
                         primary_keys,
-                        key_mappings
+                        key_mappings,
+                        source_connection_id=project.source_connection_id,
+                        target_connection_id=project.target_connection_id
                     )
                     
                     print(f"[SCHEDULER] Comparison function returned {len(differences)} differences", flush=True)
@@ -238,7 +463,8 @@ class SchedulerService:
                             'primary_keys': primary_keys,
                             'key_mappings': key_mappings,
                             'total_source_rows': len(differences_df) if not differences_df.empty else 0,
-                            'scheduled_task_id': task_id
+                            'scheduled_task_id': task_id,
+                            'scheduler_overhead_ms': overhead_ms
                         },
                         user_id=task.user_id
                     )
@@ -281,6 +507,11 @@ class SchedulerService:
                     if task:
                         task.last_run_status = 'success'
                         task.last_run_message = f'Comparison completed successfully. Found {len(differences)} differences.'
+                        task.last_run_metadata = {
+                            'overhead_ms': overhead_ms,
+                            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+                            'comparison_id': comparison.id
+                        }
                         task.successful_runs += 1
                         task.next_run_at = cls.calculate_next_run(
                             task.schedule_type,
@@ -288,7 +519,7 @@ class SchedulerService:
                             task.last_run_at
                         )
                         db.session.commit()
-            
+                
                 except Exception as e:
                     import traceback
                     error_msg = str(e)
@@ -313,30 +544,157 @@ class SchedulerService:
                         import traceback
                         print(traceback.format_exc(), flush=True)
                         db.session.rollback()
+                finally:
+                    release_lock()
         finally:
             # Remove task from running set
             cls._running_tasks.discard(task_id)
             print(f"[SCHEDULER] Task {task_id} execution completed, removed from running set", flush=True)
     
     @classmethod
-    def load_all_tasks(cls):
-        """Load all active scheduled tasks into scheduler"""
-        from flask import Flask
-        from app import create_app
+    def execute_consistency_config(cls, config_id):
+        """Run the consistency check of a scheduled config (incremental when it has a watermark)"""
+        run_key = f'consistency_config_{config_id}'
+        if run_key in cls._running_tasks:
+            print(f"[SCHEDULER] Consistency config {config_id} is already running, skipping duplicate execution", flush=True)
+            return
+        
+        cls._running_tasks.add(run_key)
         
-        # Get or create app instance
-        app = None
         try:
-            from flask import current_app
-            app = current_app._get_current_object()
-        except RuntimeError:
-            app = create_app()
+            from app.models.data_consistency import DataConsistencyConfig
+            from app.services.consistency_service import ConsistencyService
+            
+            with cls.get_app().app_context():
+                release_lock = cls._lock_run(run_key)
+                if release_lock is None:
+                    print(f"[SCHEDULER] Consistency config {config_id} is running on another process, skipping", flush=True)
+                    return
+                
+                try:
+                    config = DataConsistencyConfig.query.get(config_id)
+                    if not config or not config.is_active:
+                        print(f"[SCHEDULER] Consistency config {config_id} not found or inactive", flush=True)
+                        return
+                    
+                    check, total = ConsistencyService.check_consistency(config)
+                    print(f"[SCHEDULER] Consistency config {config_id} completed. Check {check.id} found {total} inconsistencies", flush=True)
+                except Exception as e:
+                    import traceback
+                    print(f"[SCHEDULER] Error executing consistency config {config_id}: {str(e)}", flush=True)
+                    print(traceback.format_exc(), flush=True)
+                    db.session.rollback()
+                finally:
+                    release_lock()
+        finally:
+            cls._running_tasks.discard(run_key)
+    
+    @classmethod
+    def add_consistency_config(cls, config_id):
+        """Schedule a consistency config, replacing its previous job (removes it when unscheduled or inactive)"""
+        from app.models.data_consistency import DataConsistencyConfig
         
+        if not cls._leader:
+            cls._notify_leader(f'consistency config {config_id}')
+            return
+        
+        scheduler = cls.get_scheduler()
+        config = DataConsistencyConfig.query.get(config_id)
+        job_id = f'consistency_config_{config_id}'
+        
+        if not config or not config.is_active or not config.schedule_type:
+            cls.remove_consistency_config(config_id)
+            return
+        
+        scheduler.add_job(
+            cls.execute_consistency_config,
+            trigger=cls.get_trigger(config.schedule_type, config.schedule_value),
+            args=[config.id],
+            id=job_id,
+            replace_existing=True
+        )
+        job = scheduler.get_job(job_id)
+        print(f"[SCHEDULER] Added consistency config: {config.name} (ID: {config.id}, Type: {config.schedule_type}, Value: {config.schedule_value})", flush=True)
+        if job:
+            print(f"[SCHEDULER]   Next run: {job.next_run_time}", flush=True)
+    
+    @classmethod
+    def remove_consistency_config(cls, config_id):
+        """Remove the scheduler job of a consistency config, if any"""
+        if not cls._leader:
+            cls._notify_leader(f'consistency config {config_id}')
+            return
+        
+        scheduler = cls.get_scheduler()
+        if scheduler.get_job(f'consistency_config_{config_id}'):
+            scheduler.remove_job(f'consistency_config_{config_id}')
+            print(f"[SCHEDULER] Removed consistency config ID: {config_id}")
+    
+    @classmethod
+    def execute_consistency_batch(cls):
+        """Run all active consistency configs with shared table reads"""
+        if 'consistency_batch' in cls._running_tasks:
+            print("[SCHEDULER] Consistency batch is already running, skipping", flush=True)
+            return
+        
+        cls._running_tasks.add('consistency_batch')
+        
+        try:
+            from app.models.data_consistency import DataConsistencyConfig
+            from app.services.consistency_service import ConsistencyService
+            
+            with cls.get_app().app_context():
+                release_lock = cls._lock_run('consistency_batch')
+                if release_lock is None:
+                    print("[SCHEDULER] Consistency batch is running on another process, skipping", flush=True)
+                    return
+                
+                try:
+                    configs = DataConsistencyConfig.query.filter_by(is_active=True).order_by(DataConsistencyConfig.id).all()
+                    if not configs:
+                        print("[SCHEDULER] No active consistency configs", flush=True)
+                        return
+                    
+                    summary = ConsistencyService.run_batch(configs)
+                    print(
+                        f"[SCHEDULER] Consistency batch finished: {summary['completed']} completed, {summary['failed']} failed, "
+                        f"{summary['source_reads']} source read(s) and {summary['target_reads']} target read(s) for {summary['total_configs']} config(s)",
+                        flush=True
+                    )
+                except Exception as e:
+                    import traceback
+                    print(f"[SCHEDULER] Error executing consistency batch: {str(e)}", flush=True)
+                    print(traceback.format_exc(), flush=True)
+                    db.session.rollback()
+                finally:
+                    release_lock()
+        finally:
+            cls._running_tasks.discard('consistency_batch')
+    
+    @classmethod
+    def recover_comparison_jobs(cls):
+        """Requeue or fail stale comparison jobs and dispatch the ones left in the queue"""
+        with cls.get_app().app_context():
+            try:
+                ComparisonJobService.recover()
+            except Exception as e:
+                print(f"[SCHEDULER] Error recovering comparison jobs: {str(e)}", flush=True)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+    
+    @classmethod
+    def load_all_tasks(cls):
+        """Load all active scheduled tasks into scheduler (leader only)"""
+        app = cls.get_app()
         with app.app_context():
             scheduler = cls.get_scheduler()
+            if not cls._leader:
+                print("[SCHEDULER] Not the scheduler leader, scheduled jobs run on another process", flush=True)
+                return
             
-            # Remove all existing jobs
-            scheduler.remove_all_jobs()
+            # Remove all existing jobs (the leader election job stays)
+            cls._remove_scheduled_jobs(scheduler)
             print("[SCHEDULER] Removed all existing jobs")
             
             # Load active tasks
@@ -383,6 +741,51 @@ class SchedulerService:
                     print(f"[SCHEDULER] Error loading task {task.id}: {str(e)}", flush=True)
                     print(traceback.format_exc(), flush=True)
             
+            # Scheduled consistency configs
+            from app.models.data_consistency import DataConsistencyConfig
+            consistency_configs = DataConsistencyConfig.query.filter(
+                DataConsistencyConfig.is_active == True,
+                DataConsistencyConfig.schedule_type.isnot(None)
+            ).all()
+            for config in consistency_configs:
+                try:
+                    scheduler.add_job(
+                        cls.execute_consistency_config,
+                        trigger=cls.get_trigger(config.schedule_type, config.schedule_value),
+                        args=[config.id],
+                        id=f'consistency_config_{config.id}',
+                        replace_existing=True
+                    )
+                    print(f"[SCHEDULER] Loaded consistency config: {config.name} (ID: {config.id}, Type: {config.schedule_type}, Value: {config.schedule_value})", flush=True)
+                except Exception as e:
+                    print(f"[SCHEDULER] Error loading consistency config {config.id}: {str(e)}", flush=True)
+            
+            # Shared-scan run of all active consistency configs
+            batch_schedule = app.config.get('CONSISTENCY_BATCH_SCHEDULE', '')
+            if batch_schedule:
+                try:
+                    scheduler.add_job(
+                        cls.execute_consistency_batch,
+                        trigger=cls.get_trigger('cron', batch_schedule),
+                        id='consistency_batch',
+                        replace_existing=True
+                    )
+                    print(f"[SCHEDULER] Loaded consistency batch (cron: {batch_schedule})", flush=True)
+                except Exception as e:
+                    print(f"[SCHEDULER] Error loading consistency batch: {str(e)}", flush=True)
+            
+            # Stale comparison job recovery (the thread runner has no worker loop doing it)
+            if ComparisonJobService.runner() == 'thread':
+                scheduler.add_job(
+                    cls.recover_comparison_jobs,
+                    trigger=IntervalTrigger(seconds=max(1, int(app.config.get('COMPARISON_JOB_RECOVERY_INTERVAL', 60)))),
+                    id='comparison_job_recovery',
+                    replace_existing=True,
+                    max_instances=1,
+                    coalesce=True,
+                    next_run_time=datetime.now()
+                )
+            
             # Print scheduler status
             jobs = scheduler.get_jobs()
             print(f"[SCHEDULER] Scheduler is running with {len(jobs)} jobs")
@@ -392,18 +795,11 @@ class SchedulerService:
     @classmethod
     def add_task(cls, task_id):
         """Add a single task to scheduler"""
-        from flask import Flask
-        from app import create_app
-        
-        # Get or create app instance
-        app = None
-        try:
-            from flask import current_app
-            app = current_app._get_current_object()
-        except RuntimeError:
-            app = create_app()
-        
-        with app.app_context():
+        with cls.get_app().app_context():
+            if not cls._leader:
+                cls._notify_leader(f'task {task_id}')
+                return
+            
             scheduler = cls.get_scheduler()
             task = ScheduledTask.query.get(task_id)
             
@@ -474,6 +870,10 @@ class SchedulerService:
     @classmethod
     def remove_task(cls, task_id):
         """Remove a task from scheduler"""
+        if not cls._leader:
+            cls._notify_leader(f'task {task_id}')
+            return
+        
         scheduler = cls.get_scheduler()
         try:
             scheduler.remove_job(f'scheduled_task_{task_id}')
@@ -1758,6 +1758,65 @@ function confirmPrimaryKeysAndRun() {
     }, 300);
 }
 
+// Longest time the page waits for a comparison job before giving up polling
+const COMPARISON_JOB_MAX_WAIT_MS = 2 * 60 * 60 * 1000;
+
+// Poll a comparison job until it finishes, showing its progress in the loading modal
+async function waitForComparisonJob(job) {
+    const deadline = Date.now() + COMPARISON_JOB_MAX_WAIT_MS;
+    const phases = {
+        queued: 'Na fila',
+        reading_source: 'Lendo tabela origem',
+        reading_target: 'Lendo tabela destino',
+        comparing: 'Comparando registros',
+        enriching: 'Carregando registros de destino',
+        saving: 'Salvando resultados',
+        planning: 'Planejando partições',
+        partitioned: 'Comparando partições',
+        merging: 'Consolidando partições'
+    };
+    while (true) {
+        if (job.status === 'completed') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Comparação falhou');
+        }
+        if (job.status === 'cancelled') {
+            throw new Error('Comparação cancelada');
+        }
+        if (Date.now() > deadline) {
+            throw new Error(`Tempo de espera esgotado; a comparação (job ${job.id}) continua em segundo plano e o resultado aparecerá nos relatórios`);
+        }
+        
+        const progress = job.progress || {};
+        let details = phases[job.phase] || job.phase || '';
+        if (progress.records_total) {
+            details += ` · ${progress.records_compared || 0}/${progress.records_total} registros`;
+        }
+        if (progress.partitions_total) {
+            details += ` · ${progress.partitions_done || 0}/${progress.partitions_total} partições`;
+        }
+        if (progress.differences_found !== undefined) {
+            details += ` · ${progress.differences_found} diferenças`;
+        }
+        document.getElementById('loadingDetails').textContent = details;
+        
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const response = await fetch(`${API_BASE}/comparisons/jobs/${job.id}`, {
+            headers: {
+                'Authorization': `Bearer ${authToken}`,
+                'X-User-Id': currentUser.id
+            }
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.message || 'Erro ao consultar comparação');
+        }
+        job = data.job;
+    }
+}
+
 // Run comparison
 async function runComparison() {
     if (!currentProject) {
@@ -1848,12 +1907,15 @@ async function runComparison() {
         const data = await response.json();
         
         if (response.ok) {
+            // The comparison runs as a background job; wait for it to finish
+            const job = await waitForComparisonJob(data.job);
+            
             // Update loading message
             document.getElementById('loadingDetails').textContent = 'Carregando resultados detalhados...';
             
             // Load detailed results
             try {
-                await loadComparisonResults(data.comparison.id);
+                await loadComparisonResults(job.comparison_id);
                 
                 // Scroll to results
                 setTimeout(() => {
@@ -1894,24 +1956,43 @@ async function runComparison() {
 // Store current comparison results globally
 let currentComparisonResults = null;
 
-// Load detailed comparison results
-async function loadComparisonResults(comparisonId) {
-    try {
-        const response = await fetch(`${API_BASE}/comparisons/${comparisonId}/results`, {
+// Fetch every result of a comparison (the API returns pages linked by next_cursor)
+async function fetchAllComparisonResults(comparisonId) {
+    let results = [];
+    let cursor = null;
+    let data = null;
+    
+    do {
+        const params = new URLSearchParams({limit: 1000});
+        if (cursor !== null) {
+            params.set('after_id', cursor);
+        }
+        const response = await fetch(`${API_BASE}/comparisons/${comparisonId}/results?${params}`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`,
                 'X-User-Id': currentUser.id
             }
         });
         
-        const data = await response.json();
+        data = await response.json();
         
-        if (response.ok) {
-            currentComparisonResults = data;
-            displayComparisonResults(data);
-        } else {
-            showError(data.message);
+        if (!response.ok) {
+            throw new Error(data.message || 'Erro ao carregar resultados');
         }
+        
+        results = results.concat(data.results || []);
+        cursor = data.next_cursor;
+    } while (data.has_more);
+    
+    return {comparison: data.comparison, summary: data.summary, results: results};
+}
+
+// Load detailed comparison results
+async function loadComparisonResults(comparisonId) {
+    try {
+        const data = await fetchAllComparisonResults(comparisonId);
+        currentComparisonResults = data;
+        displayComparisonResults(data);
     } catch (error) {
         showError('Erro ao carregar resultados: ' + error.message);
     }
@@ -1922,11 +2003,12 @@ function displayComparisonResults(data) {
     const container = document.getElementById('comparisonResults');
     const results = data.results || [];
     
-    // Calculate statistics
-    const totalDifferences = results.length;
-    const modified = results.filter(r => r.change_type === 'modified').length;
-    const added = results.filter(r => r.change_type === 'added').length;
-    const deleted = results.filter(r => r.change_type === 'deleted').length;
+    // Statistics come from the stored summary (covers every result, not only the loaded ones)
+    const byChangeType = (data.summary && data.summary.by_change_type) || {};
+    const totalDifferences = (data.comparison && data.comparison.total_differences) || 0;
+    const modified = byChangeType.modified || 0;
+    const added = byChangeType.added || 0;
+    const deleted = byChangeType.deleted || 0;
     
     // Update statistics cards
     document.getElementById('totalDifferences').textContent = totalDifferences;
@@ -1981,13 +2063,50 @@ function getChangeTypeBadge(type) {
     return badges[type] || `<span class="badge bg-secondary">${type}</span>`;
 }
 
+// Download a comparison export streamed by the API (/results/export)
+async function downloadComparisonExport(comparisonId, format, filename) {
+    const response = await fetch(`${API_BASE}/comparisons/${comparisonId}/results/export?format=${format}`, {
+        headers: {
+            'Authorization': `Bearer ${authToken}`,
+            'X-User-Id': currentUser.id
+        }
+    });
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.message || 'Erro ao exportar resultados');
+    }
+    
+    const blob = await response.blob();
+    const url = URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = filename;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+    URL.revokeObjectURL(url);
+}
+
 // Export results
-function exportResults(format) {
+async function exportResults(format) {
     if (!currentComparisonResults || !currentComparisonResults.results) {
         showError('Nenhum resultado disponível para exportar.');
         return;
     }
     
+    // CSV is generated by the server from all stored results
+    if (format === 'csv' && currentComparisonResults.comparison) {
+        const projectName = currentProject ? currentProject.name : 'comparison';
+        const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
+        try {
+            await downloadComparisonExport(currentComparisonResults.comparison.id, 'csv', `${projectName}_comparison_${timestamp}.csv`);
+            showSuccess('Arquivo CSV exportado com sucesso!');
+        } catch (error) {
+            showError('Erro ao exportar resultados: ' + error.message);
+        }
+        return;
+    }
+    
     const results = currentComparisonResults.results;
     const comparison = currentComparisonResults.comparison;
     const projectName = currentProject ? currentProject.name : 'comparison';
@@ -2369,26 +2488,22 @@ async function loadReports() {
 // Export report
 async function exportReport(comparisonId, format) {
     try {
-        const response = await fetch(`${API_BASE}/comparisons/${comparisonId}/results`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-                'X-User-Id': currentUser.id
-            }
-        });
+        // CSV is streamed by the server from all stored results
+        if (format === 'csv') {
+            await downloadComparisonExport(comparisonId, 'csv', `relatorio_${comparisonId}_${new Date().toISOString().split('T')[0]}.csv`);
+            showSuccess('Relatório exportado com sucesso!');
+            return;
+        }
         
-        const data = await response.json();
+        const data = await fetchAllComparisonResults(comparisonId);
         
-        if (response.ok && data.results) {
+        if (data.results) {
             const comparison = data.comparison;
             const results = data.results;
             
             let content, filename, mimeType;
             
-            if (format === 'csv') {
-                content = exportToCSV(results, comparison);
-                filename = `relatorio_${comparisonId}_${new Date().toISOString().split('T')[0]}.csv`;
-                mimeType = 'text/csv';
-            } else if (format === 'json') {
+            if (format === 'json') {
                 content = exportToJSON(results, comparison);
                 filename = `relatorio_${comparisonId}_${new Date().toISOString().split('T')[0]}.json`;
                 mimeType = 'application/json';
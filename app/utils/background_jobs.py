@@ -0,0 +1,60 @@
+"""
+Bounded thread pool for work that must not run inside a web request
+
+Jobs run in a pool of BACKGROUND_WORKERS threads, each inside an application context
+of the app that submitted it, and release their database session when they finish.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import db
+
+
+class BackgroundJobs:
+    """Process-wide executor for background jobs"""
+    
+    _lock = threading.Lock()
+    _executor = None
+    
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                workers = max(1, int(current_app.config.get('BACKGROUND_WORKERS', 2)))
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='deltascope-job')
+                print(f"[BACKGROUND] Started pool with {workers} worker(s)", flush=True)
+            return cls._executor
+    
+    @classmethod
+    def submit(cls, name, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on a pool thread inside the current app's context
+        
+        Args:
+            name: Job name used in log messages
+            fn: Callable to run
+        
+        Returns:
+            concurrent.futures.Future of the call
+        """
+        app = current_app._get_current_object()
+        
+        def run():
+            with app.app_context():
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    import traceback
+                    print(f"[BACKGROUND] Job {name} failed: {str(e)}", flush=True)
+                    print(traceback.format_exc(), flush=True)
+                finally:
+                    db.session.remove()
+        
+        return cls._get_executor().submit(run)
+    
+    @classmethod
+    def shutdown(cls, wait=True):
+        """Stop the pool (a new one is created on the next submit)"""
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,226 @@
+"""
+Response cache for dashboard endpoints
+
+Two tiers:
+- In-process LRU (always on when the cache is enabled)
+- Optional file-backed tier shared by all processes on the host (DASHBOARD_CACHE_DIR)
+
+Entries are keyed by (project_id, endpoint, date range) and tagged with a per-project
+generation number. Invalidating a project bumps its generation, so every cached
+response for that project becomes stale at once. The generation is stored on the
+project row in the application database, so an invalidation in one process (web,
+worker or scheduler) is seen by the in-process tier of every other process.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import select, update, func
+from app import db
+from app.models.project import Project
+
+
+class DashboardCache:
+    """Process-wide dashboard response cache with event-driven invalidation"""
+    
+    _lock = threading.Lock()
+    _entries = OrderedDict()  # (project_id, key, generation) -> (expires_at, payload)
+    _stats = {
+        'hits': 0,
+        'shared_hits': 0,
+        'misses': 0,
+        'invalidations': 0
+    }
+    
+    @staticmethod
+    def _config(name, default):
+        try:
+            return current_app.config.get(name, default)
+        except RuntimeError:
+            return default
+    
+    @classmethod
+    def enabled(cls):
+        return bool(cls._config('DASHBOARD_CACHE_ENABLED', True))
+    
+    @classmethod
+    def _shared_dir(cls, project_id=None):
+        base = cls._config('DASHBOARD_CACHE_DIR', '')
+        if not base:
+            return None
+        return os.path.join(base, str(project_id)) if project_id is not None else base
+    
+    @staticmethod
+    def make_key(endpoint, start_date=None, end_date=None):
+        """Build a cache key from the endpoint name and the resolved date range"""
+        return '|'.join([
+            endpoint,
+            start_date.isoformat() if start_date else '',
+            end_date.isoformat() if end_date else ''
+        ])
+    
+    @classmethod
+    def _generation(cls, project_id):
+        """Read the project's cache generation from the application database
+        
+        Uses its own connection so the caller's session transaction (and its snapshot)
+        is not involved.
+        """
+        with db.engine.connect() as conn:
+            generation = conn.execute(
+                select(Project.dashboard_cache_generation).where(Project.id == project_id)
+            ).scalar()
+        return generation or 0
+    
+    @staticmethod
+    def _write_atomic(path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def get(cls, project_id, key, generation=None):
+        """Return the cached payload or None"""
+        if not cls.enabled():
+            return None
+        
+        if generation is None:
+            generation = cls._generation(project_id)
+        entry_key = (project_id, key, generation)
+        now = time.time()
+        
+        with cls._lock:
+            entry = cls._entries.get(entry_key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    cls._entries.move_to_end(entry_key)
+                    cls._stats['hits'] += 1
+                    return payload
+                del cls._entries[entry_key]
+        
+        shared_dir = cls._shared_dir(project_id)
+        if shared_dir:
+            path = os.path.join(shared_dir, hashlib.sha1(key.encode()).hexdigest() + '.json')
+            try:
+                with open(path, 'r') as f:
+                    stored = json.load(f)
+                if stored.get('generation') == generation and stored.get('expires_at', 0) > now:
+                    cls._store_local(entry_key, stored['expires_at'], stored['payload'])
+                    with cls._lock:
+                        cls._stats['shared_hits'] += 1
+                    return stored['payload']
+            except (OSError, ValueError, KeyError):
+                pass
+        
+        with cls._lock:
+            cls._stats['misses'] += 1
+        return None
+    
+    @classmethod
+    def _store_local(cls, entry_key, expires_at, payload):
+        max_entries = int(cls._config('DASHBOARD_CACHE_SIZE', 256))
+        with cls._lock:
+            cls._entries[entry_key] = (expires_at, payload)
+            cls._entries.move_to_end(entry_key)
+            while len(cls._entries) > max_entries:
+                cls._entries.popitem(last=False)
+    
+    @classmethod
+    def set(cls, project_id, key, payload, generation=None):
+        """Store a JSON-serializable payload
+        
+        Pass the generation read before the payload was computed; otherwise an
+        invalidation that lands during the computation would be missed.
+        """
+        if not cls.enabled():
+            return
+        
+        if generation is None:
+            generation = cls._generation(project_id)
+        expires_at = time.time() + int(cls._config('DASHBOARD_CACHE_TTL', 300))
+        cls._store_local((project_id, key, generation), expires_at, payload)
+        
+        shared_dir = cls._shared_dir(project_id)
+        if shared_dir:
+            path = os.path.join(shared_dir, hashlib.sha1(key.encode()).hexdigest() + '.json')
+            try:
+                cls._write_atomic(path, json.dumps({
+                    'generation': generation,
+                    'expires_at': expires_at,
+                    'payload': payload
+                }))
+            except (OSError, TypeError) as e:
+                print(f"[DASHBOARD CACHE] Warning: Could not write shared cache entry: {str(e)}")
+    
+    @classmethod
+    def get_or_compute(cls, project_id, key, compute):
+        """Return the cached payload, computing and storing it on a miss"""
+        if not cls.enabled():
+            return compute()
+        
+        # Read the generation first so a payload computed from pre-invalidation data is
+        # stored under the old generation and never served after the bump
+        generation = cls._generation(project_id)
+        payload = cls.get(project_id, key, generation)
+        if payload is None:
+            payload = compute()
+            cls.set(project_id, key, payload, generation)
+        return payload
+    
+    @classmethod
+    def invalidate(cls, project_id):
+        """Drop every cached response for a project (call after its data changes)"""
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    update(Project)
+                    .where(Project.id == project_id)
+                    .values(dashboard_cache_generation=func.coalesce(Project.dashboard_cache_generation, 0) + 1)
+                )
+        except Exception as e:
+            print(f"[DASHBOARD CACHE] Warning: Could not bump cache generation: {str(e)}")
+        
+        with cls._lock:
+            for entry_key in [k for k in cls._entries if k[0] == project_id]:
+                del cls._entries[entry_key]
+            cls._stats['invalidations'] += 1
+        
+        shared_dir = cls._shared_dir(project_id)
+        if shared_dir:
+            # Stale entries are ignored by generation; remove them to reclaim space
+            try:
+                names = os.listdir(shared_dir)
+            except OSError:
+                names = []
+            for name in names:
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(shared_dir, name))
+                    except OSError:
+                        pass
+    
+    @classmethod
+    def clear(cls):
+        """Drop the in-process tier and reset counters"""
+        with cls._lock:
+            cls._entries.clear()
+            for name in cls._stats:
+                cls._stats[name] = 0
+    
+    @classmethod
+    def get_stats(cls):
+        """Get hit/miss counters and hit rate"""
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats['entries'] = len(cls._entries)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0.0
+        stats['enabled'] = cls.enabled()
+        stats['shared_tier'] = cls._shared_dir() is not None
+        return stats
@@ -4,9 +4,64 @@ Utility functions for database checks and initialization
 from sqlalchemy import inspect, text
 from app import db
 from app.models import User, Project, Comparison, ComparisonResult, ChangeLog, DatabaseConnection, TableModelMapping, Group, ScheduledTask
+from app.models import DataConsistencyCheck, DataConsistencyResult, ComparisonJob
 from app.models.group import user_groups
 
 
+# Models whose secondary indexes (declared in __table_args__) must exist even
+# on databases created before the index was added to the model
+INDEXED_MODELS = [
+    ChangeLog,
+    Comparison,
+    ComparisonResult,
+    ComparisonJob,
+    DataConsistencyCheck,
+    DataConsistencyResult,
+]
+
+# Representative hot-path queries and the index the planner is expected to use
+EXPECTED_QUERY_PLANS = [
+    {
+        'index': 'ix_change_logs_project_detected',
+        'sql': (
+            "SELECT change_type, COUNT(*) FROM change_logs "
+            "WHERE project_id = :project_id AND detected_at >= :start_date AND detected_at <= :end_date "
+            "GROUP BY change_type"
+        ),
+    },
+    {
+        'index': 'ix_change_logs_project_sent',
+        'sql': "SELECT COUNT(*) FROM change_logs WHERE project_id = :project_id AND sent_to_api = 0",
+    },
+    {
+        'index': 'ix_comparison_results_comparison',
+        'sql': (
+            "SELECT id FROM comparison_results "
+            "WHERE comparison_id = :comparison_id AND id > :cursor ORDER BY id LIMIT 100"
+        ),
+    },
+    {
+        'index': 'ix_comparison_results_comparison_type',
+        'sql': (
+            "SELECT change_type, field_name, COUNT(*) FROM comparison_results "
+            "WHERE comparison_id = :comparison_id GROUP BY change_type, field_name"
+        ),
+    },
+    {
+        'index': 'ix_comparisons_project_executed',
+        'sql': "SELECT id FROM comparisons WHERE project_id = :project_id ORDER BY executed_at DESC LIMIT 5",
+    },
+]
+
+QUERY_PLAN_PARAMS = {
+    'project_id': 1,
+    'comparison_id': 1,
+    'cursor': 0,
+    'start_date': '2000-01-01 00:00:00',
+    'end_date': '2100-01-01 00:00:00',
+}
+
+
 def check_tables_exist():
     """Check if all required tables exist in the database"""
     try:
@@ -18,12 +73,15 @@ def check_tables_exist():
             'projects',
             'comparisons',
             'comparison_results',
+            'comparison_jobs',
             'change_logs',
+            'change_log_daily_rollup',
             'database_connections',
             'table_model_mappings',
             'groups',
             'user_groups',
             'scheduled_tasks',
+            'scheduler_leases',
             'webhook_configs',
             'webhook_payloads',
             'webhook_params',
@@ -59,8 +117,16 @@ def ensure_tables_exist():
             db.create_all()
             db.session.commit()
             
+            # Backfill the dashboard rollup when it is added to an existing database
+            if 'change_log_daily_rollup' in check_result['missing_tables'] and \
+                    'change_logs' in check_result['existing_tables']:
+                from app.services.rollup_service import RollupService
+                rows = RollupService.rebuild()
+                print(f"✓ Backfilled change_log_daily_rollup with {rows} rows.")
+            
             # Check and add missing columns to existing tables
             _ensure_columns_exist()
+            ensure_indexes_exist()
             # Also create default groups if they don't exist
             from app.models.group import Group
             default_groups = [
@@ -178,8 +244,9 @@ def ensure_tables_exist():
             db.session.rollback()
             return False
     else:
-        # Tables exist, but check for missing columns
+        # Tables exist, but check for missing columns and indexes
         _ensure_columns_exist()
+        ensure_indexes_exist()
     
     return False
 
@@ -229,11 +296,141 @@ def _ensure_columns_exist():
                     # Column might already exist or table structure issue
                     # This is not critical, continue silently
                     pass
+        
+        # Check data consistency tables for result mode, schedule, watermark and partition columns
+        consistency_columns = (
+            ('data_consistency_configs', 'result_mode', "VARCHAR(20) DEFAULT 'per_field'", "VARCHAR(20) DEFAULT 'per_field'"),
+            ('data_consistency_results', 'field_mismatches', 'JSON', 'TEXT'),
+            ('data_consistency_configs', 'schedule_type', 'VARCHAR(50)', 'VARCHAR(50)'),
+            ('data_consistency_configs', 'schedule_value', 'VARCHAR(200)', 'VARCHAR(200)'),
+            ('data_consistency_configs', 'watermark_column', 'VARCHAR(200)', 'VARCHAR(200)'),
+            ('data_consistency_configs', 'target_watermark_column', 'VARCHAR(200)', 'VARCHAR(200)'),
+            ('data_consistency_configs', 'partition_count', 'INTEGER', 'INTEGER')
+        )
+        # Check comparison_jobs for the worker queue and partition columns
+        job_columns = (
+            ('comparison_jobs', 'scheduled_task_id', 'INTEGER', 'INTEGER'),
+            ('comparison_jobs', 'worker_id', 'VARCHAR(200)', 'VARCHAR(200)'),
+            ('comparison_jobs', 'attempts', 'INTEGER DEFAULT 0', 'INTEGER DEFAULT 0'),
+            ('comparison_jobs', 'heartbeat_at', 'DATETIME', 'DATETIME'),
+            ('comparison_jobs', 'parent_job_id', 'INTEGER', 'INTEGER'),
+            ('comparison_jobs', 'partition_index', 'INTEGER', 'INTEGER'),
+            ('comparison_jobs', 'partition_spec', 'JSON', 'TEXT')
+        )
+        # Check scheduled_tasks for the timings of the last run
+        task_columns = (
+            ('scheduled_tasks', 'last_run_metadata', 'JSON', 'TEXT'),
+        )
+        # Check projects for the dashboard cache generation
+        project_columns = (
+            ('projects', 'dashboard_cache_generation', 'INTEGER DEFAULT 0', 'INTEGER DEFAULT 0'),
+        )
+        for table_name, column_name, server_type, sqlite_type in consistency_columns + job_columns + task_columns + project_columns:
+            if table_name not in inspector.get_table_names():
+                continue
+            columns = [col['name'] for col in inspector.get_columns(table_name)]
+            if column_name not in columns:
+                try:
+                    print(f"Adding '{column_name}' column to '{table_name}' table...")
+                    db_uri = str(db.engine.url)
+                    db_type = db_uri.split('://')[0].split('+')[0] if '://' in db_uri else 'sqlite'
+                    column_type = server_type if db_type in ('mysql', 'mariadb', 'postgresql', 'postgres') else sqlite_type
+                    db.session.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+                    db.session.commit()
+                    print(f"✓ Successfully added '{column_name}' column.")
+                except Exception as e:
+                    db.session.rollback()
+                    # Column might already exist or table structure issue
+                    pass
     except Exception as e:
         # Non-critical, continue silently
         pass
 
 
+def ensure_indexes_exist():
+    """Create secondary indexes declared on the models that are missing in the database
+    
+    db.create_all() only creates indexes together with new tables, so tables created
+    by older versions need their indexes added here.
+    
+    Returns:
+        List of index names that were created
+    """
+    created = []
+    try:
+        inspector = inspect(db.engine)
+        existing_tables = inspector.get_table_names()
+        
+        for model in INDEXED_MODELS:
+            table = model.__table__
+            if table.name not in existing_tables:
+                continue
+            
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                try:
+                    print(f"Creating index '{index.name}' on '{table.name}'...")
+                    index.create(bind=db.engine)
+                    created.append(index.name)
+                    print(f"✓ Successfully created index '{index.name}'.")
+                except Exception as e:
+                    # Index might have been created concurrently by another process
+                    print(f"Warning: Could not create index '{index.name}': {str(e)}")
+    except Exception as e:
+        # Non-critical, continue
+        print(f"Warning: Error checking indexes: {str(e)}")
+    
+    return created
+
+
+def verify_query_plans():
+    """Run EXPLAIN on the hot-path queries and warn when the expected index is missing or unused
+    
+    Returns:
+        List of dictionaries with index name, status ('ok', 'missing' or 'unused') and plan text
+    """
+    report = []
+    try:
+        inspector = inspect(db.engine)
+        existing_tables = inspector.get_table_names()
+        existing_indexes = set()
+        for model in INDEXED_MODELS:
+            if model.__tablename__ in existing_tables:
+                existing_indexes.update(index['name'] for index in inspector.get_indexes(model.__tablename__))
+        
+        dialect = db.engine.dialect.name
+        explain_prefix = 'EXPLAIN QUERY PLAN' if dialect == 'sqlite' else 'EXPLAIN'
+        
+        for expected in EXPECTED_QUERY_PLANS:
+            index_name = expected['index']
+            if index_name not in existing_indexes:
+                print(f"[QUERY PLAN] WARNING: Expected index '{index_name}' does not exist")
+                report.append({'index': index_name, 'status': 'missing', 'plan': None})
+                continue
+            
+            try:
+                with db.engine.connect() as conn:
+                    rows = conn.execute(text(f"{explain_prefix} {expected['sql']}"), QUERY_PLAN_PARAMS).fetchall()
+                plan = ' | '.join(' '.join(str(value) for value in row) for row in rows)
+            except Exception as e:
+                print(f"[QUERY PLAN] Could not explain query for '{index_name}': {str(e)}")
+                report.append({'index': index_name, 'status': 'error', 'plan': str(e)})
+                continue
+            
+            if index_name in plan:
+                report.append({'index': index_name, 'status': 'ok', 'plan': plan})
+            else:
+                # On MariaDB/MySQL the optimizer may skip indexes on (nearly) empty tables
+                print(f"[QUERY PLAN] WARNING: Index '{index_name}' not used by the {dialect} planner: {plan}")
+                report.append({'index': index_name, 'status': 'unused', 'plan': plan})
+    except Exception as e:
+        print(f"[QUERY PLAN] Warning: Error verifying query plans: {str(e)}")
+    
+    return report
+
+
 def is_first_run():
     """Check if this is the first run (no admin users exist)"""
     try:
@@ -4,29 +4,49 @@ Uses Fernet symmetric encryption from cryptography library
 """
 from cryptography.fernet import Fernet
 import base64
+import copy
+import hashlib
+import json
 import os
+import threading
+import time
 from flask import current_app
 
 
 class PasswordEncryption:
-    """Handle encryption and decryption of database passwords"""
+    """Handle encryption and decryption of database passwords
+    
+    The key is resolved and the Fernet instance built once per process (per distinct
+    ENCRYPTION_KEY value), instead of on every encrypt/decrypt call.
+    """
+    
+    _lock = threading.Lock()
+    _keys = {}  # raw ENCRYPTION_KEY value (None when generated) -> 32-byte key
+    _fernets = {}  # raw ENCRYPTION_KEY value -> Fernet
     
     @staticmethod
-    def get_encryption_key():
-        """Get or generate encryption key from environment or config"""
+    def _raw_key():
+        """Read ENCRYPTION_KEY from the environment or Flask config
+        
+        Returns:
+            Tuple of (key value or None, source name)
+        """
         # Try to get from environment variable first
         key = os.environ.get('ENCRYPTION_KEY')
-        key_source = 'ENV'
-        
-        if not key:
-            # Try to get from Flask config
-            try:
-                key = current_app.config.get('ENCRYPTION_KEY')
-                key_source = 'FLASK_CONFIG'
-            except RuntimeError:
-                # Not in app context, use default from env
-                pass
+        if key:
+            return key, 'ENV'
         
+        # Try to get from Flask config
+        try:
+            key = current_app.config.get('ENCRYPTION_KEY')
+        except RuntimeError:
+            # Not in app context, use default from env
+            key = None
+        return (key, 'FLASK_CONFIG') if key else (None, None)
+    
+    @staticmethod
+    def _derive_key(key, key_source):
+        """Turn a configured key into the 32 bytes used for Fernet"""
         if not key:
             # Generate a new key (should be set in .env for production)
             # This is a fallback - in production, always set ENCRYPTION_KEY
@@ -69,6 +89,41 @@ class PasswordEncryption:
         
         return key
     
+    @staticmethod
+    def get_encryption_key():
+        """Get or generate encryption key from environment or config (resolved once per key value)"""
+        key, key_source = PasswordEncryption._raw_key()
+        cached = PasswordEncryption._keys.get(key)
+        if cached is not None:
+            return cached
+        
+        with PasswordEncryption._lock:
+            if key not in PasswordEncryption._keys:
+                PasswordEncryption._keys[key] = PasswordEncryption._derive_key(key, key_source)
+            return PasswordEncryption._keys[key]
+    
+    @staticmethod
+    def get_fernet() -> Fernet:
+        """Get the Fernet instance for the current key (built once per key value)"""
+        key, _ = PasswordEncryption._raw_key()
+        fernet = PasswordEncryption._fernets.get(key)
+        if fernet is not None:
+            return fernet
+        
+        key_bytes = PasswordEncryption.get_encryption_key()
+        # Fernet requires base64-encoded 32-byte key
+        # Ensure key is bytes and exactly 32 bytes
+        if isinstance(key_bytes, bytes):
+            if len(key_bytes) != 32:
+                key_bytes = key_bytes[:32].ljust(32, b'0')
+        else:
+            key_bytes = key_bytes[:32].ljust(32, b'0')
+        
+        fernet = Fernet(base64.urlsafe_b64encode(key_bytes))
+        with PasswordEncryption._lock:
+            PasswordEncryption._fernets[key] = fernet
+        return fernet
+    
     @staticmethod
     def encrypt_password(password: str) -> str:
         """Encrypt a password"""
@@ -76,18 +131,7 @@ class PasswordEncryption:
             return ""
         
         try:
-            key = PasswordEncryption.get_encryption_key()
-            # Fernet requires base64-encoded 32-byte key
-            # Ensure key is bytes and exactly 32 bytes
-            if isinstance(key, bytes):
-                if len(key) != 32:
-                    key = key[:32].ljust(32, b'0')
-            else:
-                key = key[:32].ljust(32, b'0')
-            
-            fernet_key = base64.urlsafe_b64encode(key)
-            fernet = Fernet(fernet_key)
-            encrypted = fernet.encrypt(password.encode())
+            encrypted = PasswordEncryption.get_fernet().encrypt(password.encode())
             return encrypted.decode()
         except Exception as e:
             print(f"ERROR encrypting password: {e}")
@@ -101,18 +145,7 @@ class PasswordEncryption:
             return ""
         
         try:
-            key = PasswordEncryption.get_encryption_key()
-            # Fernet requires base64-encoded 32-byte key
-            # Ensure key is exactly 32 bytes
-            if isinstance(key, bytes):
-                if len(key) != 32:
-                    key = key[:32].ljust(32, b'0')
-            else:
-                key = key[:32].ljust(32, b'0')
-            
-            fernet_key = base64.urlsafe_b64encode(key)
-            fernet = Fernet(fernet_key)
-            decrypted = fernet.decrypt(encrypted_password.encode())
+            decrypted = PasswordEncryption.get_fernet().decrypt(encrypted_password.encode())
             return decrypted.decode()
         except Exception as e:
             # If decryption fails, return empty string
@@ -121,6 +154,67 @@ class PasswordEncryption:
             return ""
 
 
+class DecryptedConfigCache:
+    """Short-lived cache of decrypted configs per (kind, id), e.g. ('connection', 3) or ('webhook', 7)
+    
+    Entries also store a hash of the encrypted config they were built from, so a changed
+    row is never served from the cache even before invalidate() is called.
+    """
+    
+    _lock = threading.Lock()
+    _entries = {}  # (kind, object_id) -> (expires_at, source_hash, decrypted)
+    
+    @staticmethod
+    def _ttl():
+        try:
+            return int(current_app.config.get('DECRYPTED_CONFIG_CACHE_TTL', 60))
+        except RuntimeError:
+            return 60
+    
+    @staticmethod
+    def source_hash(config) -> str:
+        raw = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def get_or_decrypt(cls, kind: str, object_id, config, decrypt):
+        """Return a copy of the cached decrypted config, calling decrypt() on a miss
+        
+        Args:
+            kind: Cache namespace ('connection', 'webhook')
+            object_id: Row id (None disables caching)
+            config: Encrypted config as stored
+            decrypt: Callable returning the decrypted config
+        """
+        ttl = cls._ttl()
+        if object_id is None or ttl <= 0:
+            return decrypt()
+        
+        key = (kind, object_id)
+        config_hash = cls.source_hash(config)
+        now = time.time()
+        with cls._lock:
+            entry = cls._entries.get(key)
+        if entry and entry[0] > now and entry[1] == config_hash:
+            return copy.deepcopy(entry[2])
+        
+        decrypted = decrypt()
+        with cls._lock:
+            cls._entries[key] = (now + ttl, config_hash, copy.deepcopy(decrypted))
+        return decrypted
+    
+    @classmethod
+    def invalidate(cls, kind: str, object_id):
+        """Drop the cached decrypted config of a row (call after it is updated or deleted)"""
+        with cls._lock:
+            cls._entries.pop((kind, object_id), None)
+    
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+
+
 def encrypt_db_config(db_config: dict) -> dict:
     """Encrypt password in database configuration"""
     if not db_config:
@@ -154,7 +248,6 @@ def decrypt_db_config(db_config: dict) -> dict:
                 decrypted = PasswordEncryption.decrypt_password(password)
                 if decrypted and len(decrypted) > 0:
                     config['password'] = decrypted
-                    print(f"DEBUG: Successfully decrypted password (length: {len(decrypted)})")
                 else:
                     # Decryption returned empty, but password exists
                     # This might mean wrong key - try to use original as fallback
@@ -173,7 +266,6 @@ def decrypt_db_config(db_config: dict) -> dict:
                 config['password'] = ''
         else:
             # Password doesn't look encrypted, use as plain text
-            print(f"DEBUG: Password doesn't look encrypted, using as plain text (length: {len(str(password))})")
             config['password'] = password
     
     return config
@@ -0,0 +1,189 @@
+"""
+Process-wide registry of pooled SQLAlchemy engines for user database connections
+
+Engines are keyed by (connection id, config fingerprint). The fingerprint is a hash of
+the connection string and pool settings, so editing a connection yields a new engine,
+and the engine built for the previous config is disposed. Engines that have not been
+used for ENGINE_IDLE_TIMEOUT seconds are disposed on the next lookup, which closes the
+pooled TCP/TLS connections of sources nobody is reading anymore.
+"""
+import hashlib
+import threading
+import time
+from flask import current_app
+from sqlalchemy import create_engine
+
+
+class EngineRegistry:
+    """Shared engine pool per database connection"""
+    
+    _lock = threading.Lock()
+    _engines = {}  # (connection_id, fingerprint) -> {'engine', 'created_at', 'last_used', 'checkouts'}
+    _stats = {
+        'created': 0,
+        'reused': 0,
+        'disposed': 0,
+        'evicted_idle': 0
+    }
+    
+    @staticmethod
+    def _config(name, default):
+        try:
+            return current_app.config.get(name, default)
+        except RuntimeError:
+            return default
+    
+    @classmethod
+    def enabled(cls):
+        return bool(cls._config('ENGINE_REGISTRY_ENABLED', True))
+    
+    @classmethod
+    def _engine_options(cls, connection_string):
+        options = {
+            'pool_pre_ping': bool(cls._config('ENGINE_POOL_PRE_PING', True)),
+            'pool_recycle': int(cls._config('ENGINE_POOL_RECYCLE', 1800))
+        }
+        # SQLite files are opened locally, server pool sizing only applies to MariaDB/MySQL
+        if not connection_string.startswith('sqlite'):
+            options['pool_size'] = int(cls._config('ENGINE_POOL_SIZE', 5))
+            options['max_overflow'] = int(cls._config('ENGINE_MAX_OVERFLOW', 10))
+            options['pool_timeout'] = int(cls._config('ENGINE_POOL_TIMEOUT', 30))
+        return options
+    
+    @staticmethod
+    def fingerprint(connection_string, options):
+        """Hash a connection string and its pool options (the password never leaves this hash)"""
+        raw = connection_string + '|' + '|'.join(f"{key}={options[key]}" for key in sorted(options))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def get_engine(cls, connection_string, connection_id=None):
+        """Get the pooled engine for a connection string, creating it on first use
+        
+        Args:
+            connection_string: SQLAlchemy URL
+            connection_id: DatabaseConnection id, used to invalidate the engine when
+                the connection is updated or deleted (None for ad-hoc configs)
+        """
+        options = cls._engine_options(connection_string)
+        if not cls.enabled():
+            return create_engine(connection_string, **options)
+        
+        key = (connection_id, cls.fingerprint(connection_string, options))
+        stale = []
+        with cls._lock:
+            stale.extend(cls._evict_idle_locked())
+            entry = cls._engines.get(key)
+            if entry is None:
+                # A new fingerprint for a known connection means its config changed
+                if connection_id is not None:
+                    for other_key in [k for k in cls._engines if k[0] == connection_id]:
+                        stale.append(cls._engines.pop(other_key)['engine'])
+                entry = {
+                    'engine': create_engine(connection_string, **options),
+                    'created_at': time.time(),
+                    'last_used': time.time(),
+                    'checkouts': 0
+                }
+                cls._engines[key] = entry
+                cls._stats['created'] += 1
+            else:
+                cls._stats['reused'] += 1
+            entry['last_used'] = time.time()
+            entry['checkouts'] += 1
+        
+        cls._dispose_all(stale)
+        return entry['engine']
+    
+    @classmethod
+    def _evict_idle_locked(cls):
+        idle_timeout = int(cls._config('ENGINE_IDLE_TIMEOUT', 600))
+        if idle_timeout <= 0:
+            return []
+        cutoff = time.time() - idle_timeout
+        evicted = []
+        for key in [k for k, entry in cls._engines.items() if entry['last_used'] < cutoff]:
+            evicted.append(cls._engines.pop(key)['engine'])
+            cls._stats['evicted_idle'] += 1
+        return evicted
+    
+    @classmethod
+    def _dispose_all(cls, engines):
+        for engine in engines:
+            try:
+                engine.dispose()
+            except Exception as e:
+                print(f"[ENGINE_REGISTRY] Error disposing engine: {str(e)}", flush=True)
+        if engines:
+            with cls._lock:
+                cls._stats['disposed'] += len(engines)
+    
+    @classmethod
+    def invalidate(cls, connection_id):
+        """Dispose every engine of a connection (call after it is updated or deleted)"""
+        with cls._lock:
+            engines = [cls._engines.pop(key)['engine'] for key in [k for k in cls._engines if k[0] == connection_id]]
+        cls._dispose_all(engines)
+        if engines:
+            print(f"[ENGINE_REGISTRY] Disposed {len(engines)} engine(s) of connection {connection_id}", flush=True)
+    
+    @classmethod
+    def evict_idle(cls):
+        """Dispose engines that have been idle longer than ENGINE_IDLE_TIMEOUT"""
+        with cls._lock:
+            engines = cls._evict_idle_locked()
+        cls._dispose_all(engines)
+        return len(engines)
+    
+    @classmethod
+    def clear(cls):
+        """Dispose all engines"""
+        with cls._lock:
+            engines = [entry['engine'] for entry in cls._engines.values()]
+            cls._engines.clear()
+        cls._dispose_all(engines)
+    
+    @staticmethod
+    def _pool_status(engine):
+        pool = engine.pool
+        status = {'pool_class': type(pool).__name__}
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, name, None)
+            if callable(method):
+                try:
+                    status[name] = method()
+                except Exception:
+                    pass
+        return status
+    
+    @classmethod
+    def get_stats(cls, connection_ids=None):
+        """Get registry counters and pool status of each engine
+        
+        Args:
+            connection_ids: Only report engines of these connections (None for all)
+        """
+        now = time.time()
+        with cls._lock:
+            entries = list(cls._engines.items())
+            stats = dict(cls._stats)
+        
+        engines = []
+        for (connection_id, fingerprint), entry in entries:
+            if connection_ids is not None and connection_id not in connection_ids:
+                continue
+            engine_stats = {
+                'connection_id': connection_id,
+                'fingerprint': fingerprint[:12],
+                'dialect': entry['engine'].dialect.name,
+                'age_seconds': int(now - entry['created_at']),
+                'idle_seconds': int(now - entry['last_used']),
+                'checkouts': entry['checkouts']
+            }
+            engine_stats.update(cls._pool_status(entry['engine']))
+            engines.append(engine_stats)
+        
+        stats['enabled'] = cls.enabled()
+        stats['engines'] = engines
+        stats['size'] = len(entries)
+        return stats
@@ -0,0 +1,97 @@
+"""
+Utility functions for keyset (cursor) pagination
+"""
+import base64
+import json
+from datetime import datetime, date, time
+from decimal import Decimal
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Encode the (sort value, id) position of the last row of a page as an opaque string"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str, is_datetime: bool = False):
+    """Decode a cursor produced by encode_cursor
+    
+    Args:
+        cursor: Cursor string
+        is_datetime: Parse the sort value back into a datetime
+    
+    Returns:
+        Tuple of (sort value, id)
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if is_datetime and sort_value is not None:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+# Tags for key values that JSON cannot carry exactly (value -> string -> value)
+KEY_VALUE_TYPES = (
+    ('bytes', (bytes, bytearray, memoryview), lambda v: base64.b64encode(bytes(v)).decode(), base64.b64decode),
+    ('decimal', (Decimal,), str, Decimal),
+    ('datetime', (datetime,), lambda v: v.isoformat(), datetime.fromisoformat),
+    ('date', (date,), lambda v: v.isoformat(), date.fromisoformat),
+    ('time', (time,), lambda v: v.isoformat(), time.fromisoformat),
+)
+
+
+def _encode_key_value(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    for tag, types, dump, _ in KEY_VALUE_TYPES:
+        if isinstance(value, types):
+            return {'t': tag, 'v': dump(value)}
+    raise ValueError(f'Key values of type {type(value).__name__} cannot be used in a cursor')
+
+
+def _decode_key_value(value):
+    if not isinstance(value, dict):
+        return value
+    for tag, _, _, load in KEY_VALUE_TYPES:
+        if value.get('t') == tag:
+            return load(value['v'])
+    raise ValueError('Invalid cursor')
+
+
+def encode_key(values) -> str:
+    """Encode the raw key values (e.g. a primary key) of the last row of a page as an opaque string
+    
+    Values are tagged with their type (bytes, Decimal, datetime, date, time) so decode_key
+    returns exactly what the database returned and the next page compares against it.
+    
+    Raises:
+        ValueError: If a value has a type that cannot round-trip through the cursor
+    """
+    raw = json.dumps([_encode_key_value(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_key(cursor: str, size: int) -> list:
+    """Decode a cursor produced by encode_key
+    
+    Args:
+        cursor: Cursor string
+        size: Expected number of key values
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError('Invalid cursor')
+        return [_decode_key_value(value) for value in values]
+    except Exception:
+        raise ValueError('Invalid cursor')
@@ -0,0 +1,122 @@
+"""
+Process-wide cache of table, column and primary key introspection results
+
+Entries are keyed by (database, kind, table) where the database is identified by a hash
+of the engine URL, so every engine of the same connection config - whether created by a
+request or by the scheduler - shares them. Entries expire after SCHEMA_CACHE_TTL seconds
+and are dropped explicitly by the routes that change a table's definition.
+"""
+import copy
+import hashlib
+import threading
+import time
+from flask import current_app
+
+
+class SchemaCache:
+    """Shared schema metadata cache with TTL and explicit invalidation"""
+    
+    _lock = threading.Lock()
+    _entries = {}  # (database_key, kind, table_name) -> (expires_at, value)
+    _stats = {
+        'hits': 0,
+        'misses': 0,
+        'invalidations': 0
+    }
+    
+    @staticmethod
+    def _config(name, default):
+        try:
+            return current_app.config.get(name, default)
+        except RuntimeError:
+            return default
+    
+    @classmethod
+    def enabled(cls):
+        return bool(cls._config('SCHEMA_CACHE_ENABLED', True)) and int(cls._config('SCHEMA_CACHE_TTL', 300)) > 0
+    
+    @staticmethod
+    def database_key(engine) -> str:
+        """Identify the database an engine points at (the password only enters the hash)"""
+        url = engine.url.render_as_string(hide_password=False)
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def get_or_load(cls, engine, kind, table_name, loader):
+        """Return a copy of the cached value, calling loader() on a miss
+        
+        Args:
+            engine: Engine of the database
+            kind: 'tables', 'columns' or 'primary_keys'
+            table_name: Table name (None for database-wide entries)
+            loader: Callable returning the value to cache
+        """
+        if not cls.enabled():
+            return loader()
+        
+        key = (cls.database_key(engine), kind, table_name)
+        now = time.time()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry and entry[0] > now:
+                cls._stats['hits'] += 1
+                return copy.deepcopy(entry[1])
+            cls._stats['misses'] += 1
+        
+        value = loader()
+        with cls._lock:
+            cls._entries[key] = (now + int(cls._config('SCHEMA_CACHE_TTL', 300)), copy.deepcopy(value))
+        return value
+    
+    @classmethod
+    def get(cls, engine, kind, table_name):
+        """Return a copy of a cached value, or None when it is missing or expired"""
+        if not cls.enabled():
+            return None
+        
+        key = (cls.database_key(engine), kind, table_name)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry and entry[0] > time.time():
+                cls._stats['hits'] += 1
+                return copy.deepcopy(entry[1])
+            cls._stats['misses'] += 1
+        return None
+    
+    @classmethod
+    def put(cls, engine, kind, table_name, value):
+        """Store a value loaded elsewhere (e.g. a table taken from a schema snapshot)"""
+        if not cls.enabled():
+            return
+        key = (cls.database_key(engine), kind, table_name)
+        with cls._lock:
+            cls._entries[key] = (time.time() + int(cls._config('SCHEMA_CACHE_TTL', 300)), copy.deepcopy(value))
+    
+    @classmethod
+    def invalidate(cls, engine, table_name=None):
+        """Drop cached metadata of one table (and the table list), or of the whole database"""
+        database_key = cls.database_key(engine)
+        with cls._lock:
+            keys = [
+                key for key in cls._entries
+                if key[0] == database_key and (table_name is None or key[2] in (table_name, None))
+            ]
+            for key in keys:
+                del cls._entries[key]
+            cls._stats['invalidations'] += 1
+    
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+    
+    @classmethod
+    def get_stats(cls):
+        with cls._lock:
+            stats = dict(cls._stats)
+            now = time.time()
+            stats['entries'] = sum(1 for expires_at, _ in cls._entries.values() if expires_at > now)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['enabled'] = cls.enabled()
+        return stats
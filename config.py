@@ -23,10 +23,97 @@ class Config:
     # Encryption key for database passwords
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY') or None
     
+    # Seconds a decrypted connection/webhook config is reused before decrypting again (0 disables)
+    DECRYPTED_CONFIG_CACHE_TTL = int(os.environ.get('DECRYPTED_CONFIG_CACHE_TTL', '60'))
+    
     # External API Configuration
     EXTERNAL_API_ENDPOINT = os.environ.get('EXTERNAL_API_ENDPOINT', '')
     EXTERNAL_API_TOKEN = os.environ.get('EXTERNAL_API_TOKEN', '')
     
+    # Run EXPLAIN on hot-path queries at startup and warn about missing/unused indexes
+    VERIFY_QUERY_PLANS = os.environ.get('VERIFY_QUERY_PLANS', 'true').lower() == 'true'
+    
+    # Dashboard response cache (in-process LRU, plus an optional directory shared by all workers)
+    DASHBOARD_CACHE_ENABLED = os.environ.get('DASHBOARD_CACHE_ENABLED', 'true').lower() == 'true'
+    DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE', '256'))
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '300'))
+    DASHBOARD_CACHE_DIR = os.environ.get('DASHBOARD_CACHE_DIR', '')
+    
+    # Comparison results API paging
+    RESULTS_PAGE_SIZE = int(os.environ.get('RESULTS_PAGE_SIZE', '500'))
+    RESULTS_MAX_PAGE_SIZE = int(os.environ.get('RESULTS_MAX_PAGE_SIZE', '5000'))
+    
+    # Pooled engines for user database connections (one registry per process)
+    ENGINE_REGISTRY_ENABLED = os.environ.get('ENGINE_REGISTRY_ENABLED', 'true').lower() == 'true'
+    ENGINE_POOL_SIZE = int(os.environ.get('ENGINE_POOL_SIZE', '5'))
+    ENGINE_MAX_OVERFLOW = int(os.environ.get('ENGINE_MAX_OVERFLOW', '10'))
+    ENGINE_POOL_TIMEOUT = int(os.environ.get('ENGINE_POOL_TIMEOUT', '30'))
+    ENGINE_POOL_RECYCLE = int(os.environ.get('ENGINE_POOL_RECYCLE', '1800'))
+    ENGINE_POOL_PRE_PING = os.environ.get('ENGINE_POOL_PRE_PING', 'true').lower() == 'true'
+    ENGINE_IDLE_TIMEOUT = int(os.environ.get('ENGINE_IDLE_TIMEOUT', '600'))
+    
+    # Table/column/primary key introspection cache shared by requests and the scheduler
+    SCHEMA_CACHE_ENABLED = os.environ.get('SCHEMA_CACHE_ENABLED', 'true').lower() == 'true'
+    SCHEMA_CACHE_TTL = int(os.environ.get('SCHEMA_CACHE_TTL', '300'))
+    
+    # Data consistency results are inserted and committed in batches of this size
+    CONSISTENCY_RESULT_BATCH_SIZE = int(os.environ.get('CONSISTENCY_RESULT_BATCH_SIZE', '1000'))
+    
+    # Incremental consistency checks re-read rows this far behind the last watermark (seconds
+    # for date/time watermarks, units for numeric ones) to catch rows committed late
+    CONSISTENCY_WATERMARK_LAG = int(os.environ.get('CONSISTENCY_WATERMARK_LAG', '60'))
+    
+    # Threads reading and comparing the partitions of a partitioned consistency check
+    CONSISTENCY_PARTITION_WORKERS = int(os.environ.get('CONSISTENCY_PARTITION_WORKERS', '2'))
+    
+    # Threads running background jobs (comparison jobs, consistency checks started from the UI)
+    BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', '2'))
+    
+    # Comparison jobs report progress (and check for cancellation) every
+    # COMPARISON_PROGRESS_CHUNK records, writing it at most every COMPARISON_PROGRESS_INTERVAL seconds
+    COMPARISON_PROGRESS_CHUNK = int(os.environ.get('COMPARISON_PROGRESS_CHUNK', '1000'))
+    COMPARISON_PROGRESS_INTERVAL = float(os.environ.get('COMPARISON_PROGRESS_INTERVAL', '1.0'))
+    
+    # Where comparison jobs run: 'thread' (BACKGROUND_WORKERS pool of the web process) or
+    # 'worker' (queued in comparison_jobs for `python deltascope.py worker` processes;
+    # scheduled comparisons are queued there too)
+    COMPARISON_JOB_RUNNER = os.environ.get('COMPARISON_JOB_RUNNER', 'thread').lower()
+    
+    # Worker queue: idle poll interval, heartbeat of running jobs, jobs without a heartbeat
+    # for COMPARISON_JOB_STALE_SECONDS are requeued up to COMPARISON_JOB_MAX_ATTEMPTS claims
+    WORKER_POLL_INTERVAL = float(os.environ.get('WORKER_POLL_INTERVAL', '2.0'))
+    COMPARISON_JOB_HEARTBEAT = int(os.environ.get('COMPARISON_JOB_HEARTBEAT', '30'))
+    COMPARISON_JOB_STALE_SECONDS = int(os.environ.get('COMPARISON_JOB_STALE_SECONDS', '300'))
+    COMPARISON_JOB_MAX_ATTEMPTS = int(os.environ.get('COMPARISON_JOB_MAX_ATTEMPTS', '3'))
+    
+    # Thread runner: seconds between the scheduler leader's recovery of stale jobs (requeued
+    # or failed as above) and of jobs left queued by a process that exited
+    COMPARISON_JOB_RECOVERY_INTERVAL = int(os.environ.get('COMPARISON_JOB_RECOVERY_INTERVAL', '60'))
+    
+    # Upper bound of the partitions requested for a partitioned comparison
+    COMPARISON_MAX_PARTITIONS = int(os.environ.get('COMPARISON_MAX_PARTITIONS', '256'))
+    
+    # Leader election: only the process holding the scheduler lease runs scheduled jobs; it
+    # renews the lease every SCHEDULER_LEASE_RENEW seconds and another process takes over
+    # SCHEDULER_LEASE_TTL seconds after the last renewal. Each job run also holds a lease
+    # (SCHEDULER_RUN_LOCK_TTL, renewed while it runs) so runs never overlap across processes
+    SCHEDULER_LEADER_ELECTION = os.environ.get('SCHEDULER_LEADER_ELECTION', 'true').lower() == 'true'
+    SCHEDULER_LEASE_TTL = int(os.environ.get('SCHEDULER_LEASE_TTL', '60'))
+    SCHEDULER_LEASE_RENEW = int(os.environ.get('SCHEDULER_LEASE_RENEW', '15'))
+    SCHEDULER_RUN_LOCK_TTL = int(os.environ.get('SCHEDULER_RUN_LOCK_TTL', '300'))
+    
+    # Cron expression ("minute hour day month day_of_week") for the scheduled shared-scan
+    # run of all active consistency configs; empty disables it
+    CONSISTENCY_BATCH_SCHEDULE = os.environ.get('CONSISTENCY_BATCH_SCHEDULE', '')
+    
+    # Table browser paging
+    TABLE_BROWSER_PAGE_SIZE = int(os.environ.get('TABLE_BROWSER_PAGE_SIZE', '100'))
+    TABLE_BROWSER_MAX_PAGE_SIZE = int(os.environ.get('TABLE_BROWSER_MAX_PAGE_SIZE', '1000'))
+    
+    # Comparisons listing API paging
+    COMPARISONS_PAGE_SIZE = int(os.environ.get('COMPARISONS_PAGE_SIZE', '50'))
+    COMPARISONS_MAX_PAGE_SIZE = int(os.environ.get('COMPARISONS_MAX_PAGE_SIZE', '500'))
+    
     @staticmethod
     def init_app(app):
         pass
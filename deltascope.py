@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Linha de comando do DeltaScope
+
+Uso:
+    python deltascope.py worker [--poll-interval 2] [--once] [--max-jobs N] [--worker-id ID]
+
+O worker processa os jobs de comparação enfileirados no banco da aplicação, fora do
+processo web. Use COMPARISON_JOB_RUNNER=worker no servidor web para que as comparações
+(manuais e agendadas) sejam executadas apenas pelos workers.
+"""
+
+import argparse
+import os
+import signal
+import sys
+
+
+def run_worker(args):
+    """Inicia um processo worker"""
+    from app import create_app
+    from app.services.job_worker import JobWorker
+    
+    app = create_app(os.getenv('FLASK_ENV', 'default'), start_scheduler=False)
+    worker = JobWorker(app, poll_interval=args.poll_interval, worker_id=args.worker_id)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=args.once, max_jobs=args.max_jobs)
+    return 0
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(prog='deltascope', description='DeltaScope')
+    commands = parser.add_subparsers(dest='command')
+    
+    worker = commands.add_parser('worker', help='Processa jobs de comparação enfileirados')
+    worker.add_argument('--poll-interval', type=float, default=None,
+                        help='Segundos entre consultas à fila vazia (padrão: WORKER_POLL_INTERVAL)')
+    worker.add_argument('--once', action='store_true', help='Sai quando a fila estiver vazia')
+    worker.add_argument('--max-jobs', type=int, default=None, help='Sai após executar N jobs')
+    worker.add_argument('--worker-id', default=None, help='Identificador do worker (padrão: worker:<host>:<pid>)')
+    worker.set_defaults(func=run_worker)
+    
+    args = parser.parse_args()
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 1
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir a tabela change_log_daily_rollup a partir dos change_logs existentes.
+
+O dashboard lê os totais diários dessa tabela. Ela é mantida automaticamente ao salvar
+comparações, enviar mudanças para a API e deletar relatórios; use este script para
+preencher dados antigos ou corrigir divergências.
+
+Uso:
+    python3 scripts/backfill_change_log_rollups.py              # todos os projetos
+    python3 scripts/backfill_change_log_rollups.py --project 3  # apenas um projeto
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import create_app
+from app.services.rollup_service import RollupService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstrói change_log_daily_rollup a partir de change_logs')
+    parser.add_argument('--project', type=int, default=None, help='ID do projeto (padrão: todos)')
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        scope = f"projeto {args.project}" if args.project else "todos os projetos"
+        print(f"Reconstruindo rollups para {scope}...")
+        rows = RollupService.rebuild(args.project)
+        print(f"✓ {rows} linhas de rollup gravadas.")
+
+
+if __name__ == '__main__':
+    main()
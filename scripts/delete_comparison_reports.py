@@ -20,6 +20,8 @@ from app import create_app, db
 from app.models.comparison import Comparison, ComparisonResult
 from app.models.project import Project
 from app.models.change_log import ChangeLog
+from app.services.rollup_service import RollupService
+from app.utils.dashboard_cache import DashboardCache
 from sqlalchemy import func
 
 
@@ -75,8 +77,10 @@ def delete_comparisons(project_id=None):
             return {'success': True, 'deleted': 0}
         
         comparison_ids = [c.id for c in comparisons]
+        project_ids = {c.project_id for c in comparisons}
         
-        # Delete change logs first
+        # Remove change logs from the dashboard rollups, then delete them
+        RollupService.remove_comparisons(comparison_ids)
         change_logs = ChangeLog.query.filter(
             ChangeLog.comparison_id.in_(comparison_ids)
         ).all()
@@ -104,6 +108,10 @@ def delete_comparisons(project_id=None):
         
         db.session.commit()
         
+        # Only reaches other processes when the shared cache tier (DASHBOARD_CACHE_DIR) is configured
+        for affected_project_id in project_ids:
+            DashboardCache.invalidate(affected_project_id)
+        
         return {
             'success': True,
             'deleted_comparisons': deleted_comparisons,
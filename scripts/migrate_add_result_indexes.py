@@ -0,0 +1,54 @@
+"""
+Migration script to add the secondary indexes used by the dashboard and results queries
+
+Creates the composite indexes declared on change_logs, comparisons, comparison_results,
+data_consistency_checks and data_consistency_results, then runs EXPLAIN on the hot-path
+queries to confirm the planner uses them.
+
+Execute this script when your Flask app is running or import it in a Python shell:
+    python3 -c "from scripts.migrate_add_result_indexes import migrate; from app import create_app, db; app = create_app(); app.app_context().push(); migrate(db, app.config)"
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect
+
+
+def migrate(db, app_config):
+    """Create missing result/log indexes and verify the query plans"""
+    from app.utils.db_check import ensure_indexes_exist, verify_query_plans
+    
+    inspector = inspect(db.engine)
+    if 'change_logs' not in inspector.get_table_names():
+        print("Table 'change_logs' does not exist. Run init_db.py first.")
+        return False
+    
+    created = ensure_indexes_exist()
+    if created:
+        print(f"✓ Created {len(created)} index(es): {', '.join(created)}")
+    else:
+        print("All indexes already exist.")
+    
+    print("\nVerifying query plans...")
+    report = verify_query_plans()
+    for entry in report:
+        print(f"  - {entry['index']}: {entry['status']}")
+    
+    return all(entry['status'] in ('ok', 'unused') for entry in report)
+
+if __name__ == '__main__':
+    try:
+        from app import create_app, db
+        app = create_app()
+        with app.app_context():
+            migrate(db, app.config)
+    except ImportError as e:
+        print(f"Error importing Flask app: {e}")
+        print("\nTo run this migration:")
+        print("1. Start your Flask app")
+        print("2. In another terminal, run:")
+        print("   python3 -c \"from scripts.migrate_add_result_indexes import migrate; from app import create_app, db; app = create_app(); app.app_context().push(); migrate(db, app.config)\"")
+        print("\nOr simply restart your Flask app - missing indexes are created automatically on startup.")